@@ -4,10 +4,12 @@ import os
 import sys
 import traceback
 from tempfile import NamedTemporaryFile
+from threading import Thread
 
-from finorch.config.config import client_config_manager
+from finorch.config.config import client_config_manager, CLIENT_SERVER_ASYNCIO
 from finorch.sessions import session_map, LocalSession
-from finorch.utils.xmlrpc import XMLRPCServer
+from finorch.utils.aioxmlrpc import AsyncXMLRPCServer
+from finorch.utils.xmlrpc import XMLRPCServer, UnixXMLRPCServer
 
 
 def daemonize():  # pragma: no cover
@@ -51,6 +53,36 @@ def daemonize():  # pragma: no cover
     os.dup2(se.fileno(), sys.stderr.fileno())
 
 
+def start_unix_server(client, metrics):
+    """
+    Starts an additional server for the client on a unix domain socket in the client configuration directory, which
+    avoids the overhead of loopback TCP for local callers. The socket path is saved in the client configuration.
+
+    :param client: The client instance to serve
+    :param metrics: The RpcMetrics of the main server, so that calls over the socket are included in the metrics
+    :return: The running server, or None if the server could not be started
+    """
+    socket_path = client_config_manager.get_config_directory() / 'client.sock'
+    server_klass = AsyncXMLRPCServer if client_config_manager.get_server() == CLIENT_SERVER_ASYNCIO \
+        else UnixXMLRPCServer
+
+    try:
+        server = server_klass(str(socket_path), max_workers=client_config_manager.get_max_workers(), metrics=metrics)
+    except OSError as e:
+        # Another client is already listening on the socket, or unix sockets aren't available
+        logging.warning(f"Unable to listen on unix domain socket {socket_path}: {e}")
+        return None
+
+    server.register_introspection_functions()
+    server.register_instance(client)
+
+    client_config_manager.set_socket_path(socket_path)
+
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
 def start_client():
     """
     Starts the client.
@@ -67,8 +99,11 @@ def start_client():
     session_klass = session_map[sys.argv[1]]
     client = session_klass.client_klass(session_klass)
 
-    # Create the XMLRPC server on a random port
-    with XMLRPCServer(('localhost', 0)) as server:
+    # Create the XMLRPC server on a random port. Requests are served concurrently so that long running calls (such as
+    # large file downloads) don't block other callers. The asyncio server can be configured instead when many
+    # connections need to be held open at once
+    server_klass = AsyncXMLRPCServer if client_config_manager.get_server() == CLIENT_SERVER_ASYNCIO else XMLRPCServer
+    with server_klass(('localhost', 0), max_workers=client_config_manager.get_max_workers()) as server:
         server.register_introspection_functions()
 
         client.set_server(server)
@@ -78,6 +113,9 @@ def start_client():
         port = server.server_address[1]
         client_config_manager.set_port(port)
 
+        # Local clients can also be reached over a unix domain socket
+        unix_server = start_unix_server(client, server.metrics) if session_klass is LocalSession else None
+
         # Return the port via stdout to the caller
         print(server.server_address[1], flush=True)
         print("=EOF=", flush=True)
@@ -92,6 +130,10 @@ def start_client():
         # Run the server's main loop
         server.serve_forever()
 
+        if unix_server:
+            unix_server.terminate()
+            unix_server.server_close()
+
 
 def prepare_log_file():
     """
@@ -8,6 +8,29 @@ import appdirs
 APPNAME = "finorch"
 APPAUTHOR = "ADACS"
 
+# The default number of worker threads used by the client to serve requests concurrently
+DEFAULT_CLIENT_MAX_WORKERS = 8
+
+# The implementations the client can use to serve requests. The threaded server handles each connection on a worker
+# thread, while the asyncio server handles connections on an event loop and only uses worker threads for blocking calls
+CLIENT_SERVER_THREADED = "threaded"
+CLIENT_SERVER_ASYNCIO = "asyncio"
+DEFAULT_CLIENT_SERVER = CLIENT_SERVER_THREADED
+
+# How the local client notices the marker files written by the wrapper. With inotify (the default) markers are seen as
+# soon as they're written, falling back to scanning the job directories where inotify isn't available. With off, the
+# job directory is checked each time the job's status is requested.
+STATUS_WATCHER_INOTIFY = "inotify"
+STATUS_WATCHER_POLL = "poll"
+STATUS_WATCHER_OFF = "off"
+DEFAULT_STATUS_WATCHER = STATUS_WATCHER_INOTIFY
+
+# How often (in seconds) clients that submit jobs to a scheduler sync the status of their jobs from the scheduler
+DEFAULT_SCHEDULER_SYNC_INTERVAL = 30
+
+# How often (in seconds) clients bring the status of their unfinished jobs up to date in the background
+DEFAULT_STATUS_RECONCILE_INTERVAL = 2
+
 
 class _ConfigManager:
     """
@@ -98,6 +121,19 @@ class _ApiConfigManager(_ConfigManager):
     def __init__(self):
         super().__init__(self.get_config_directory() / "api.ini")
 
+    def get_job_index_enabled(self):
+        """
+        Gets if sessions record their jobs in the job index
+
+        :return: True if the job index is enabled, otherwise False
+        """
+        self._read()
+
+        if section := self.get_section("main"):
+            return section.get("job_index", "false").lower() in ("1", "true", "yes", "on")
+
+        return False
+
 
 class _ClientConfigManager(_ConfigManager):
     """
@@ -129,6 +165,97 @@ class _ClientConfigManager(_ConfigManager):
         self._read()
         self.set("main", "port", port)
 
+    def get_socket_path(self):
+        """
+        Gets the path of the unix domain socket the client was last listening on
+
+        :return: The path of the socket, or None
+        """
+        self._read()
+
+        if section := self.get_section("main"):
+            return section.get("socket_path", None)
+
+        return None
+
+    def set_socket_path(self, socket_path):
+        """
+        Sets the path of the unix domain socket the client is listening on
+
+        :return: None
+        """
+        self._read()
+        self.set("main", "socket_path", socket_path)
+
+    def get_max_workers(self):
+        """
+        Gets the number of worker threads the client uses to serve requests concurrently
+
+        :return: The configured number of worker threads, or DEFAULT_CLIENT_MAX_WORKERS if not configured
+        """
+        self._read()
+
+        if section := self.get_section("main"):
+            return int(section.get("max_workers", DEFAULT_CLIENT_MAX_WORKERS))
+
+        return DEFAULT_CLIENT_MAX_WORKERS
+
+    def get_server(self):
+        """
+        Gets the server implementation the client uses to serve requests
+
+        :return: One of CLIENT_SERVER_THREADED or CLIENT_SERVER_ASYNCIO, or DEFAULT_CLIENT_SERVER if not configured
+        """
+        self._read()
+
+        if section := self.get_section("main"):
+            return section.get("server", DEFAULT_CLIENT_SERVER)
+
+        return DEFAULT_CLIENT_SERVER
+
+    def get_status_watcher(self):
+        """
+        Gets how the local client watches for the marker files written by the wrapper
+
+        :return: One of STATUS_WATCHER_INOTIFY, STATUS_WATCHER_POLL or STATUS_WATCHER_OFF, or DEFAULT_STATUS_WATCHER if
+        not configured
+        """
+        self._read()
+
+        if section := self.get_section("main"):
+            return section.get("status_watcher", DEFAULT_STATUS_WATCHER)
+
+        return DEFAULT_STATUS_WATCHER
+
+    def get_scheduler_sync_interval(self):
+        """
+        Gets how often the client syncs the status of its jobs from the scheduler
+
+        :return: The configured interval in seconds, or DEFAULT_SCHEDULER_SYNC_INTERVAL if not configured. An interval
+        of 0 or less disables the sync.
+        """
+        self._read()
+
+        if section := self.get_section("main"):
+            return float(section.get("scheduler_sync_interval", DEFAULT_SCHEDULER_SYNC_INTERVAL))
+
+        return DEFAULT_SCHEDULER_SYNC_INTERVAL
+
+    def get_status_reconcile_interval(self):
+        """
+        Gets how often the client brings the status of its unfinished jobs up to date in the background
+
+        :return: The configured interval in seconds, or DEFAULT_STATUS_RECONCILE_INTERVAL if not configured. An
+        interval of 0 or less disables the background reconciler, the status of a job is then brought up to date each
+        time it is requested.
+        """
+        self._read()
+
+        if section := self.get_section("main"):
+            return float(section.get("status_reconcile_interval", DEFAULT_STATUS_RECONCILE_INTERVAL))
+
+        return DEFAULT_STATUS_RECONCILE_INTERVAL
+
 
 class WrapperConfigManager(_ConfigManager):
     """
@@ -160,6 +287,72 @@ class WrapperConfigManager(_ConfigManager):
         self._read()
         self.set("main", "port", port)
 
+    def get_client_port(self):
+        """
+        Gets the port of the client that started the wrapper, for clients that can be reached from the wrapper
+
+        :return: The port of the client, or None if the wrapper can't reach the client directly
+        """
+        self._read()
+
+        if section := self.get_section("main"):
+            return section.get("client_port", None)
+
+        return None
+
+    def set_client_port(self, port):
+        """
+        Sets the port of the client that started the wrapper, so that the wrapper can report the job's status to it
+
+        :return: None
+        """
+        self._read()
+        self.set("main", "client_port", port)
+
+    def get_job_identifier(self):
+        """
+        Gets the identifier of the job the wrapper is running
+
+        :return: The job identifier, or None if the wrapper wasn't told which job it is running
+        """
+        self._read()
+
+        if section := self.get_section("main"):
+            return section.get("job_identifier", None)
+
+        return None
+
+    def set_job_identifier(self, job_identifier):
+        """
+        Sets the identifier of the job the wrapper is running, which the wrapper reports the job's status under
+
+        :return: None
+        """
+        self._read()
+        self.set("main", "job_identifier", job_identifier)
+
+    def get_status_spool(self):
+        """
+        Gets the path of the status spool the wrapper reports the job's status to when it can't reach the client
+
+        :return: The path of the spool, or None if the wrapper wasn't given a spool
+        """
+        self._read()
+
+        if section := self.get_section("main"):
+            return section.get("status_spool", None)
+
+        return None
+
+    def set_status_spool(self, spool_path):
+        """
+        Sets the path of the status spool the wrapper reports the job's status to when it can't reach the client
+
+        :return: None
+        """
+        self._read()
+        self.set("main", "status_spool", spool_path)
+
 
 # Create a config manager singleton to avoid issues with concurrency
 api_config_manager = _ApiConfigManager()
@@ -1,22 +1,162 @@
 import abc
+import asyncio
+import datetime
+import logging
 import os
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 from tempfile import TemporaryDirectory
 
+from finorch.config.config import client_config_manager
 from finorch.sessions.database import Database
+from finorch.sessions.status_spool import STATUS_SPOOL, StatusSpoolReader
+from finorch.transport.abstract_transport import MAX_CHUNK_SIZE
+from finorch.utils.job_status import JobStatus
+
+# Files touched by the wrapper in the job's working directory as the job progresses
+STARTED_MARKER = 'started'
+FINISHED_MARKER = 'finished'
+
+# wait_for_jobs modes. WAIT_ANY returns as soon as any of the jobs has finished, WAIT_ALL once all of them have finished
+WAIT_ANY = 'any'
+WAIT_ALL = 'all'
+
+# How often (in seconds) wait_for_jobs checks the jobs for status changes that the client hasn't been told about
+WAIT_POLL_INTERVAL = 0.1
+
+# The longest (in seconds) a single wait_for_jobs call blocks for, so a waiting call doesn't hold a connection open
+# indefinitely. Callers that want to wait longer call wait_for_jobs again.
+MAX_WAIT_TIMEOUT = 25
+
+# The share of the client's worker threads (max_workers) that blocking wait_for_jobs calls can hold at once, so waiting
+# callers can't starve the threaded server of workers for other calls. Once this many callers are waiting, further
+# calls return straight away with the jobs that have already finished.
+MAX_WAITING_WORKERS_SHARE = 0.5
+
+
+# How often (in seconds) the status reconciler checks the marker files of every unfinished job once wrappers report
+# their status, to catch jobs whose report was lost
+MARKER_SWEEP_INTERVAL = 60
+
+# The maximum number of finished job statuses kept in memory by the client
+FINISHED_STATUS_CACHE_SIZE = 100000
+
+
+def is_wait_satisfied(finished, job_count, mode):
+    """
+    Checks if a wait for jobs is complete
+
+    :param finished: A dict of job identifier -> status for the jobs that have finished
+    :param job_count: The number of jobs being waited for
+    :param mode: WAIT_ANY or WAIT_ALL
+    :return: True if the wait is complete, otherwise False
+    """
+    return len(finished) >= job_count if mode == WAIT_ALL else bool(finished)
 
 
 class DatabaseNotConfiguredException(Exception):
     pass
 
 
+class _FinishedStatusCache:
+    """
+    A thread safe, bounded cache of the statuses of finished jobs. The status of a finished job never changes, so it
+    can be served from memory without touching the database or the job's directory. The least recently used jobs are
+    evicted once the cache is full.
+    """
+
+    def __init__(self, max_size=FINISHED_STATUS_CACHE_SIZE):
+        self._max_size = max_size
+        self._statuses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._statuses)
+
+    def get_many(self, job_identifiers):
+        """
+        Gets the cached statuses of jobs
+
+        :param job_identifiers: A list of job identifiers
+        :return: A dict of job identifier -> status for the jobs that are cached
+        """
+        statuses = {}
+        with self._lock:
+            for job_identifier in job_identifiers:
+                if (status := self._statuses.get(job_identifier)) is not None:
+                    self._statuses.move_to_end(job_identifier)
+                    statuses[job_identifier] = status
+
+        return statuses
+
+    def update(self, statuses):
+        """
+        Caches the statuses of any finished jobs
+
+        :param statuses: An iterable of (job identifier, status) pairs. Jobs that haven't finished are not cached, and
+        are removed from the cache if their status was put back (such as when cancelling a job fails).
+        :return: None
+        """
+        with self._lock:
+            for job_identifier, status in statuses:
+                if status > JobStatus.RUNNING:
+                    self._statuses[job_identifier] = status
+                    self._statuses.move_to_end(job_identifier)
+                else:
+                    self._statuses.pop(job_identifier, None)
+
+            while len(self._statuses) > self._max_size:
+                self._statuses.popitem(last=False)
+
+
 class AbstractClient(abc.ABC):
+    # Clients that submit jobs to a scheduler set this, and implement _query_scheduler, to have the status of their jobs
+    # synced from the scheduler in the background
+    _uses_scheduler = False
+
     def __init__(self, session_klass):
         self._exec_path = None
         self._xml_rpc_server = None
         self._session_klass = session_klass
         self._db = None
 
+        # Notified whenever the client changes the status of a job, so that wait_for_jobs can wake up
+        self._status_changed = threading.Condition()
+        self._status_version = 0
+
+        # The (event loop, asyncio.Event) of each async_wait_for_jobs call, set whenever the client changes the status
+        # of a job
+        self._status_waiters = set()
+
+        # Bounds the number of wait_for_jobs calls that hold a worker thread while waiting
+        self._waiting_workers = threading.BoundedSemaphore(
+            max(1, int(client_config_manager.get_max_workers() * MAX_WAITING_WORKERS_SHARE))
+        )
+
+        self._status_update_lock = threading.RLock()
+
+        self._finished_statuses = _FinishedStatusCache()
+
+        # Set to stop the background status reconciler, and whether it is keeping the status of unfinished jobs up to
+        # date so that status requests can be served straight from the database
+        self._status_reconciler_stop = None
+        self._statuses_reconciled = False
+
+        # Set by clients that are told about new marker files as they're written, so the job directories don't need to
+        # be checked when a job's status is requested
+        self._markers_watched = False
+
+        # Tails the status spool that wrappers report to when they can't reach the client directly
+        self._status_spool = None
+
+        # Set once a wrapper has reported a job status to the client. Wrappers report when their jobs start and finish,
+        # so from then on the status reconciler only sweeps the job directories every MARKER_SWEEP_INTERVAL, in case a
+        # report was lost.
+        self._status_reported = False
+        self._next_marker_sweep = 0
+
     def set_server(self, server):
         """
         Sets the XMLRPC server where required. This is then used by the terminate() command
@@ -42,6 +182,19 @@ class AbstractClient(abc.ABC):
 
         self._db = Database(self._exec_path)
 
+        # Start with the most recently finished jobs cached, since they're the most likely to be polled
+        self._finished_statuses = _FinishedStatusCache()
+        self._finished_statuses.update(self._db.get_finished_job_statuses(FINISHED_STATUS_CACHE_SIZE))
+
+        # Catch up on the jobs that progressed while the client wasn't running
+        self._open_status_spool()
+        self._reconcile_job_statuses()
+
+        self._start_status_reconciler(
+            client_config_manager.get_status_reconcile_interval(),
+            client_config_manager.get_scheduler_sync_interval() if self._uses_scheduler else 0
+        )
+
     @property
     def db(self):
         if not self._db:
@@ -56,13 +209,616 @@ class AbstractClient(abc.ABC):
         :return: True if the server was terminated successfully, False otherwise
         """
 
+        if self._status_reconciler_stop:
+            self._status_reconciler_stop.set()
+
         if self._xml_rpc_server:
             self._xml_rpc_server.terminate()
 
         return True
 
+    def _scan_job_markers(self, job_identifier):
+        """
+        Lists the marker files present in a job's working directory with a single directory scan
+
+        :param job_identifier: The identifier of the job
+        :return: A dict of marker file name -> modification time (datetime) for the markers that exist for the job
+        """
+        try:
+            with os.scandir(self._exec_path / job_identifier) as entries:
+                return {
+                    e.name: datetime.datetime.fromtimestamp(e.stat().st_mtime)
+                    for e in entries if e.name in (STARTED_MARKER, FINISHED_MARKER)
+                }
+        except (FileNotFoundError, NotADirectoryError):
+            # The job directory hasn't been created yet
+            return {}
+
+    def _job_marker_timestamps(self, job_identifier):
+        """
+        Gets the times the wrapper started and finished a job from its marker files. These are more accurate than the
+        time the client notices the job has started or finished.
+
+        :param job_identifier: The identifier of the job
+        :return: A dict of timestamp column -> time, for the markers that exist for the job
+        """
+        return self._marker_timestamps(self._scan_job_markers(job_identifier))
+
+    @staticmethod
+    def _marker_timestamps(markers):
+        """
+        Maps the marker files of a job to the timestamp columns they record
+
+        :param markers: The markers that exist for the job, as returned by _scan_job_markers
+        :return: A dict of timestamp column -> time
+        """
+        columns = {STARTED_MARKER: 'started_at', FINISHED_MARKER: 'finished_at'}
+        return {columns[marker]: mtime for marker, mtime in markers.items()}
+
+    def _open_status_spool(self):
+        """
+        Starts tailing the status spool in the exec path. Reports left in the spool while the client wasn't running are
+        applied first, then the spool is started afresh so that it only ever holds the reports of one client run.
+
+        :return: None
+        """
+        spool_path = self._exec_path / STATUS_SPOOL
+        previous_spool_path = spool_path.with_name(f'{STATUS_SPOOL}.previous')
+
+        try:
+            os.replace(spool_path, previous_spool_path)
+        except FileNotFoundError:
+            pass
+        else:
+            # Any report appended to the old spool after it is read is picked up from the marker files when the
+            # unfinished jobs are reconciled
+            self._apply_status_reports(StatusSpoolReader(previous_spool_path).read())
+            os.remove(previous_spool_path)
+
+        self._status_spool = StatusSpoolReader(spool_path)
+
+    def _read_status_spool(self):
+        """
+        Applies the reports appended to the status spool since it was last read
+
+        :return: None
+        """
+        if self._status_spool:
+            self._apply_status_reports(self._status_spool.read())
+
+    def _apply_status_reports(self, reports):
+        """
+        Updates the status of unfinished jobs from the reports of their wrappers. Reports never move a job backwards,
+        since a report may arrive after the job's status was found some other way (such as from the scheduler).
+
+        :param reports: A list of (job identifier, status, timestamp) tuples, in the order they were reported
+        :return: The number of jobs whose status changed
+        """
+        if not reports:
+            return 0
+
+        self._status_reported = True
+
+        statuses = {}
+        timestamps = {}
+        for job_identifier, status, timestamp in reports:
+            statuses[job_identifier] = max(status, statuses.get(job_identifier, status))
+
+            column = 'started_at' if status == JobStatus.RUNNING else 'finished_at'
+            timestamps.setdefault(job_identifier, {})[column] = timestamp
+
+        return self._advance_job_statuses(statuses, timestamps)
+
+    def _advance_job_statuses(self, statuses, timestamps=None):
+        """
+        Updates the status of unfinished jobs, only ever moving them forward. Finished jobs are left alone, such as jobs
+        that were cancelled, or reported as failed, before their marker files were seen.
+
+        :param statuses: A dict of job identifier -> new status
+        :param timestamps: An optional dict of job identifier -> known times of the job's lifecycle, see
+        _set_job_statuses
+        :return: The number of jobs whose status changed
+        """
+        # Held from reading the current statuses until the new ones are saved, so concurrent updates can't move a job
+        # backwards
+        with self._status_update_lock:
+            changed = {}
+            for job_identifier, current_status in self.db.get_job_statuses(list(statuses)).items():
+                if current_status <= JobStatus.RUNNING and statuses[job_identifier] > current_status:
+                    changed[job_identifier] = statuses[job_identifier]
+
+            if timestamps is not None:
+                timestamps = {job_identifier: timestamps.get(job_identifier) for job_identifier in changed}
+
+            self._set_job_statuses(changed, timestamps)
+
+        return len(changed)
+
+    def report_job_status(self, job_identifier, status, timestamp=None):
+        """
+        Called by a wrapper that can reach the client to report that its job has started, finished or failed
+
+        :param job_identifier: The identifier of the job
+        :param status: The new status of the job
+        :param timestamp: The time the job reached the status, in seconds since the epoch. Defaults to now.
+        :return: True
+        """
+        timestamp = datetime.datetime.fromtimestamp(float(timestamp)) if timestamp is not None \
+            else datetime.datetime.now()
+
+        self._apply_status_reports([(job_identifier, int(status), timestamp)])
+
+        return True
+
+    def _query_scheduler(self, batch_ids):
+        """
+        Asks the scheduler for the status of many jobs in a single query. Clients that submit jobs to a scheduler can
+        override this to find jobs that stopped without the wrapper finishing them, such as jobs cancelled by the
+        scheduler.
+
+        :param batch_ids: A list of the scheduler's ids of the jobs
+        :return: A dict of batch id -> status for the jobs the scheduler reported on
+        """
+        return {}
+
+    def _reconcile_job_statuses(self, query_scheduler=True):
+        """
+        Brings the status of every unfinished job up to date at once, rather than a job at a time as each is polled.
+        The exec path is listed once, the markers are only read for jobs that have a directory, the scheduler is
+        queried once, and all of the changed statuses are saved in a single transaction.
+
+        :param query_scheduler: False to only check the marker files of the jobs
+        :return: The number of jobs whose status changed
+        """
+        unfinished = self.db.get_unfinished_jobs()
+        if not unfinished:
+            return 0
+
+        with os.scandir(self._exec_path) as entries:
+            job_directories = {e.name for e in entries if e.name in unfinished and e.is_dir()}
+
+        scheduler_statuses = self._query_scheduler(
+            [batch_id for _, batch_id in unfinished.values() if batch_id is not None]
+        ) if query_scheduler else {}
+
+        changed = {}
+        timestamps = {}
+        for job_identifier, (status, batch_id) in unfinished.items():
+            markers = self._scan_job_markers(job_identifier) if job_identifier in job_directories else {}
+
+            new_status = max(status, self._status_from_markers(markers), scheduler_statuses.get(batch_id, status))
+            if new_status != status:
+                changed[job_identifier] = new_status
+                timestamps[job_identifier] = self._marker_timestamps(markers)
+
+        # A job may have been reported as finished since the unfinished jobs were read
+        count = self._advance_job_statuses(changed, timestamps)
+
+        if count:
+            logging.info(f"Reconciled the status of {count} of {len(unfinished)} unfinished jobs")
+
+        return count
+
+    def _sync_scheduler(self):
+        """
+        Updates the status of the unfinished jobs from the scheduler with a single query. This finds jobs that the
+        scheduler stopped before the wrapper could finish them, without reading any job's marker files.
+
+        :return: The number of jobs whose status changed
+        """
+        unfinished = self.db.get_unfinished_jobs()
+        batch_jobs = {batch_id: job_identifier for job_identifier, (_, batch_id) in unfinished.items() if batch_id}
+        if not batch_jobs:
+            return 0
+
+        changed = {}
+        for batch_id, status in self._query_scheduler(list(batch_jobs)).items():
+            job_identifier = batch_jobs.get(batch_id)
+
+            # Jobs never move backwards, the wrapper may have already reported a job as running
+            if job_identifier and status > unfinished[job_identifier][0]:
+                changed[job_identifier] = status
+
+        return self._advance_job_statuses(changed)
+
+    def _refresh_job_statuses(self, check_jobs=True, sync_scheduler=False):
+        """
+        Brings the status of the unfinished jobs up to date. Called by the status reconciler, so that the file system
+        and the scheduler are checked in the background rather than while a caller waits for a job's status.
+
+        :param check_jobs: True to apply new status reports, and check the marker files of the jobs if they aren't
+        watched. Once wrappers report their status, the marker files are only swept every MARKER_SWEEP_INTERVAL.
+        :param sync_scheduler: True to also sync the status of the jobs from the scheduler
+        :return: None
+        """
+        if check_jobs:
+            self._read_status_spool()
+
+            if not self._markers_watched and (not self._status_reported or time.monotonic() >= self._next_marker_sweep):
+                self._next_marker_sweep = time.monotonic() + MARKER_SWEEP_INTERVAL
+                self._reconcile_job_statuses(query_scheduler=False)
+
+        if sync_scheduler:
+            self._sync_scheduler()
+
+    def _start_status_reconciler(self, interval, scheduler_interval=0):
+        """
+        Starts a background thread that keeps the status of the unfinished jobs up to date in the database, so that
+        status requests are pure reads. Clients that submit jobs to a scheduler also sync their jobs from the scheduler
+        every scheduler interval, so however many jobs there are costs one scheduler query per interval.
+
+        :param interval: How often to bring the jobs up to date in seconds. If this is 0 or less the status of a job is
+        brought up to date each time it is requested instead.
+        :param scheduler_interval: How often to sync from the scheduler in seconds, or 0 or less to never sync
+        :return: None
+        """
+        if self._status_reconciler_stop:
+            self._status_reconciler_stop.set()
+
+        self._statuses_reconciled = interval > 0
+
+        if interval <= 0 and scheduler_interval <= 0:
+            self._status_reconciler_stop = None
+            return
+
+        stop = self._status_reconciler_stop = threading.Event()
+        wait = min(i for i in (interval, scheduler_interval) if i > 0)
+
+        def reconcile():
+            next_sync = time.monotonic() + scheduler_interval
+
+            while not stop.wait(wait):
+                sync_scheduler = scheduler_interval > 0 and time.monotonic() >= next_sync
+                if sync_scheduler:
+                    next_sync = time.monotonic() + scheduler_interval
+
+                try:
+                    self._refresh_job_statuses(interval > 0, sync_scheduler)
+                except Exception as e:
+                    logging.error(f"Unable to bring the job statuses up to date: {e}")
+
+        threading.Thread(target=reconcile, daemon=True).start()
+
+    @staticmethod
+    def _status_from_markers(markers):
+        """
+        Gets the status of an unfinished job from the marker files written by the wrapper
+
+        :param markers: The markers that exist for the job, as returned by _scan_job_markers
+        :return: The status of the job
+        """
+        # Check if the job is completed, or started, or queued
+        if FINISHED_MARKER in markers:
+            return JobStatus.COMPLETED
+        elif STARTED_MARKER in markers:
+            return JobStatus.RUNNING
+
+        return JobStatus.QUEUED
+
+    def _derive_job_status(self, job_identifier, status):
+        """
+        Derives the current status of a job from its last known status. If the job status is less than or equal to
+        RUNNING, the marker files written by the wrapper are checked to see if the job has progressed, unless they are
+        watched or the status reconciler keeps the job up to date.
+
+        :param job_identifier: The identifier of the job
+        :param status: The last known status of the job
+        :return: The current status of the job
+        """
+        if status > JobStatus.RUNNING:
+            return status
+
+        # The status is updated as soon as the job starts or finishes, until then the job is waiting to start
+        if self._markers_watched or self._statuses_reconciled:
+            return max(status, JobStatus.QUEUED)
+
+        # The scheduler may have already reported the job as running before the wrapper touched its marker
+        return max(status, self._status_from_markers(self._scan_job_markers(job_identifier)))
+
+    def _set_job_status(self, job_identifier, status):
+        """
+        Updates the status of a job and wakes any callers waiting for a status change
+
+        :param job_identifier: The identifier of the job
+        :param status: The new status of the job
+        :return: None
+        """
+        self._set_job_statuses({job_identifier: status})
+
+    def _set_job_statuses(self, statuses, timestamps=None):
+        """
+        Updates the status of many jobs in a single transaction and wakes any callers waiting for a status change
+
+        :param statuses: A dict of job identifier -> new status
+        :param timestamps: An optional dict of job identifier -> timestamps from the job's marker files, for callers
+        that have already scanned them. The marker files are scanned if not provided.
+        :return: None
+        """
+        if not statuses:
+            return
+
+        if timestamps is None and (self._markers_watched or self._statuses_reconciled):
+            # The times the job started and finished are passed in as the markers are seen, or when the status
+            # reconciler finds them
+            timestamps = {}
+        elif timestamps is None:
+            timestamps = {job_identifier: self._job_marker_timestamps(job_identifier) for job_identifier in statuses}
+
+        self.db.update_job_statuses(statuses, timestamps)
+        self._finished_statuses.update(statuses.items())
+
+        with self._status_changed:
+            self._status_version += 1
+            self._status_changed.notify_all()
+
+            for loop, changed in self._status_waiters:
+                try:
+                    loop.call_soon_threadsafe(changed.set)
+                except RuntimeError:
+                    # The event loop has been closed
+                    pass
+
+    def _get_job_status(self, job_identifier):
+        """
+        Gets the current status of a job. Finished jobs are served from memory, otherwise the status is read from the
+        database. Unless the status reconciler is keeping the database up to date, the status is then derived from the
+        job's marker files, and saved if it has changed.
+
+        :param job_identifier: The identifier of the job
+        :return: The status of the job if the job was found, otherwise a Tuple of (None, *reason*)
+        """
+        if cached := self._finished_statuses.get_many([job_identifier]):
+            return cached[job_identifier]
+
+        # Without the status reconciler, status reports are applied as statuses are requested
+        if not self._statuses_reconciled:
+            self._read_status_spool()
+
+        status = self.db.get_job_status(job_identifier)
+
+        if type(status) is tuple:
+            return status
+
+        # If the job status is less than or equal to RUNNING, then we need to derive the current job status and update
+        # the job status accordingly.
+        new_status = self._derive_job_status(job_identifier, status)
+
+        # Update the job if the status has changed
+        if new_status != status:
+            self._set_job_status(job_identifier, new_status)
+        else:
+            self._finished_statuses.update([(job_identifier, status)])
+
+        return new_status
+
+    @staticmethod
+    def _job_tags(job_identifiers, tags):
+        """
+        Matches the tags passed to start_jobs with the identifiers of the started jobs
+
+        :param job_identifiers: The identifiers of the started jobs
+        :param tags: None, a dict of tag key -> value for all of the jobs, or a list with a dict of tags for each job
+        :return: A dict of job identifier -> dict of tag key -> value
+        """
+        if not tags:
+            return {}
+
+        if isinstance(tags, dict):
+            return {job_identifier: tags for job_identifier in job_identifiers}
+
+        return dict(zip(job_identifiers, tags))
+
+    def get_job_statuses(self, job_identifiers=None, tags=None):
+        """
+        Gets the status of many jobs in one call. Finished jobs are served from memory, the rest are read with a single
+        database query.
+
+        :param job_identifiers: A list of job identifiers, None is treated as an empty list
+        :param tags: Instead of job identifiers, a dict of tag key -> value. The statuses of all jobs with all of the
+        tags are read with a single database query.
+        :return: A dict of job identifier -> status. Jobs that could not be found are not included.
+        """
+        if not self._statuses_reconciled:
+            self._read_status_spool()
+
+        if tags:
+            cached = {}
+            statuses = self.db.get_job_statuses(tags=tags)
+        else:
+            job_identifiers = list(job_identifiers or [])
+            cached = self._finished_statuses.get_many(job_identifiers)
+            uncached = [job_identifier for job_identifier in job_identifiers if job_identifier not in cached]
+            statuses = self.db.get_job_statuses(uncached) if uncached else {}
+
+        # Update the jobs whose status has changed together
+        changed = {}
+        for job_identifier, status in statuses.items():
+            new_status = self._derive_job_status(job_identifier, status)
+
+            if new_status != status:
+                changed[job_identifier] = new_status
+
+        self._set_job_statuses(changed)
+        statuses.update(changed)
+        self._finished_statuses.update(statuses.items())
+
+        statuses.update(cached)
+        return statuses
+
+    def wait_for_jobs(self, job_identifiers, mode=WAIT_ANY, timeout=None):
+        """
+        Blocks until any (or all) of the jobs have finished, or the timeout expires. This avoids callers polling
+        get_job_status, since the wait happens inside the client. If too many callers are already waiting (see
+        MAX_WAITING_WORKERS_SHARE), the jobs that have already finished are returned without waiting.
+
+        :param job_identifiers: A list of job identifiers
+        :param mode: WAIT_ANY to return as soon as any of the jobs has finished, or WAIT_ALL to return once all of the
+        jobs have finished
+        :param timeout: The maximum time to wait in seconds, capped at MAX_WAIT_TIMEOUT. None waits for
+        MAX_WAIT_TIMEOUT.
+        :return: A dict of job identifier -> status for the jobs that have finished, otherwise a Tuple of
+        (None, *reason*)
+        """
+        if mode not in (WAIT_ANY, WAIT_ALL):
+            return None, f"Invalid wait mode {mode}"
+
+        if not job_identifiers:
+            return {}
+
+        timeout = MAX_WAIT_TIMEOUT if timeout is None else min(float(timeout), MAX_WAIT_TIMEOUT)
+        deadline = time.monotonic() + timeout
+
+        if not self._waiting_workers.acquire(blocking=False):
+            # Check the jobs once rather than holding another worker, the caller backs off before waiting again
+            return self._check_wait(job_identifiers, mode, time.monotonic())
+
+        try:
+            while True:
+                with self._status_changed:
+                    version = self._status_version
+
+                result = self._check_wait(job_identifiers, mode, deadline)
+                if result is not None:
+                    return result
+
+                remaining = deadline - time.monotonic()
+
+                # Wake up early if the client changes a job status, otherwise check the jobs again after a short
+                # interval in case they have progressed without the client being told
+                with self._status_changed:
+                    self._status_changed.wait_for(
+                        lambda: self._status_version != version,
+                        min(remaining, WAIT_POLL_INTERVAL)
+                    )
+        finally:
+            self._waiting_workers.release()
+
+    async def async_wait_for_jobs(self, job_identifiers, mode=WAIT_ANY, timeout=None):
+        """
+        The asyncio server calls this in place of wait_for_jobs. The wait happens on the event loop rather than holding
+        a worker thread, only checking the statuses of the jobs is run on a thread.
+
+        :param job_identifiers: A list of job identifiers
+        :param mode: WAIT_ANY or WAIT_ALL
+        :param timeout: The maximum time to wait in seconds, capped at MAX_WAIT_TIMEOUT. None waits for
+        MAX_WAIT_TIMEOUT.
+        :return: A dict of job identifier -> status for the jobs that have finished, otherwise a Tuple of
+        (None, *reason*)
+        """
+        if mode not in (WAIT_ANY, WAIT_ALL):
+            return None, f"Invalid wait mode {mode}"
+
+        if not job_identifiers:
+            return {}
+
+        timeout = MAX_WAIT_TIMEOUT if timeout is None else min(float(timeout), MAX_WAIT_TIMEOUT)
+        deadline = time.monotonic() + timeout
+
+        waiter = asyncio.get_running_loop(), asyncio.Event()
+        with self._status_changed:
+            self._status_waiters.add(waiter)
+
+        try:
+            while True:
+                # Cleared before checking, so a status change made during the check isn't missed
+                waiter[1].clear()
+
+                result = await asyncio.to_thread(self._check_wait, job_identifiers, mode, deadline)
+                if result is not None:
+                    return result
+
+                remaining = deadline - time.monotonic()
+
+                # Wake up early if the client changes a job status, as in wait_for_jobs
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), min(remaining, WAIT_POLL_INTERVAL))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._status_changed:
+                self._status_waiters.discard(waiter)
+
+    def _check_wait(self, job_identifiers, mode, deadline):
+        """
+        Checks if a wait for jobs is complete
+
+        :param job_identifiers: A list of job identifiers
+        :param mode: WAIT_ANY or WAIT_ALL
+        :param deadline: The time.monotonic() time the wait times out at
+        :return: The result of the wait if it is complete or has timed out, otherwise None
+        """
+        statuses = self.get_job_statuses(job_identifiers)
+        if missing := set(job_identifiers) - set(statuses):
+            return None, f"Jobs {', '.join(sorted(missing))} do not exist"
+
+        finished = {k: v for k, v in statuses.items() if v > JobStatus.RUNNING}
+
+        if is_wait_satisfied(finished, len(statuses), mode) or time.monotonic() >= deadline:
+            return finished
+
+        return None
+
+    def archive_jobs(self, before, compact=True):
+        """
+        Moves finished jobs submitted before the cutoff to the archive, so they no longer slow down queries on active
+        jobs. Archived jobs can still be looked up by identifier, and listed with get_jobs(archived=True).
+
+        :param before: Archive finished jobs submitted before this time
+        :param compact: If True, the database is compacted and its statistics refreshed afterwards
+        :return: The number of jobs archived
+        """
+        archived = self.db.archive_jobs(before)
+
+        if compact:
+            self.db.compact()
+
+        return archived
+
+    def get_job_timing_stats(self, since=None, until=None):
+        """
+        Gets the distribution of how long jobs waited in the scheduler's queue, and how long they ran for
+
+        :param since: Only include jobs started at or after this time
+        :param until: Only include jobs started before this time
+        :return: A dict of 'queue_wait' and 'runtime', each a dict of the count, mean, p50, p95 and max in seconds
+        """
+        return self.db.get_job_timing_stats(since, until)
+
+    def get_job_file_chunk(self, job_identifier, file_path, offset, size):
+        """
+        Reads part of a job file, allowing large files to be streamed without reading the whole file in to memory
+
+        :param job_identifier: The identifier of the job
+        :param file_path: The path of the file relative to the job's working directory
+        :param offset: The offset to start reading from. May be a string since XML-RPC can't represent large integers.
+        :param size: The maximum number of bytes to read, capped at MAX_CHUNK_SIZE
+        :return: The bytes read (empty at the end of the file), otherwise a Tuple of (None, *reason*)
+        """
+        full_file_path = Path(self._exec_path / job_identifier / file_path)
+
+        if full_file_path.exists():
+            try:
+                with open(full_file_path, 'rb') as f:
+                    f.seek(int(offset))
+                    size = min(int(size), MAX_CHUNK_SIZE)
+                    chunk = f.read(size)
+            except Exception:
+                return None, f"Unable to retrieve file {full_file_path} as the file could not be read."
+
+            # The final chunk of the file has been read
+            if len(chunk) < size:
+                self.db.mark_job_downloaded(job_identifier)
+
+            return chunk
+
+        return None, f"Unable to retrieve file {full_file_path} as the file does not exist."
+
+    @abc.abstractmethod
+    def start_job(self, katscript, tags=None):
+        raise NotImplementedError()
+
     @abc.abstractmethod
-    def start_job(self, katscript):
+    def start_jobs(self, katscripts, tags=None):
         raise NotImplementedError()
 
     @abc.abstractmethod
@@ -70,7 +826,8 @@ class AbstractClient(abc.ABC):
         raise NotImplementedError()
 
     @abc.abstractmethod
-    def get_jobs(self):
+    def get_jobs(self, status=None, since=None, until=None, limit=None, cursor=None, fields=None, archived=False,
+                 tags=None):
         raise NotImplementedError()
 
     @abc.abstractmethod
@@ -1,31 +1,288 @@
 import abc
+import datetime
+import logging
+import time
 from tempfile import NamedTemporaryFile
 
 import finesse
 
+from finorch.config.config import api_config_manager
+from finorch.sessions.abstract_client import WAIT_ANY, MAX_WAIT_TIMEOUT, is_wait_satisfied
+from finorch.sessions.job_index import get_job_index
+from finorch.transport.abstract_transport import DEFAULT_CHUNK_SIZE, DEFAULT_JOBS_PAGE_SIZE
 from finorch.transport.exceptions import TransportGetJobSolutionException
 from finorch.utils.job_status import JobStatus
 
+# How long (in seconds) wait_for_jobs backs off for when the client returns early because too many callers are already
+# waiting
+WAIT_BUSY_BACKOFF = 1
+
 
 class AbstractSession(abc.ABC):
     def __init__(self):
         self._transport = None
 
-    def start_job(self, script):
-        return self._transport.start_job(script)
+        # Jobs are recorded in the API side job index as they're used, if it's enabled
+        self._job_index = get_job_index() if api_config_manager.get_job_index_enabled() else None
+
+        # The status last recorded in the job index for each job, so that polling doesn't rewrite unchanged jobs
+        self._indexed_statuses = {}
+
+    def _index_jobs(self, jobs):
+        """
+        Records jobs in the job index, if it is enabled. Problems with the index are logged rather than raised, so they
+        never interfere with using the session.
+
+        :param jobs: A dict of job identifier -> dict of the details to record, any of 'status' and 'submitted_at'
+        :return: None
+        """
+        if not self._job_index or not jobs:
+            return
+
+        try:
+            self._job_index.record_jobs(self.callsign, self._transport.host, self._transport.exec_path, jobs)
+        except Exception as e:
+            logging.warning(f"Unable to record jobs in the job index: {e}")
+            return
+
+        self._indexed_statuses.update(
+            (job_identifier, details['status']) for job_identifier, details in jobs.items()
+            if details.get('status') is not None
+        )
+
+    def _index_statuses(self, statuses):
+        """
+        Records the statuses of jobs in the job index, if it is enabled. Only jobs whose status has changed since it was
+        last recorded are written.
+
+        :param statuses: A dict of job identifier -> status
+        :return: None
+        """
+        if not self._job_index:
+            return
+
+        self._index_jobs({
+            job_identifier: {'status': status} for job_identifier, status in statuses.items()
+            if self._indexed_statuses.get(job_identifier) != status
+        })
+
+    def _index_listed_jobs(self, jobs):
+        """
+        Records jobs returned by get_jobs in the job index, if it is enabled
+
+        :param jobs: A list of job dicts, as returned by get_jobs
+        :return: None
+        """
+        self._index_jobs({
+            job['identifier']: {'status': job.get('status'), 'submitted_at': job.get('start_time')}
+            for job in jobs if 'identifier' in job
+        })
+
+    def start_job(self, script, tags=None):
+        """
+        Starts a job
+
+        :param script: The katscript defining the model to run
+        :param tags: An optional dict of tag key -> value to attach to the job, such as the parameter sweep it belongs
+        to. Jobs can be found by their tags with get_jobs and get_job_statuses.
+        :return: The job identifier
+        """
+        job_identifier = self._transport.start_job(script, tags)
+        self._index_jobs({job_identifier: {'status': JobStatus.PENDING, 'submitted_at': datetime.datetime.now()}})
+        return job_identifier
+
+    def start_jobs(self, scripts, tags=None):
+        """
+        Starts many jobs in a single round trip, such as the points of a parameter sweep
+
+        :param scripts: A list of katscripts
+        :param tags: An optional dict of tag key -> value to attach to all of the jobs, or a list with a dict of tags
+        for each job
+        :return: A list of job identifiers, in the same order as the scripts
+        """
+        job_identifiers = self._transport.start_jobs(scripts, tags)
+
+        now = datetime.datetime.now()
+        self._index_jobs({
+            job_identifier: {'status': JobStatus.PENDING, 'submitted_at': now} for job_identifier in job_identifiers
+        })
+
+        return job_identifiers
 
     def stop_job(self, job_identifier):
         return self._transport.stop_job(job_identifier)
 
-    def get_jobs(self):
-        return self._transport.get_jobs()
+    def get_jobs(self, status=None, since=None, until=None, limit=None, cursor=None, fields=None, archived=False,
+                 tags=None):
+        """
+        Gets the jobs, ordered by id and optionally filtered
+
+        :param status: Only include jobs with this status, or with any of the statuses if a list is provided
+        :param since: Only include jobs started at or after this time
+        :param until: Only include jobs started before this time
+        :param limit: The maximum number of jobs to return
+        :param cursor: Only include jobs with an id greater than this (the id of the last job of the previous page)
+        :param fields: The job fields to include, such as 'identifier', 'start_time', 'status' and 'tags'. The id is
+        always included. Defaults to 'id', 'identifier', 'start_time' and 'status'.
+        :param archived: If True, lists the jobs that have been archived by archive_jobs instead
+        :param tags: Only include jobs with all of the tags in this dict of tag key -> value
+        :return: A list of dicts representing the jobs
+        """
+        jobs = self._transport.get_jobs(status, since, until, limit, cursor, fields, archived, tags)
+        self._index_listed_jobs(jobs)
+        return jobs
+
+    def iter_jobs(self, status=None, since=None, until=None, fields=None, page_size=DEFAULT_JOBS_PAGE_SIZE,
+                  archived=False, tags=None):
+        """
+        Lazily iterates over the jobs, fetching them from the client a page at a time so that neither side needs to
+        hold every job in memory
+
+        :param status: Only include jobs with this status, or with any of the statuses if a list is provided
+        :param since: Only include jobs started at or after this time
+        :param until: Only include jobs started before this time
+        :param fields: The job fields to include, such as 'identifier', 'start_time', 'status', 'started_at' and
+        'tags'. The id is always included. Defaults to 'id', 'identifier', 'start_time' and 'status', the lifecycle
+        timestamps and tags are only included when requested.
+        :param page_size: The number of jobs fetched per round trip
+        :param archived: If True, iterates over the jobs that have been archived by archive_jobs instead
+        :param tags: Only include jobs with all of the tags in this dict of tag key -> value
+        :return: A generator of dicts representing the jobs
+        """
+        cursor = None
+        while True:
+            jobs = self._transport.get_jobs(status, since, until, page_size, cursor, fields, archived, tags)
+            self._index_listed_jobs(jobs)
+
+            yield from jobs
+
+            if len(jobs) < page_size:
+                return
+
+            cursor = jobs[-1]['id']
 
     def get_job_status(self, job_identifier):
-        return self._transport.get_job_status(job_identifier)
+        status = self._transport.get_job_status(job_identifier)
+        self._index_statuses({job_identifier: status})
+        return status
+
+    def get_job_statuses(self, job_identifiers=None, tags=None):
+        """
+        Gets the status of many jobs in a single round trip
+
+        :param job_identifiers: A list of job identifiers
+        :param tags: Instead of job identifiers, a dict of tag key -> value. Gets the status of all jobs with all of the
+        tags, such as every job of a parameter sweep.
+        :return: A dict of job identifier -> status. Jobs that could not be found are not included.
+        """
+        statuses = self._transport.get_job_statuses(job_identifiers, tags)
+        self._index_statuses(statuses)
+        return statuses
+
+    def get_client_metrics(self):
+        """
+        Gets the rpc metrics recorded by the client, to see where time is spent in calls to the client
+
+        :return: A dict containing the client's uptime in seconds, and a dict of rpc method name -> dict of the call
+        count, error count, total/min/max/mean latency in seconds, latency histogram, and bytes in and out for that
+        method
+        """
+        return self._transport.get_client_metrics()
+
+    def archive_jobs(self, before, compact=True):
+        """
+        Moves finished jobs submitted before the cutoff to an archive table in the client's database, so that they no
+        longer slow down queries on active jobs. Archived jobs can still be looked up by identifier, and listed with
+        get_jobs(archived=True).
+
+        :param before: Archive finished jobs submitted before this time
+        :param compact: If True, the database is compacted and its statistics refreshed afterwards
+        :return: The number of jobs archived
+        """
+        return self._transport.archive_jobs(before, compact)
+
+    def get_job_timing_stats(self, since=None, until=None):
+        """
+        Gets how long this session's jobs waited in the scheduler's queue (from submission until the job started
+        running) and how long they ran for, for example to size parameter sweeps for the backend
+
+        :param since: Only include jobs submitted at or after this time
+        :param until: Only include jobs submitted before this time
+        :return: A dict of 'queue_wait' and 'runtime', each a dict of the count, mean, p50, p95 and max in seconds.
+        The statistics are None if no jobs have been measured.
+        """
+        return self._transport.get_job_timing_stats(since, until)
+
+    def wait_for_jobs(self, job_identifiers, mode=WAIT_ANY, timeout=None):
+        """
+        Waits until any (or all) of the jobs have finished (completed, cancelled or otherwise stopped). The wait happens
+        inside the client, so finished jobs are noticed promptly without polling get_job_status.
+
+        :param job_identifiers: A list of job identifiers
+        :param mode: 'any' to return as soon as any of the jobs has finished, or 'all' to wait for all of the jobs
+        :param timeout: The maximum time to wait in seconds, or None to wait indefinitely
+        :return: A dict of job identifier -> status for the jobs that have finished. If the timeout expired this may
+        not include all (or any) of the jobs.
+        """
+        job_identifiers = list(job_identifiers)
+        if not job_identifiers:
+            return {}
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            # The client limits how long a single call can wait, so long waits are made up of several calls
+            remaining = MAX_WAIT_TIMEOUT if deadline is None else max(deadline - time.monotonic(), 0)
+            wait_timeout = min(remaining, MAX_WAIT_TIMEOUT)
+
+            start = time.monotonic()
+            finished = self._transport.wait_for_jobs(job_identifiers, mode, wait_timeout)
+            self._index_statuses(finished)
+
+            if is_wait_satisfied(finished, len(set(job_identifiers)), mode):
+                return finished
+
+            # The client returned without waiting because too many callers are already waiting
+            if (elapsed := time.monotonic() - start) < wait_timeout:
+                time.sleep(min(WAIT_BUSY_BACKOFF, wait_timeout - elapsed))
+                continue
+
+            # This call waited out the rest of the timeout
+            if deadline is not None and remaining <= MAX_WAIT_TIMEOUT:
+                return finished
 
     def get_job_file(self, job_identifier, file_path):
         return self._transport.get_job_file(job_identifier, file_path)
 
+    def iter_job_file(self, job_identifier, file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Streams a job file in chunks of at most chunk_size bytes
+
+        :param job_identifier: The identifier of the job
+        :param file_path: The path of the file relative to the job's working directory
+        :param chunk_size: The maximum size of each chunk
+        :return: A generator of bytes objects
+        """
+        return self._transport.iter_job_file(job_identifier, file_path, chunk_size)
+
+    def download_job_file(self, job_identifier, file_path, local_path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Streams a job file straight to a local file, so memory use doesn't depend on the size of the file
+
+        :param job_identifier: The identifier of the job
+        :param file_path: The path of the file relative to the job's working directory
+        :param local_path: The local path to write the file to
+        :param chunk_size: The maximum size of each chunk
+        :return: The number of bytes written
+        """
+        written = 0
+        with open(local_path, 'wb') as f:
+            for chunk in self.iter_job_file(job_identifier, file_path, chunk_size):
+                f.write(chunk)
+                written += len(chunk)
+
+        return written
+
     def get_job_file_list(self, job_identifier):
         return self._transport.get_job_file_list(job_identifier)
 
@@ -33,11 +290,8 @@ class AbstractSession(abc.ABC):
         if self.get_job_status(job_identifier) <= JobStatus.RUNNING:
             raise TransportGetJobSolutionException("Can't get solution as job is not yet finished")
 
-        result = self._transport.get_job_file(job_identifier, 'data.pickle')
-
         with NamedTemporaryFile() as f:
-            f.write(result)
-            f.flush()
+            self.download_job_file(job_identifier, 'data.pickle', f.name)
             return finesse.load(f.name, 'pickle')
 
     def terminate(self):
@@ -1,4 +1,5 @@
 import abc
+import datetime
 import logging
 import logging.handlers
 import pathlib
@@ -9,9 +10,22 @@ from threading import Thread
 from time import sleep
 
 from finorch.config.config import WrapperConfigManager
+from finorch.sessions.status_spool import append_status_report
+from finorch.utils.job_status import JobStatus
 from finorch.utils.port import test_port_open
 from finorch.utils.xmlrpc import XMLRPCServer
 
+# The longest (in seconds) the wrapper waits on the client when reporting the job's status, so a client that is shutting
+# down can't stop the wrapper from finishing
+STATUS_REPORT_TIMEOUT = 5
+
+
+class _TimeoutTransport(xmlrpc.client.Transport):
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = STATUS_REPORT_TIMEOUT
+        return connection
+
 
 class AbstractWrapper(abc.ABC):
     """
@@ -59,15 +73,19 @@ class AbstractWrapper(abc.ABC):
         while not test_port_open(port):
             sleep(0.1)  # pragma: no cover
 
-        # Touch the 'started' file
+        # Touch the 'started' file, which the client falls back to if the status report doesn't reach it
         pathlib.Path('started').touch()
+        self._report_status(JobStatus.RUNNING)
 
+        status = JobStatus.COMPLETED
         try:
             logging.info("Starting finesse job")
 
             try:
                 self.run()
             except Exception as exc:
+                status = JobStatus.ERROR
+
                 # An exception occurred, log the exception to the log file
                 logging.error("Error running finesse job")
                 logging.error(type(exc))
@@ -82,7 +100,9 @@ class AbstractWrapper(abc.ABC):
 
             logging.info("Finesse job completed")
         finally:
-            # Touch the 'finished' file
+            # Touch the 'finished' file once the job has been reported, so that nothing else is written to the exec path
+            # after the job is seen to be finished
+            self._report_status(status)
             pathlib.Path('finished').touch()
 
             try:
@@ -101,6 +121,62 @@ class AbstractWrapper(abc.ABC):
     def run(self):
         pass
 
+    @staticmethod
+    def _report_status(status):
+        """
+        Reports a change in the status of the job to the client, so that the client doesn't need to check the job's
+        marker files. The status is sent straight to the client if it can be reached from the wrapper, otherwise it is
+        appended to the status spool, which the client reads. The client writes the job identifier, the spool and its
+        port (where it can be reached) to the wrapper configuration when it starts the job.
+
+        :param status: The new status of the job
+        :return: None
+        """
+        config = WrapperConfigManager()
+        timestamp = datetime.datetime.now()
+
+        if not (job_identifier := config.get_job_identifier()):
+            # The wrapper wasn't started by a client, so there is nothing to report to
+            return
+
+        if client_port := config.get_client_port():
+            try:
+                client_rpc = xmlrpc.client.ServerProxy(
+                    f'http://localhost:{client_port}/rpc', transport=_TimeoutTransport(), allow_none=True
+                )
+                client_rpc.report_job_status(job_identifier, int(status), timestamp.timestamp())
+                return
+            except Exception as e:
+                logging.warning(f"Unable to report the job status to the client, using the status spool: {e}")
+
+        if not (spool_path := config.get_status_spool()):
+            return
+
+        try:
+            append_status_report(spool_path, job_identifier, status, timestamp)
+        except OSError as e:
+            # The client will find the status from the marker files instead
+            logging.warning(f"Unable to report the job status to the status spool: {e}")
+
+    @staticmethod
+    def write_config(exec_dir, job_identifier, spool_path, client_port=None):
+        """
+        Writes the configuration the wrapper needs to report the job's status. Called by the client before the job is
+        started.
+
+        :param exec_dir: The working directory of the job
+        :param job_identifier: The identifier of the job
+        :param spool_path: The path of the client's status spool
+        :param client_port: The port of the client, if the wrapper can reach the client directly
+        :return: None
+        """
+        config = WrapperConfigManager(exec_dir)
+        config.set_job_identifier(job_identifier)
+        config.set_status_spool(spool_path)
+
+        if client_port:
+            config.set_client_port(client_port)
+
     @staticmethod
     def prepare_log_file():
         """
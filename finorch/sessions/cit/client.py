@@ -1,11 +1,14 @@
 import logging
 import os
 import sys
+import threading
 import uuid
 import warnings
 from pathlib import Path
 
 from finorch.sessions.abstract_client import AbstractClient
+from finorch.sessions.abstract_wrapper import AbstractWrapper
+from finorch.sessions.status_spool import STATUS_SPOOL
 from finorch.transport.exceptions import TransportStartJobException
 from finorch.utils.cd import cd
 from finorch.utils.job_status import JobStatus
@@ -15,11 +18,55 @@ SUBMIT_SCRIPT = """#!/bin/bash
 {python} -m finorch.wrapper.wrapper cit
 """
 
+# The job ad attributes fetched when querying condor for the state of jobs
+CONDOR_QUERY_PROJECTION = ['ClusterId', 'JobStatus', 'ExitCode', 'HoldReason']
+
+# Maps condor's JobStatus codes to job statuses. Completed jobs (4) depend on their exit code. Held jobs (5) are
+# errors, stop_job marks a job as cancelled before holding it so that the held job is never seen as an error.
+CONDOR_JOB_STATUSES = {
+    1: JobStatus.QUEUED,  # Idle
+    2: JobStatus.RUNNING,  # Running
+    3: JobStatus.CANCELLED,  # Removed
+    5: JobStatus.ERROR,  # Held
+    6: JobStatus.RUNNING,  # Transferring output
+    7: JobStatus.QUEUED,  # Suspended
+}
+
 
 class CITClient(AbstractClient):
+    _uses_scheduler = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+        # The connection to the scheduler is shared by the request handling threads and the status reconciler
+        self._schedd_instance = None
+        self._schedd_lock = threading.Lock()
+
+    @property
+    def _schedd(self):
+        """
+        The connection to the condor scheduler, created when it is first needed and reused after that
+
+        :return: The htcondor Schedd
+        """
+        with self._schedd_lock:
+            if not self._schedd_instance:
+                warnings.filterwarnings("ignore")
+                import htcondor
+                self._schedd_instance = htcondor.Schedd()
+
+            return self._schedd_instance
+
+    def _reset_schedd(self):
+        """
+        Drops the connection to the condor scheduler, so that the next use reconnects
+
+        :return: None
+        """
+        with self._schedd_lock:
+            self._schedd_instance = None
+
     def _write_environment(self, environment_file):
         with open(environment_file, "w") as f:
             for k, v in os.environ.items():
@@ -41,6 +88,9 @@ class CITClient(AbstractClient):
             # Write the environment file
             self._write_environment(exec_dir / '.env')
 
+            # The wrapper can't reach the client from the compute node, so it reports the job's status to the spool
+            AbstractWrapper.write_config(exec_dir, job_identifier, self._exec_path / STATUS_SPOOL)
+
             submit_script_path = exec_dir / 'submit.sh'
             with open(submit_script_path, 'w') as f:
                 script = SUBMIT_SCRIPT.format(python=sys.executable)
@@ -66,7 +116,7 @@ class CITClient(AbstractClient):
                             "request_memory": "16G"
                         })
 
-                        result = htcondor.Schedd().submit(submit, count=1)
+                        result = self._schedd.submit(submit, count=1)
 
                     # Record the command and the output
                     logging.info(f"Success: condor submit succeeded, got ClusterId={result.cluster()}")
@@ -78,6 +128,9 @@ class CITClient(AbstractClient):
                     logging.error(f"Error: condor submit failed, trying again {attempt}/5")
                     logging.error(e)
 
+                    # Reconnect to the scheduler for the next attempt
+                    self._reset_schedd()
+
             raise TransportStartJobException("Unable to submit condor job. Condor submit failed 5 times in a row, "
                                              "assuming something is wrong.")
 
@@ -86,48 +139,85 @@ class CITClient(AbstractClient):
 
         warnings.filterwarnings("ignore")
         import htcondor
-        htcondor.Schedd().act(htcondor.JobAction.Hold, f"ClusterId == {job_id} && ProcID <= 1")
-
-    def start_job(self, katscript):
-        job_identifier = str(uuid.uuid4())
-
-        logging.info("Starting job with the following script")
-        logging.info(katscript)
-        logging.info(job_identifier)
-
-        condor_id = self._submit_condor_job(job_identifier, katscript)
-        self.db.add_job(job_identifier, condor_id)
-
-        return job_identifier
+        self._schedd.act(htcondor.JobAction.Hold, f"ClusterId == {job_id} && ProcID <= 1")
+
+    @staticmethod
+    def _condor_job_status(ad):
+        """
+        Gets the job status of a condor job ad
+
+        :param ad: The job ad, with the attributes in CONDOR_QUERY_PROJECTION
+        :return: The job status, or None if the condor status isn't known
+        """
+        if ad.get('JobStatus') == 4:
+            # Completed
+            return JobStatus.COMPLETED if ad.get('ExitCode', 0) == 0 else JobStatus.ERROR
+
+        if ad.get('JobStatus') == 5:
+            logging.info(f"Condor job {ad.get('ClusterId')} is held: {ad.get('HoldReason')}")
+
+        return CONDOR_JOB_STATUSES.get(ad.get('JobStatus'))
+
+    def _query_scheduler(self, batch_ids):
+        """
+        Gets the state of many condor jobs with a single query of the scheduler's queue. Jobs that have already left
+        the queue are looked up in the scheduler's history with a second query.
+
+        :param batch_ids: A list of condor ClusterIds
+        :return: A dict of ClusterId -> status for the jobs condor reported on
+        """
+        if not batch_ids:
+            return {}
+
+        statuses = {}
+        try:
+            constraint = f"member(ClusterId, {{{', '.join(str(batch_id) for batch_id in batch_ids)}}})"
+            for ad in self._schedd.query(constraint, CONDOR_QUERY_PROJECTION):
+                statuses[ad['ClusterId']] = self._condor_job_status(ad)
+
+            if missing := [batch_id for batch_id in batch_ids if batch_id not in statuses]:
+                constraint = f"member(ClusterId, {{{', '.join(str(batch_id) for batch_id in missing)}}})"
+                for ad in self._schedd.history(constraint, CONDOR_QUERY_PROJECTION, match=len(missing)):
+                    statuses[ad['ClusterId']] = self._condor_job_status(ad)
+        except Exception as e:
+            logging.error(f"Unable to query condor for the state of {len(batch_ids)} jobs: {e}")
+
+            # Reconnect to the scheduler for the next query
+            self._reset_schedd()
+
+        return {batch_id: status for batch_id, status in statuses.items() if status is not None}
+
+    def start_job(self, katscript, tags=None):
+        return self.start_jobs([katscript], [tags])[0]
+
+    def start_jobs(self, katscripts, tags=None):
+        jobs = []
+        try:
+            for katscript in katscripts:
+                job_identifier = str(uuid.uuid4())
+
+                logging.info("Starting job with the following script")
+                logging.info(katscript)
+                logging.info(job_identifier)
+
+                jobs.append((job_identifier, self._submit_condor_job(job_identifier, katscript)))
+        finally:
+            # Record the submitted jobs in a single transaction, including those submitted before a failure
+            job_identifiers = [job_identifier for job_identifier, _ in jobs]
+            self.db.add_jobs(jobs, self._job_tags(job_identifiers, tags))
+
+        return [job_identifier for job_identifier, _ in jobs]
 
     def terminate(self):
         return super().terminate()
 
-    def get_jobs(self):
-        jobs = self.db.get_jobs()
+    def get_jobs(self, status=None, since=None, until=None, limit=None, cursor=None, fields=None, archived=False,
+                 tags=None):
+        jobs = self.db.get_jobs(status, since, until, limit, cursor, fields, archived, tags)
         return jobs
 
     def get_job_status(self, job_identifier):
-        status = self.db.get_job_status(job_identifier)
-
-        # If the job status is less than or equal to RUNNING, then we need to derive the current job status and update
-        # the job status accordingly.
-        new_status = status
-        if status <= JobStatus.RUNNING:
-            # Check if the job is completed, or started, or queued
-            p = Path(self._exec_path)
-            if (p / job_identifier / 'finished').exists():
-                new_status = JobStatus.COMPLETED
-            elif (p / job_identifier / 'started').exists():
-                new_status = JobStatus.RUNNING
-            else:
-                new_status = JobStatus.QUEUED
-
-        # Update the job if the status has changed
-        if new_status != status:
-            self.db.update_job_status(job_identifier, new_status)
-
-        return new_status
+        return self._get_job_status(job_identifier)
 
     def get_job_file(self, job_identifier, file_path):
         full_file_path = Path(self._exec_path / job_identifier / file_path)
@@ -135,10 +225,13 @@ class CITClient(AbstractClient):
         if full_file_path.exists():
             try:
                 with open(full_file_path, 'rb') as f:
-                    return f.read()
+                    data = f.read()
             except Exception:
                 return None, f"Unable to retrieve file {full_file_path} as the file could not be read."
 
+            self.db.mark_job_downloaded(job_identifier)
+            return data
+
         return None, f"Unable to retrieve file {full_file_path} as the file does not exist."
 
     def get_job_file_list(self, job_identifier):
@@ -156,9 +249,15 @@ class CITClient(AbstractClient):
 
     def stop_job(self, job_identifier):
         # If the current job status is less than or equal to running, then cancel the job
-        if self.get_job_status(job_identifier) <= JobStatus.RUNNING:
-            # Tell condor to cancel the job
-            self._cancel_condor_job(self.db.get_job_batch_id(job_identifier))
+        if (status := self.get_job_status(job_identifier)) <= JobStatus.RUNNING:
+            # Mark the job as cancelled before condor holds it, so that the status reconciler never records the held
+            # job as an error
+            self._set_job_status(job_identifier, JobStatus.CANCELLED)
 
-            # Mark the job as cancelled
-            self.db.update_job_status(job_identifier, JobStatus.CANCELLED)
+            # Tell condor to cancel the job
+            try:
+                self._cancel_condor_job(self.db.get_job_batch_id(job_identifier))
+            except Exception:
+                # The job is still running
+                self._set_job_status(job_identifier, status)
+                raise
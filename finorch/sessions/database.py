@@ -1,24 +1,211 @@
 import datetime
 import logging
+import math
+import threading
+from contextlib import contextmanager
 
-from sqlalchemy import Column, Integer, String, DateTime
-from sqlalchemy import create_engine
+from sqlalchemy import Column, Index, Integer, String, DateTime
+from sqlalchemy import bindparam, create_engine, event, func, inspect, select, text, update
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
+from finorch.utils.dates import to_datetime
 from finorch.utils.job_status import JobStatus
 
 Base = declarative_base()
 
+# The maximum number of identifiers bound in a single IN clause. Older versions of SQLite limit a statement to 999
+# parameters.
+_MAX_IN_PARAMETERS = 900
 
-class Job(Base):
-    __tablename__ = 'job'
+# The job fields returned by get_jobs by default, and all of the fields that can be requested
+DEFAULT_JOB_FIELDS = ['id', 'identifier', 'start_time', 'status']
+JOB_FIELDS = DEFAULT_JOB_FIELDS + ['queued_at', 'started_at', 'finished_at', 'downloaded_at']
+
+# The lifecycle timestamp columns, which are filled in the first time a job reaches the corresponding status
+TIMESTAMP_COLUMNS = ['queued_at', 'started_at', 'finished_at']
+
+# Fields that get_jobs can include that aren't columns of the job table
+TAGS_FIELD = 'tags'
+
+# The page cache size of each connection in KiB (SQLite's default is 2MiB)
+_SQLITE_CACHE_SIZE_KIB = 16384
+
+# How long a connection waits for another process to release a lock on the database before giving up, in seconds
+_SQLITE_BUSY_TIMEOUT = 30
+
+# The number of connections kept open for reuse by the client's worker threads
+_POOL_SIZE = 8
+
+# The number of jobs moved to the archive per transaction by archive_jobs, so that writers aren't blocked for long
+_ARCHIVE_BATCH_SIZE = 10000
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Configures each new sqlite connection. Incremental auto vacuum lets compact() return free pages to the file system
+    without rebuilding the database. In WAL mode readers don't block writers (or vice versa), and a synchronous
+    level of NORMAL is safe with WAL - a power loss may lose the most recent commits, but can't corrupt the database.
+
+    :param dbapi_connection: The new sqlite3 connection
+    :param connection_record: The pool's record of the connection (unused)
+    :return: None
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        # Only takes effect for new databases, existing databases are converted by the first call to compact()
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
+        cursor.execute("PRAGMA journal_mode=WAL")
+        if cursor.fetchone()[0].lower() != 'wal':
+            # Some file systems (such as some network file systems) don't support WAL, sqlite keeps using the rollback
+            # journal on these
+            logging.warning("Unable to enable WAL journaling for the job database")
+
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{_SQLITE_CACHE_SIZE_KIB}")
+    finally:
+        cursor.close()
+
+
+class _JobColumns:
+    """
+    The columns shared by the job table and the job archive table
+    """
 
     id = Column(Integer, primary_key=True)
     batch_id = Column(Integer, unique=True, nullable=True)
     identifier = Column(String(40), unique=True)
-    start_time = Column(DateTime, default=datetime.datetime.now, nullable=False)
-    status = Column(Integer, default=JobStatus.PENDING)
+    start_time = Column(DateTime, default=datetime.datetime.now, nullable=False, index=True)
+    status = Column(Integer, default=JobStatus.PENDING, index=True)
+
+    # When the job was accepted by the scheduler, started running, finished (or was cancelled), and when its results
+    # were first downloaded
+    queued_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    downloaded_at = Column(DateTime, nullable=True)
+
+
+class Job(_JobColumns, Base):
+    __tablename__ = 'job'
+
+
+class ArchivedJob(_JobColumns, Base):
+    """
+    Finished jobs moved out of the job table by archive_jobs, so that they no longer slow down queries on active jobs
+    """
+    __tablename__ = 'job_archive'
+
+
+class JobTag(Base):
+    """
+    A key/value tag attached to a job when it was started, such as the parameter sweep the job belongs to. Tags are
+    keyed by job identifier, so they still apply once the job has been archived.
+    """
+    __tablename__ = 'job_tag'
+    __table_args__ = (
+        # Resolves a tag to its jobs without reading the tag table itself
+        Index('ix_job_tag_key_value', 'key', 'value', 'job_identifier'),
+    )
+
+    job_identifier = Column(String(40), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    value = Column(String(1024), nullable=False)
+
+
+def _tag_rows(tags):
+    """
+    Builds the rows of the tag table for many jobs
+
+    :param tags: A dict of job identifier -> dict of tag key -> value. Keys and values are stored as strings.
+    :return: A list of row dicts
+    """
+    return [
+        {'job_identifier': job_identifier, 'key': str(key), 'value': str(value)}
+        for job_identifier, job_tags in (tags or {}).items()
+        for key, value in (job_tags or {}).items()
+    ]
+
+
+def _filter_tags(query, identifier, tags):
+    """
+    Restricts a query to the jobs that have all of the specified tags. Each tag is resolved through the tag index.
+
+    :param query: The query to filter
+    :param identifier: The job identifier column of the query
+    :param tags: A dict of tag key -> value
+    :return: The filtered query
+    """
+    for key, value in tags.items():
+        query = query.where(
+            identifier.in_(select(JobTag.job_identifier).where(JobTag.key == str(key), JobTag.value == str(value)))
+        )
+
+    return query
+
+
+def _status_timestamp_column(status):
+    """
+    Gets the timestamp column that records when a job reached the specified status
+
+    :param status: The job status
+    :return: The name of the timestamp column, or None if the status has no timestamp
+    """
+    if status > JobStatus.RUNNING:
+        return 'finished_at'
+    elif status == JobStatus.RUNNING:
+        return 'started_at'
+    elif status == JobStatus.QUEUED:
+        return 'queued_at'
+
+    return None
+
+
+# Updates the status of a job. Timestamps are only set if they haven't been set before, so the first time the job
+# reached each status is kept
+_UPDATE_JOB_STATUS = update(Job.__table__).where(Job.identifier == bindparam('_identifier')).values(
+    status=bindparam('_status'),
+    **{
+        column: func.coalesce(Job.__table__.c[column], bindparam(f'_{column}', type_=DateTime))
+        for column in TIMESTAMP_COLUMNS
+    }
+)
+
+
+def _percentile(values, fraction):
+    """
+    Gets a percentile of a sorted list using the nearest rank method
+
+    :param values: A sorted list of values
+    :param fraction: The percentile to get, from 0 to 1
+    :return: The percentile, or None if there are no values
+    """
+    if not values:
+        return None
+
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+def create_sqlite_engine(path):
+    """
+    Creates an engine for a sqlite database. Connections are pooled so that each of the client's worker threads can
+    use its own connection, which is why connections may be used from threads other than the one that created them.
+
+    :param path: The path of the database file
+    :return: The engine
+    """
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={'check_same_thread': False, 'timeout': _SQLITE_BUSY_TIMEOUT},
+        poolclass=QueuePool,
+        pool_size=_POOL_SIZE,
+        max_overflow=-1
+    )
+    event.listen(engine, 'connect', _set_sqlite_pragmas)
+
+    return engine
 
 
 class Database:
@@ -31,27 +218,123 @@ class Database:
         logging.getLogger('sqlalchemy').setLevel(logging.ERROR)
 
         # Set up the sqlite database
-        self.engine = create_engine(f"sqlite:///{exec_path / 'db.sqlite3'}")
+        self.engine = create_sqlite_engine(exec_path / 'db.sqlite3')
 
         Base.metadata.create_all(self.engine)
+        self._upgrade_schema()
+
+        # Each thread gets its own session, so reads can run concurrently with each other and with a commit. Writes
+        # are still serialised by self._write_lock, since sqlite only allows one writer at a time
+        self.session = scoped_session(sessionmaker(bind=self.engine))
 
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
+        self._write_lock = threading.Lock()
 
-    def add_job(self, job_identifier, batch_id=None):
+    @contextmanager
+    def _session(self):
         """
-        Inserts a new job with the specified job identifier
+        Provides the calling thread's session, and releases its connection back to the pool once finished
+
+        :return: The session for the calling thread
+        """
+        try:
+            yield self.session()
+        finally:
+            self.session.remove()
+
+    def _upgrade_schema(self):
+        """
+        Brings a database created by an older version up to date. create_all only creates missing tables, so columns
+        and indexes added to existing tables since the database was created are created here.
+
+        :return: None
+        """
+        for table in (Job.__table__, ArchivedJob.__table__):
+            existing = {column['name'] for column in inspect(self.engine).get_columns(table.name)}
+            with self.engine.begin() as connection:
+                for column in table.columns:
+                    if column.name not in existing:
+                        # Added columns are always nullable, existing jobs have no value for them
+                        column_type = column.type.compile(dialect=self.engine.dialect)
+                        connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+            for index in table.indexes:
+                index.create(self.engine, checkfirst=True)
+
+    @staticmethod
+    def _status_update_parameters(job_identifier, status, timestamps=None):
+        """
+        Builds the parameters of _UPDATE_JOB_STATUS for a job
+
+        :param job_identifier: The identifier of the job
+        :param status: The new status of the job
+        :param timestamps: A dict of timestamp column -> time for times that are known more accurately than the time of
+        the update (such as from the job's marker files). The time of the update is used for the timestamp of the new
+        status if it isn't provided.
+        :return: A dict of parameters
+        """
+        timestamps = dict(timestamps or {})
+        if column := _status_timestamp_column(status):
+            timestamps.setdefault(column, datetime.datetime.now())
+
+        return {
+            '_identifier': job_identifier,
+            '_status': status,
+            **{f'_{column}': timestamps.get(column) for column in TIMESTAMP_COLUMNS}
+        }
+
+    def add_job(self, job_identifier, batch_id=None, tags=None):
+        """
+        Inserts a new job with the specified job identifier. A job with a batch id has already been accepted by the
+        scheduler, so it is recorded as queued.
 
         :param job_identifier: The job identifier
+        :param batch_id: The scheduler's identifier for the job, if it has been submitted
+        :param tags: An optional dict of tag key -> value to attach to the job
         :return: None
         """
         job = Job(
             identifier=job_identifier,
-            batch_id=batch_id
+            batch_id=batch_id,
+            queued_at=datetime.datetime.now() if batch_id is not None else None
         )
 
-        self.session.add(job)
-        self.session.commit()
+        with self._write_lock, self._session() as session:
+            session.add(job)
+
+            if rows := _tag_rows({job_identifier: tags}):
+                session.execute(JobTag.__table__.insert(), rows)
+
+            session.commit()
+
+        return True
+
+    def add_jobs(self, jobs, tags=None):
+        """
+        Inserts many jobs in a single transaction. Jobs with a batch id have already been accepted by the scheduler,
+        so they are recorded as queued.
+
+        :param jobs: A list of job identifiers, or of (job identifier, batch id) pairs
+        :param tags: An optional dict of job identifier -> dict of tag key -> value to attach to the jobs
+        :return: True
+        """
+        now = datetime.datetime.now()
+        rows = [
+            {'identifier': job, 'batch_id': None, 'queued_at': None} if isinstance(job, str) else
+            {'identifier': job[0], 'batch_id': job[1], 'queued_at': now if job[1] is not None else None}
+            for job in jobs
+        ]
+
+        if not rows:
+            return True
+
+        with self._write_lock, self._session() as session:
+            # Passing a list of rows executes the insert with executemany
+            session.execute(Job.__table__.insert(), rows)
+
+            if tag_rows := _tag_rows(tags):
+                session.execute(JobTag.__table__.insert(), tag_rows)
+
+            session.commit()
 
         return True
 
@@ -62,38 +345,288 @@ class Database:
         :param job_identifier: The identifier of the job
         :return: The status of the job (int) if the job was found, otherwise a Tuple of (None, *reason*)
         """
-        results = self.session.query(Job).filter(Job.identifier == job_identifier)
+        with self._session() as session:
+            result = session.query(Job.status).filter(Job.identifier == job_identifier).first()
+
+            if result is None:
+                # The job may have been archived
+                result = session.query(ArchivedJob.status).filter(ArchivedJob.identifier == job_identifier).first()
 
-        if results.count() != 1:
+        if result is None:
             return None, f"Job with with identifier {job_identifier} not found"
 
-        return results.first().status
+        return result.status
 
-    def update_job_status(self, job_identifier, new_status):
+    def get_job_statuses(self, job_identifiers=None, tags=None):
         """
-        Updates the status of a specified job
+        Gets the status of many jobs at once
+
+        :param job_identifiers: The identifiers of the jobs
+        :param tags: Instead of job identifiers, a dict of tag key -> value. The statuses of all jobs (including
+        archived jobs) with all of the tags are returned.
+        :return: A dict of job identifier -> status (int). Jobs that could not be found are not included.
+        """
+        if tags:
+            statuses = {}
+            with self._session() as session:
+                for model in (Job, ArchivedJob):
+                    statuses.update(
+                        session.execute(_filter_tags(select(model.identifier, model.status), model.identifier, tags))
+                        .all()
+                    )
+
+            return statuses
+
+        job_identifiers = list(job_identifiers or [])
+
+        statuses = {}
+        with self._session() as session:
+            # Jobs that aren't in the job table may have been archived
+            for model in (Job, ArchivedJob):
+                for i in range(0, len(job_identifiers), _MAX_IN_PARAMETERS):
+                    results = session.query(model.identifier, model.status).filter(
+                        model.identifier.in_(job_identifiers[i:i + _MAX_IN_PARAMETERS])
+                    )
+
+                    statuses.update(results.all())
+
+                job_identifiers = [identifier for identifier in job_identifiers if identifier not in statuses]
+
+        return statuses
+
+    def get_unfinished_jobs(self):
+        """
+        Gets the jobs that haven't finished yet, whose statuses may be out of date
+
+        :return: A dict of job identifier -> (status, batch id)
+        """
+        query = select(Job.identifier, Job.status, Job.batch_id).where(Job.status <= JobStatus.RUNNING).order_by(Job.id)
+
+        with self._session() as session:
+            return {identifier: (status, batch_id) for identifier, status, batch_id in session.execute(query)}
+
+    def get_finished_job_statuses(self, limit):
+        """
+        Gets the statuses of the most recently submitted jobs that have finished (completed, cancelled or otherwise
+        stopped), whose statuses can no longer change
+
+        :param limit: The maximum number of jobs to return
+        :return: A list of (job identifier, status) pairs, oldest first
+        """
+        query = select(Job.identifier, Job.status).where(Job.status > JobStatus.RUNNING).order_by(Job.id.desc())
+
+        with self._session() as session:
+            rows = session.execute(query.limit(int(limit))).all()
+
+        return [(identifier, status) for identifier, status in reversed(rows)]
+
+    def update_job_status(self, job_identifier, new_status, timestamps=None):
+        """
+        Updates the status of a specified job, and records when the job reached the status
 
         :param job_identifier: The identifier of the job
         :param new_status: The new status for the job
+        :param timestamps: Optional known times of the job's lifecycle, see _status_update_parameters
         :return: None
         """
-        results = self.session.query(Job).filter(Job.identifier == job_identifier)
-
-        if results.count() != 1:
+        with self._write_lock, self._session() as session:
+            # Update the row in place rather than loading it first, the number of updated rows tells us if the job
+            # exists
+            updated = session.execute(
+                _UPDATE_JOB_STATUS, self._status_update_parameters(job_identifier, new_status, timestamps)
+            ).rowcount
+            session.commit()
+
+        if updated != 1:
             return None, f"Job with with identifier {job_identifier} not found"
 
-        results.first().status = new_status
-        self.session.commit()
+        return True
+
+    def update_job_statuses(self, statuses, timestamps=None):
+        """
+        Updates the status of many jobs in a single transaction, and records when each job reached its status
+
+        :param statuses: A dict of job identifier -> new status. Jobs that could not be found are ignored.
+        :param timestamps: Optional dict of job identifier -> known times of the job's lifecycle, see
+        _status_update_parameters
+        :return: True
+        """
+        if not statuses:
+            return True
+
+        timestamps = timestamps or {}
+
+        with self._write_lock, self._session() as session:
+            session.execute(
+                _UPDATE_JOB_STATUS,
+                [
+                    self._status_update_parameters(identifier, status, timestamps.get(identifier))
+                    for identifier, status in statuses.items()
+                ]
+            )
+            session.commit()
+
+        return True
+
+    def mark_jobs_queued(self, job_identifiers):
+        """
+        Records that jobs have been accepted by the backend that runs them, if they haven't been queued before
+
+        :param job_identifiers: A list of job identifiers
+        :return: True
+        """
+        if not job_identifiers:
+            return True
+
+        with self._write_lock, self._session() as session:
+            session.execute(
+                update(Job.__table__).where(
+                    Job.identifier.in_(job_identifiers),
+                    Job.queued_at.is_(None)
+                ).values(queued_at=datetime.datetime.now())
+            )
+            session.commit()
+
+        return True
+
+    def mark_job_downloaded(self, job_identifier):
+        """
+        Records that the results of a finished job have been downloaded, if they haven't been downloaded before
+
+        :param job_identifier: The identifier of the job
+        :return: True
+        """
+        with self._write_lock, self._session() as session:
+            session.execute(
+                update(Job.__table__).where(
+                    Job.identifier == job_identifier,
+                    Job.status > JobStatus.RUNNING,
+                    Job.downloaded_at.is_(None)
+                ).values(downloaded_at=datetime.datetime.now())
+            )
+            session.commit()
 
         return True
 
-    def get_jobs(self):
+    def get_job_timing_stats(self, since=None, until=None):
+        """
+        Gets the distribution of how long jobs waited in the scheduler's queue, and how long they ran for
+
+        :param since: Only include jobs started at or after this time (datetime or ISO 8601 string)
+        :param until: Only include jobs started before this time (datetime or ISO 8601 string)
+        :return: A dict of 'queue_wait' and 'runtime', each a dict of the count, mean, p50, p95 and max in seconds.
+        The statistics are None if there are no jobs to measure.
+        """
+        intervals = {
+            'queue_wait': (Job.queued_at, Job.started_at),
+            'runtime': (Job.started_at, Job.finished_at),
+        }
+
+        stats = {}
+        with self._session() as session:
+            for name, (begin, end) in intervals.items():
+                # julianday is only accurate to around a millisecond, so round the interval to the nearest millisecond
+                seconds = func.round((func.julianday(end) - func.julianday(begin)) * 86400, 3)
+                query = select(seconds).where(begin.isnot(None), end.isnot(None)).order_by(seconds)
+
+                if since is not None:
+                    query = query.where(Job.start_time >= to_datetime(since))
+
+                if until is not None:
+                    query = query.where(Job.start_time < to_datetime(until))
+
+                values = session.execute(query).scalars().all()
+
+                stats[name] = {
+                    'count': len(values),
+                    'mean': sum(values) / len(values) if values else None,
+                    'p50': _percentile(values, 0.5),
+                    'p95': _percentile(values, 0.95),
+                    'max': values[-1] if values else None,
+                }
+
+        return stats
+
+    def get_job_tags(self, job_identifiers):
+        """
+        Gets the tags of many jobs at once
+
+        :param job_identifiers: The identifiers of the jobs
+        :return: A dict of job identifier -> dict of tag key -> value. Jobs without tags are not included.
         """
-        Gets the list of jobs
+        job_identifiers = list(job_identifiers)
 
-        :return: A list of dictionaries containing job information
+        tags = {}
+        with self._session() as session:
+            for i in range(0, len(job_identifiers), _MAX_IN_PARAMETERS):
+                rows = session.execute(
+                    select(JobTag.job_identifier, JobTag.key, JobTag.value).where(
+                        JobTag.job_identifier.in_(job_identifiers[i:i + _MAX_IN_PARAMETERS])
+                    )
+                )
+
+                for job_identifier, key, value in rows:
+                    tags.setdefault(job_identifier, {})[key] = value
+
+        return tags
+
+    def get_jobs(self, status=None, since=None, until=None, limit=None, cursor=None, fields=None, archived=False,
+                 tags=None):
         """
-        data = [r._asdict() for r in self.session.query(Job.id, Job.identifier, Job.start_time, Job.status).all()]
+        Gets the list of jobs, ordered by id. Large lists can be fetched a page at a time by passing the id of the last
+        job of the previous page as the cursor, which (unlike an offset) stays fast however deep the page is.
+
+        :param status: Only include jobs with this status, or with any of the statuses if a list is provided
+        :param since: Only include jobs started at or after this time (datetime or ISO 8601 string)
+        :param until: Only include jobs started before this time (datetime or ISO 8601 string)
+        :param limit: The maximum number of jobs to return
+        :param cursor: Only include jobs with an id greater than this
+        :param fields: The job fields to include, from JOB_FIELDS, or TAGS_FIELD for a dict of the job's tags. The id
+        is always included. Defaults to DEFAULT_JOB_FIELDS.
+        :param archived: If True, lists the jobs that have been archived by archive_jobs instead
+        :param tags: Only include jobs with all of the tags in this dict of tag key -> value
+        :return: A list of dictionaries containing job information, otherwise a Tuple of (None, *reason*)
+        """
+        model = ArchivedJob if archived else Job
+
+        fields = DEFAULT_JOB_FIELDS if fields is None else ['id'] + [f for f in fields if f != 'id']
+        if invalid := set(fields) - set(JOB_FIELDS) - {TAGS_FIELD}:
+            return None, f"Invalid job fields {', '.join(sorted(invalid))}"
+
+        # The tags are read separately, which needs the job identifier
+        columns = [field for field in fields if field != TAGS_FIELD]
+        if TAGS_FIELD in fields and 'identifier' not in columns:
+            columns.append('identifier')
+
+        query = select(*[getattr(model, column) for column in columns]).order_by(model.id)
+
+        if tags:
+            query = _filter_tags(query, model.identifier, tags)
+
+        if status is not None:
+            query = query.where(model.status.in_(status if isinstance(status, (list, tuple)) else [status]))
+
+        if since is not None:
+            query = query.where(model.start_time >= to_datetime(since))
+
+        if until is not None:
+            query = query.where(model.start_time < to_datetime(until))
+
+        if cursor is not None:
+            query = query.where(model.id > int(cursor))
+
+        if limit is not None:
+            query = query.limit(int(limit))
+
+        with self._session() as session:
+            data = [r._asdict() for r in session.execute(query)]
+
+        if TAGS_FIELD in fields:
+            job_tags = self.get_job_tags([job['identifier'] for job in data])
+
+            for job in data:
+                job_identifier = job['identifier'] if 'identifier' in fields else job.pop('identifier')
+                job[TAGS_FIELD] = job_tags.get(job_identifier, {})
 
         return data
 
@@ -104,9 +637,67 @@ class Database:
         :param job_identifier: The identifier of the job
         :return: The batch_id of the job or None
         """
-        results = self.session.query(Job).filter(Job.identifier == job_identifier)
+        with self._session() as session:
+            result = session.query(Job.batch_id).filter(Job.identifier == job_identifier).first()
 
-        if results.count() != 1:
+            if result is None:
+                # The job may have been archived
+                result = session.query(ArchivedJob.batch_id).filter(ArchivedJob.identifier == job_identifier).first()
+
+        if result is None:
             return None, f"Job with with identifier {job_identifier} not found"
 
-        return results.first().batch_id
+        return result.batch_id
+
+    def archive_jobs(self, before):
+        """
+        Moves finished jobs submitted before the cutoff from the job table to the archive table, which keeps the job
+        table (and its indexes) small. Archived jobs can still be looked up by identifier, and listed with
+        get_jobs(archived=True). Jobs are moved in batches so that other writers aren't blocked for long.
+
+        :param before: Archive finished jobs submitted before this time (datetime or ISO 8601 string)
+        :return: The number of jobs archived
+        """
+        columns = [column.name for column in Job.__table__.columns]
+        finished = (Job.status > JobStatus.RUNNING, Job.start_time < to_datetime(before))
+
+        archived = 0
+        while True:
+            with self._write_lock, self._session() as session:
+                ids = session.execute(
+                    select(Job.id).where(*finished).order_by(Job.id).limit(_ARCHIVE_BATCH_SIZE)
+                ).scalars().all()
+
+                if not ids:
+                    return archived
+
+                batch = (*finished, Job.id <= ids[-1])
+                session.execute(
+                    ArchivedJob.__table__.insert().from_select(
+                        columns, select(*[Job.__table__.c[column] for column in columns]).where(*batch)
+                    )
+                )
+                session.execute(Job.__table__.delete().where(*batch))
+                session.commit()
+
+            archived += len(ids)
+
+    def compact(self):
+        """
+        Returns free space in the database file to the file system, and refreshes the statistics the query planner uses
+        to choose indexes. Databases created before incremental auto vacuum was enabled are rebuilt in full the first
+        time.
+
+        :return: None
+        """
+        with self._write_lock, self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            if connection.execute(text('PRAGMA auto_vacuum')).scalar() == 2:
+                connection.execute(text('PRAGMA incremental_vacuum'))
+            else:
+                connection.execute(text('PRAGMA auto_vacuum=INCREMENTAL'))
+                connection.execute(text('VACUUM'))
+
+            connection.execute(text('ANALYZE'))
+
+            # Fold the write ahead log back in to the database and truncate it
+            connection.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
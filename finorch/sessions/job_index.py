@@ -0,0 +1,153 @@
+import datetime
+import threading
+
+from sqlalchemy import Column, DateTime, Integer, String, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.declarative import declarative_base
+
+from finorch.config.config import api_config_manager
+from finorch.sessions.database import create_sqlite_engine
+from finorch.utils.dates import to_datetime
+from finorch.utils.job_status import JobStatus
+
+IndexBase = declarative_base()
+
+# The name of the job index database in the configuration directory
+JOB_INDEX_FILE = 'job_index.sqlite3'
+
+
+class IndexedJob(IndexBase):
+    __tablename__ = 'indexed_job'
+
+    id = Column(Integer, primary_key=True)
+    identifier = Column(String(40), unique=True, nullable=False)
+    callsign = Column(String(40), nullable=False, index=True)
+    host = Column(String(255), nullable=True, index=True)
+    exec_path = Column(String(4096), nullable=True)
+    status = Column(Integer, nullable=True, index=True)
+
+    # When the job was submitted, when its details were last recorded, and when it was first seen to have finished
+    submitted_at = Column(DateTime, nullable=True, index=True)
+    updated_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class JobIndex:
+    """
+    An index of the jobs run by every session on this machine, kept in the configuration directory. Sessions record
+    jobs in the index as they are started and as their statuses are fetched, so jobs from all sessions can be found
+    without connecting to each of them.
+    """
+
+    def __init__(self, path=None):
+        """
+        Opens (and creates if needed) the job index
+
+        :param path: The path of the index database. Defaults to JOB_INDEX_FILE in the configuration directory.
+        """
+        self.engine = create_sqlite_engine(path or api_config_manager.get_config_directory() / JOB_INDEX_FILE)
+        IndexBase.metadata.create_all(self.engine)
+
+        self._write_lock = threading.Lock()
+
+    def record_jobs(self, callsign, host, exec_path, jobs):
+        """
+        Records (or updates) jobs in the index
+
+        :param callsign: The callsign of the session that ran the jobs
+        :param host: The host the jobs ran on
+        :param exec_path: The path the jobs ran in on the host
+        :param jobs: A dict of job identifier -> dict of the details to record, any of 'status' and 'submitted_at'.
+        Details that aren't provided keep their recorded value.
+        :return: None
+        """
+        if not jobs:
+            return
+
+        now = datetime.datetime.now()
+        rows = [
+            {
+                'identifier': identifier,
+                'callsign': callsign,
+                'host': host,
+                'exec_path': str(exec_path) if exec_path else None,
+                'status': details.get('status'),
+                'submitted_at': to_datetime(details['submitted_at']) if details.get('submitted_at') else None,
+                'updated_at': now,
+                'finished_at': now if (details.get('status') or 0) > JobStatus.RUNNING else None,
+            }
+            for identifier, details in jobs.items()
+        ]
+
+        statement = insert(IndexedJob.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=[IndexedJob.identifier],
+            set_={
+                'status': func.coalesce(statement.excluded.status, IndexedJob.status),
+                'submitted_at': func.coalesce(IndexedJob.submitted_at, statement.excluded.submitted_at),
+                'updated_at': statement.excluded.updated_at,
+                'finished_at': func.coalesce(IndexedJob.finished_at, statement.excluded.finished_at),
+            }
+        )
+
+        with self._write_lock, self.engine.begin() as connection:
+            connection.execute(statement, rows)
+
+    def get_jobs(self, callsign=None, host=None, status=None, since=None, until=None, limit=None, cursor=None):
+        """
+        Finds jobs in the index, ordered by the order they were first recorded. Large lists can be fetched a page at a
+        time by passing the id of the last job of the previous page as the cursor.
+
+        :param callsign: Only include jobs run by sessions with this callsign
+        :param host: Only include jobs run on this host
+        :param status: Only include jobs with this status, or with any of the statuses if a list is provided
+        :param since: Only include jobs submitted at or after this time (datetime or ISO 8601 string)
+        :param until: Only include jobs submitted before this time (datetime or ISO 8601 string)
+        :param limit: The maximum number of jobs to return
+        :param cursor: Only include jobs with an id greater than this
+        :return: A list of dicts of the recorded details of the jobs
+        """
+        query = select(IndexedJob.__table__).order_by(IndexedJob.id)
+
+        if callsign is not None:
+            query = query.where(IndexedJob.callsign == callsign)
+
+        if host is not None:
+            query = query.where(IndexedJob.host == host)
+
+        if status is not None:
+            query = query.where(IndexedJob.status.in_(status if isinstance(status, (list, tuple)) else [status]))
+
+        if since is not None:
+            query = query.where(IndexedJob.submitted_at >= to_datetime(since))
+
+        if until is not None:
+            query = query.where(IndexedJob.submitted_at < to_datetime(until))
+
+        if cursor is not None:
+            query = query.where(IndexedJob.id > int(cursor))
+
+        if limit is not None:
+            query = query.limit(int(limit))
+
+        with self.engine.connect() as connection:
+            return [dict(row._mapping) for row in connection.execute(query)]
+
+
+_job_index = None
+_job_index_lock = threading.Lock()
+
+
+def get_job_index():
+    """
+    Gets the shared job index for this process, opening it the first time it is needed
+
+    :return: The JobIndex
+    """
+    global _job_index
+
+    with _job_index_lock:
+        if _job_index is None:
+            _job_index = JobIndex()
+
+        return _job_index
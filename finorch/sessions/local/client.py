@@ -4,12 +4,15 @@ import sys
 import uuid
 
 from pathlib import Path
+
+from finorch.config.config import client_config_manager, STATUS_WATCHER_INOTIFY, STATUS_WATCHER_OFF
 from finorch.sessions.abstract_client import AbstractClient
 from finorch.sessions.abstract_wrapper import AbstractWrapper
-from finorch.utils.job_status import JobStatus
+from finorch.sessions.local.watcher import JobMarkerWatcher
+from finorch.sessions.status_spool import STATUS_SPOOL
 
 
-def _start_wrapper(_exec_path, _job_identifier, _session_klass, katscript):
+def _start_wrapper(_exec_path, _job_identifier, _session_klass, katscript, _client_port=None):
     """
     Executed in another process to start the job
     :return: None
@@ -18,6 +21,9 @@ def _start_wrapper(_exec_path, _job_identifier, _session_klass, katscript):
     os.makedirs(exec_dir)
     os.chdir(exec_dir)
 
+    # The wrapper runs on the same machine as the client, so it can report the job's status to the client directly
+    AbstractWrapper.write_config(exec_dir, _job_identifier, _exec_path / STATUS_SPOOL, _client_port)
+
     sys.stdout = open(str(exec_dir / 'out.log'), "w")
     sys.stderr = open(str(exec_dir / 'out.err'), "w")
 
@@ -36,56 +42,85 @@ class LocalClient(AbstractClient):
         from concurrent.futures import ProcessPoolExecutor
         self._executor = ProcessPoolExecutor()
 
-    def start_job(self, katscript):
-        job_identifier = str(uuid.uuid4())
+        self._watcher = None
+
+    def set_exec_path(self, path):
+        super().set_exec_path(path)
+
+        if self._watcher:
+            self._watcher.stop()
+            self._watcher = None
 
-        self.db.add_job(job_identifier)
+        mode = client_config_manager.get_status_watcher()
+        self._markers_watched = mode != STATUS_WATCHER_OFF
 
-        logging.info("Starting job with the following script")
-        logging.info(katscript)
-        logging.info(job_identifier)
+        if self._markers_watched:
+            # Watch the jobs that were still running when the client was last stopped, as well as new jobs
+            self._watcher = JobMarkerWatcher(self._exec_path, self._on_job_markers, mode == STATUS_WATCHER_INOTIFY)
+            self._watcher.add_jobs(self.db.get_unfinished_jobs())
+            self._watcher.start()
 
-        self._executor.submit(
-            _start_wrapper,
-            self._exec_path,
-            job_identifier,
-            self._session_klass,
-            katscript
+    def _on_job_markers(self, markers):
+        """
+        Updates the status of jobs as the watcher sees their marker files written
+
+        :param markers: A dict of job identifier -> dict of marker file name -> modification time
+        :return: None
+        """
+        # The wrapper reports a failed job before touching its 'finished' marker, which must not complete the job
+        self._advance_job_statuses(
+            {job_identifier: self._status_from_markers(m) for job_identifier, m in markers.items()},
+            {job_identifier: self._marker_timestamps(m) for job_identifier, m in markers.items()}
         )
 
-        return job_identifier
+    def start_job(self, katscript, tags=None):
+        return self.start_jobs([katscript], [tags])[0]
+
+    def start_jobs(self, katscripts, tags=None):
+        job_identifiers = [str(uuid.uuid4()) for _ in katscripts]
+
+        # Record all of the jobs in a single transaction
+        self.db.add_jobs(job_identifiers, self._job_tags(job_identifiers, tags))
+
+        # Watch the jobs before they start, so that none of their markers are missed
+        if self._watcher:
+            self._watcher.add_jobs(job_identifiers)
+
+        client_port = self._xml_rpc_server.server_address[1] if self._xml_rpc_server else None
+
+        for job_identifier, katscript in zip(job_identifiers, katscripts):
+            logging.info("Starting job with the following script")
+            logging.info(katscript)
+            logging.info(job_identifier)
+
+            self._executor.submit(
+                _start_wrapper,
+                self._exec_path,
+                job_identifier,
+                self._session_klass,
+                katscript,
+                client_port
+            )
+
+        # The jobs are queued once the process pool has accepted them, and start when a worker is free
+        self.db.mark_jobs_queued(job_identifiers)
+
+        return job_identifiers
 
     def terminate(self):
+        if self._watcher:
+            self._watcher.stop()
+            self._watcher = None
+
         return super().terminate()
 
-    def get_jobs(self):
-        jobs = self.db.get_jobs()
+    def get_jobs(self, status=None, since=None, until=None, limit=None, cursor=None, fields=None, archived=False,
+                 tags=None):
+        jobs = self.db.get_jobs(status, since, until, limit, cursor, fields, archived, tags)
         return jobs
 
     def get_job_status(self, job_identifier):
-        status = self.db.get_job_status(job_identifier)
-
-        if type(status) is tuple:
-            return status
-
-        # If the job status is less than or equal to RUNNING, then we need to derive the current job status and update
-        # the job status accordingly.
-        new_status = status
-        if status <= JobStatus.RUNNING:
-            # Check if the job is completed, or started, or queued
-            p = Path(self._exec_path)
-            if (p / job_identifier / 'finished').exists():
-                new_status = JobStatus.COMPLETED
-            elif (p / job_identifier / 'started').exists():
-                new_status = JobStatus.RUNNING
-            else:
-                new_status = JobStatus.QUEUED
-
-        # Update the job if the status has changed
-        if new_status != status:
-            self.db.update_job_status(job_identifier, new_status)
-
-        return new_status
+        return self._get_job_status(job_identifier)
 
     def get_job_file(self, job_identifier, file_path):
         full_file_path = Path(self._exec_path / job_identifier / file_path)
@@ -93,10 +128,13 @@ class LocalClient(AbstractClient):
         if full_file_path.exists():
             try:
                 with open(full_file_path, 'rb') as f:
-                    return f.read()
+                    data = f.read()
             except Exception:
                 return None, f"Unable to retrieve file {full_file_path} as the file could not be read."
 
+            self.db.mark_job_downloaded(job_identifier)
+            return data
+
         return None, f"Unable to retrieve file {full_file_path} as the file does not exist."
 
     def get_job_file_list(self, job_identifier):
@@ -0,0 +1,249 @@
+import datetime
+import logging
+import os
+import select
+import threading
+
+from finorch.sessions.abstract_client import STARTED_MARKER, FINISHED_MARKER
+from finorch.utils.inotify import Inotify, inotify_available, IN_ATTRIB, IN_CREATE, IN_IGNORED, IN_ISDIR, \
+    IN_MOVED_TO, IN_Q_OVERFLOW
+
+# How often (in seconds) jobs that aren't watched with inotify are checked for new marker files
+WATCHER_POLL_INTERVAL = 1
+
+# The events watched for in the exec path (new job directories) and in each job directory (new marker files)
+_EXEC_PATH_EVENTS = IN_CREATE | IN_MOVED_TO
+_JOB_EVENTS = IN_CREATE | IN_MOVED_TO | IN_ATTRIB
+
+
+class JobMarkerWatcher:
+    """
+    Watches the directories of unfinished jobs for the marker files written by the wrapper, and reports the markers of
+    each job as they appear. Linux inotify is used where it's available, so markers are seen as soon as they're
+    written without touching the file system otherwise. Jobs that can't be watched with inotify (or every job, if
+    inotify isn't available) are checked by scanning their directories every poll interval instead.
+    """
+
+    def __init__(self, exec_path, on_markers, use_inotify=True, poll_interval=WATCHER_POLL_INTERVAL):
+        """
+        Creates the watcher
+
+        :param exec_path: The path containing the job directories
+        :param on_markers: Called from the watcher thread with a dict of job identifier -> dict of marker file name ->
+        modification time (datetime), for the jobs that have new markers
+        :param use_inotify: False to always scan the job directories instead of using inotify
+        :param poll_interval: How often (in seconds) the jobs that aren't watched with inotify are scanned
+        """
+        self._exec_path = exec_path
+        self._on_markers = on_markers
+        self._poll_interval = poll_interval
+
+        # Job identifier -> the names of the markers already reported for the job
+        self._jobs = {}
+
+        # Jobs that are scanned every poll interval, and inotify watch descriptor -> job identifier for the rest
+        self._polled = set()
+        self._watches = {}
+        self._exec_path_wd = None
+
+        self._lock = threading.Lock()
+
+        # Held while reporting, so that a job's markers are always reported in the order they were written
+        self._report_lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._wake_read, self._wake_write = os.pipe()
+        self._thread = None
+
+        self._inotify = None
+        if use_inotify and inotify_available():
+            try:
+                self._inotify = Inotify()
+                self._exec_path_wd = self._inotify.add_watch(self._exec_path, _EXEC_PATH_EVENTS)
+            except OSError as e:
+                logging.warning(f"Unable to watch {self._exec_path} with inotify, job directories will be scanned: {e}")
+                self._close_inotify()
+
+    @property
+    def uses_inotify(self):
+        return self._inotify is not None
+
+    def add_jobs(self, job_identifiers):
+        """
+        Starts watching jobs for marker files. Jobs should be added before they are started, so that no markers are
+        missed.
+
+        :param job_identifiers: The identifiers of the jobs
+        :return: None
+        """
+        with self._lock:
+            for job_identifier in job_identifiers:
+                self._jobs.setdefault(job_identifier, frozenset())
+
+                if self._inotify:
+                    # The job directory may already exist, otherwise it will be watched once it is created
+                    self._watch_job(job_identifier)
+                else:
+                    self._polled.add(job_identifier)
+
+        # Report any markers written before the job was watched
+        self._scan(job_identifiers)
+
+    def start(self):
+        """
+        Starts the watcher thread
+
+        :return: None
+        """
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the watcher thread and releases the inotify instance
+
+        :return: None
+        """
+        self._stop.set()
+        os.write(self._wake_write, b'\0')
+
+        if self._thread:
+            self._thread.join()
+
+        self._close_inotify()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+    def _close_inotify(self):
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+
+    def _watch_job(self, job_identifier):
+        """
+        Watches a job's directory with inotify, or polls the job if the directory can't be watched. Called with the
+        lock held.
+
+        :param job_identifier: The identifier of the job
+        :return: None
+        """
+        if job_identifier in self._watches.values():
+            return
+
+        try:
+            self._watches[self._inotify.add_watch(self._exec_path / job_identifier, _JOB_EVENTS)] = job_identifier
+        except FileNotFoundError:
+            # The job directory hasn't been created yet
+            pass
+        except OSError as e:
+            # Most likely the user's inotify watch limit has been reached
+            logging.warning(f"Unable to watch job {job_identifier} with inotify, it will be scanned instead: {e}")
+            self._polled.add(job_identifier)
+
+    def _unwatch_job(self, job_identifier):
+        """
+        Stops watching a finished job. Called with the lock held.
+
+        :param job_identifier: The identifier of the job
+        :return: None
+        """
+        self._jobs.pop(job_identifier, None)
+        self._polled.discard(job_identifier)
+
+        for wd in [wd for wd, watched in self._watches.items() if watched == job_identifier]:
+            del self._watches[wd]
+            self._inotify.rm_watch(wd)
+
+    def _scan(self, job_identifiers):
+        """
+        Scans the directories of jobs for markers, and reports the jobs with new markers
+
+        :param job_identifiers: The identifiers of the jobs to scan
+        :return: None
+        """
+        found = {}
+        for job_identifier in job_identifiers:
+            try:
+                with os.scandir(self._exec_path / job_identifier) as entries:
+                    found[job_identifier] = {
+                        e.name: e.stat().st_mtime for e in entries if e.name in (STARTED_MARKER, FINISHED_MARKER)
+                    }
+            except (FileNotFoundError, NotADirectoryError):
+                # The job directory hasn't been created yet
+                pass
+
+        self._report(found)
+
+    def _report(self, found):
+        """
+        Reports the jobs that have markers that haven't been reported before
+
+        :param found: A dict of job identifier -> dict of marker name -> modification time (seconds since the epoch)
+        :return: None
+        """
+        with self._report_lock:
+            new = {}
+            with self._lock:
+                for job_identifier, markers in found.items():
+                    if job_identifier not in self._jobs or not set(markers) - self._jobs[job_identifier]:
+                        continue
+
+                    self._jobs[job_identifier] = frozenset(markers)
+                    new[job_identifier] = {
+                        name: datetime.datetime.fromtimestamp(mtime) for name, mtime in markers.items()
+                    }
+
+                    # Finished jobs don't need to be watched any more
+                    if FINISHED_MARKER in markers:
+                        self._unwatch_job(job_identifier)
+
+            if new:
+                try:
+                    self._on_markers(new)
+                except Exception as e:
+                    logging.error(f"Unable to update the status of {len(new)} jobs: {e}")
+
+    def _handle_events(self):
+        """
+        Reads the inotify events that are ready, and scans the jobs they are for
+
+        :return: None
+        """
+        changed = set()
+        with self._lock:
+            for wd, mask, name in self._inotify.read_events():
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost, so check every job
+                    changed.update(self._jobs)
+                elif wd == self._exec_path_wd:
+                    if mask & IN_ISDIR and name in self._jobs:
+                        # A job directory was created, the job may have written markers before it was watched
+                        self._watch_job(name)
+                        changed.add(name)
+                elif mask & IN_IGNORED:
+                    # The job directory was removed
+                    self._watches.pop(wd, None)
+                elif name in (STARTED_MARKER, FINISHED_MARKER) and wd in self._watches:
+                    changed.add(self._watches[wd])
+
+        self._scan(changed)
+
+    def _run(self):
+        fds = [self._wake_read] + ([self._inotify.fileno()] if self._inotify else [])
+
+        while not self._stop.is_set():
+            try:
+                ready, _, _ = select.select(fds, [], [], self._poll_interval)
+
+                if self._stop.is_set():
+                    return
+
+                if self._inotify and self._inotify.fileno() in ready:
+                    self._handle_events()
+
+                with self._lock:
+                    polled = list(self._polled)
+
+                self._scan(polled)
+            except Exception as e:
+                logging.error(f"Error watching jobs for marker files: {e}")
@@ -6,6 +6,8 @@ import uuid
 from pathlib import Path
 
 from finorch.sessions.abstract_client import AbstractClient
+from finorch.sessions.abstract_wrapper import AbstractWrapper
+from finorch.sessions.status_spool import STATUS_SPOOL
 from finorch.transport.exceptions import TransportStartJobException
 from finorch.utils.cd import cd
 from finorch.utils.job_status import JobStatus
@@ -21,8 +23,38 @@ SLURM_SCRIPT = """#!/bin/bash
 {python} -m finorch.wrapper.wrapper ozstar
 """
 
+# Maps the job states reported by slurm to job statuses. Jobs that slurm stopped before they finished (such as jobs
+# that ran out of memory or time, or whose node failed) are errors, since the wrapper never got to finish them.
+# Preempted jobs are queued, since slurm requeues them by default and job statuses never move backwards.
+SLURM_STATES = {
+    'PENDING': JobStatus.QUEUED,
+    'CONFIGURING': JobStatus.QUEUED,
+    'REQUEUED': JobStatus.QUEUED,
+    'REQUEUE_FED': JobStatus.QUEUED,
+    'REQUEUE_HOLD': JobStatus.QUEUED,
+    'RESV_DEL_HOLD': JobStatus.QUEUED,
+    'SUSPENDED': JobStatus.QUEUED,
+    'RUNNING': JobStatus.RUNNING,
+    'COMPLETING': JobStatus.RUNNING,
+    'STAGE_OUT': JobStatus.RUNNING,
+    'RESIZING': JobStatus.RUNNING,
+    'SIGNALING': JobStatus.RUNNING,
+    'COMPLETED': JobStatus.COMPLETED,
+    'CANCELLED': JobStatus.CANCELLED,
+    'REVOKED': JobStatus.CANCELLED,
+    'FAILED': JobStatus.ERROR,
+    'TIMEOUT': JobStatus.ERROR,
+    'OUT_OF_MEMORY': JobStatus.ERROR,
+    'NODE_FAIL': JobStatus.ERROR,
+    'BOOT_FAIL': JobStatus.ERROR,
+    'DEADLINE': JobStatus.ERROR,
+    'PREEMPTED': JobStatus.QUEUED,
+}
+
 
 class OzStarClient(AbstractClient):
+    _uses_scheduler = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -47,6 +79,9 @@ class OzStarClient(AbstractClient):
             # Write the environment file
             self._write_environment(exec_dir / '.env')
 
+            # The wrapper can't reach the client from the compute node, so it reports the job's status to the spool
+            AbstractWrapper.write_config(exec_dir, job_identifier, self._exec_path / STATUS_SPOOL)
+
             # Write the slurm submission script
             slurm_script_path = exec_dir / 'submit.sh'
             with open(slurm_script_path, 'w') as f:
@@ -87,46 +122,68 @@ class OzStarClient(AbstractClient):
         # Get the output
         logging.info("Command `{}` returned `{}`".format(command, stdout))
 
-    def start_job(self, katscript):
-        job_identifier = str(uuid.uuid4())
+    def _query_scheduler(self, batch_ids):
+        """
+        Gets the state of many slurm jobs with a single sacct call. Unlike squeue, sacct also reports jobs that have
+        already left the queue.
+
+        :param batch_ids: A list of slurm job ids
+        :return: A dict of slurm job id -> status for the jobs slurm reported on
+        """
+        if not batch_ids:
+            return {}
+
+        command = ['sacct', '--allocations', '--noheader', '--parsable2', '--format=JobID,State',
+                   f'--jobs={",".join(str(batch_id) for batch_id in batch_ids)}']
+
+        try:
+            stdout = subprocess.check_output(command, stderr=subprocess.DEVNULL).decode()
+        except Exception as e:
+            logging.error(f"Unable to query slurm for the state of {len(batch_ids)} jobs: {e}")
+            return {}
 
-        logging.info("Starting job with the following script")
-        logging.info(katscript)
-        logging.info(job_identifier)
+        statuses = {}
+        for line in stdout.splitlines():
+            job_id, _, state = line.partition('|')
 
-        slurm_id = self._submit_slurm_job(job_identifier, katscript)
-        self.db.add_job(job_identifier, slurm_id)
+            # States may be followed by a reason, such as "CANCELLED by 1234"
+            state = state.split(' ')[0].rstrip('+')
+            if job_id.isdigit() and state in SLURM_STATES:
+                statuses[int(job_id)] = SLURM_STATES[state]
 
-        return job_identifier
+        return statuses
+
+    def start_job(self, katscript, tags=None):
+        return self.start_jobs([katscript], [tags])[0]
+
+    def start_jobs(self, katscripts, tags=None):
+        jobs = []
+        try:
+            for katscript in katscripts:
+                job_identifier = str(uuid.uuid4())
+
+                logging.info("Starting job with the following script")
+                logging.info(katscript)
+                logging.info(job_identifier)
+
+                jobs.append((job_identifier, self._submit_slurm_job(job_identifier, katscript)))
+        finally:
+            # Record the submitted jobs in a single transaction, including those submitted before a failure
+            job_identifiers = [job_identifier for job_identifier, _ in jobs]
+            self.db.add_jobs(jobs, self._job_tags(job_identifiers, tags))
+
+        return [job_identifier for job_identifier, _ in jobs]
 
     def terminate(self):
         return super().terminate()
 
-    def get_jobs(self):
-        jobs = self.db.get_jobs()
+    def get_jobs(self, status=None, since=None, until=None, limit=None, cursor=None, fields=None, archived=False,
+                 tags=None):
+        jobs = self.db.get_jobs(status, since, until, limit, cursor, fields, archived, tags)
         return jobs
 
     def get_job_status(self, job_identifier):
-        status = self.db.get_job_status(job_identifier)
-
-        # If the job status is less than or equal to RUNNING, then we need to derive the current job status and update
-        # the job status accordingly.
-        new_status = status
-        if status <= JobStatus.RUNNING:
-            # Check if the job is completed, or started, or queued
-            p = Path(self._exec_path)
-            if (p / job_identifier / 'finished').exists():
-                new_status = JobStatus.COMPLETED
-            elif (p / job_identifier / 'started').exists():
-                new_status = JobStatus.RUNNING
-            else:
-                new_status = JobStatus.QUEUED
-
-        # Update the job if the status has changed
-        if new_status != status:
-            self.db.update_job_status(job_identifier, new_status)
-
-        return new_status
+        return self._get_job_status(job_identifier)
 
     def get_job_file(self, job_identifier, file_path):
         full_file_path = Path(self._exec_path / job_identifier / file_path)
@@ -134,10 +191,13 @@ class OzStarClient(AbstractClient):
         if full_file_path.exists():
             try:
                 with open(full_file_path, 'rb') as f:
-                    return f.read()
+                    data = f.read()
             except Exception:
                 return None, f"Unable to retrieve file {full_file_path} as the file could not be read."
 
+            self.db.mark_job_downloaded(job_identifier)
+            return data
+
         return None, f"Unable to retrieve file {full_file_path} as the file does not exist."
 
     def get_job_file_list(self, job_identifier):
@@ -160,4 +220,4 @@ class OzStarClient(AbstractClient):
             self._cancel_slurm_job(self.db.get_job_batch_id(job_identifier))
 
             # Mark the job as cancelled
-            self.db.update_job_status(job_identifier, JobStatus.CANCELLED)
+            self._set_job_status(job_identifier, JobStatus.CANCELLED)
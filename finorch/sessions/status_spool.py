@@ -0,0 +1,105 @@
+import datetime
+import logging
+import os
+import threading
+
+# The file in the exec path that wrappers append their status reports to, when they can't reach the client directly
+STATUS_SPOOL = 'status.spool'
+
+
+def format_status_report(job_identifier, status, timestamp):
+    """
+    Formats a status report as a single line of the spool
+
+    :param job_identifier: The identifier of the job
+    :param status: The new status of the job
+    :param timestamp: The time the job reached the status (datetime)
+    :return: The line, including the trailing newline
+    """
+    return f"{job_identifier} {int(status)} {timestamp.timestamp()}\n"
+
+
+def parse_status_report(line):
+    """
+    Parses a line of the spool
+
+    :param line: The line, without the trailing newline
+    :return: A tuple of (job identifier, status, timestamp), or None if the line is malformed
+    """
+    try:
+        job_identifier, status, timestamp = line.split(' ')
+        return job_identifier, int(status), datetime.datetime.fromtimestamp(float(timestamp))
+    except ValueError:
+        return None
+
+
+def append_status_report(spool_path, job_identifier, status, timestamp):
+    """
+    Appends a status report to a spool. Each report is written with a single append, so reports from many wrappers
+    writing to the same spool at once are never interleaved.
+
+    :param spool_path: The path of the spool
+    :param job_identifier: The identifier of the job
+    :param status: The new status of the job
+    :param timestamp: The time the job reached the status (datetime)
+    :return: None
+    """
+    fd = os.open(spool_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, format_status_report(job_identifier, status, timestamp).encode())
+    finally:
+        os.close(fd)
+
+
+class StatusSpoolReader:
+    """
+    Tails a status spool, returning the reports appended since the last read. Only complete lines are consumed, a
+    report that is still being written is returned by a later read.
+    """
+
+    def __init__(self, spool_path, offset=0):
+        """
+        Creates the reader
+
+        :param spool_path: The path of the spool
+        :param offset: The offset in the spool to start reading from
+        """
+        self._spool_path = spool_path
+        self._offset = offset
+        self._lock = threading.Lock()
+
+    @property
+    def spool_path(self):
+        return self._spool_path
+
+    def read(self):
+        """
+        Reads the reports appended to the spool since the last read
+
+        :return: A list of (job identifier, status, timestamp) tuples, in the order they were written
+        """
+        with self._lock:
+            try:
+                with open(self._spool_path, 'rb') as f:
+                    # The spool was replaced with a new one, start again from the beginning
+                    if os.fstat(f.fileno()).st_size < self._offset:
+                        self._offset = 0
+
+                    f.seek(self._offset)
+                    data = f.read()
+            except FileNotFoundError:
+                # No wrapper has reported to the spool yet
+                return []
+
+            # Leave any incomplete line for the next read
+            data = data[:data.rfind(b'\n') + 1]
+            self._offset += len(data)
+
+        reports = []
+        for line in data.decode(errors='replace').splitlines():
+            if report := parse_status_report(line):
+                reports.append(report)
+            elif line:
+                logging.warning(f"Ignoring malformed status report in {self._spool_path}: {line}")
+
+        return reports
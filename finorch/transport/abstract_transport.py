@@ -1,6 +1,20 @@
 import abc
+import logging
+import xmlrpc.client
 
 from finorch.transport.exceptions import TransportConnectionException
+from finorch.utils.binrpc import BinaryServerProxy, BINARY_PROTOCOL, DEFAULT_COMPRESSION_LEVEL, \
+    DEFAULT_COMPRESSION_THRESHOLD
+from finorch.utils.xmlrpc import UnixStreamTransport, UnixStreamHTTPConnection
+
+# The default size of each chunk when streaming a job file from the client
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# The largest chunk of a job file that will be returned by a single get_job_file_chunk call
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# The default number of jobs fetched from the client per round trip when iterating over jobs
+DEFAULT_JOBS_PAGE_SIZE = 1000
 
 
 class AbstractTransport(abc.ABC):
@@ -24,6 +38,69 @@ class AbstractTransport(abc.ABC):
     def exec_path(self):
         return self._exec_path
 
+    @property
+    def host(self):
+        return 'localhost'
+
+    @staticmethod
+    def _connect_client_rpc(port, socket_path=None, compression=None, compression_level=DEFAULT_COMPRESSION_LEVEL,
+                            compression_threshold=DEFAULT_COMPRESSION_THRESHOLD):
+        """
+        Creates the rpc proxy used to talk to a client listening on the specified local port. The client is asked which
+        protocols it supports, and the binary protocol is used where possible since it transfers bytes without
+        re-encoding them. XML-RPC is used for clients that don't support the binary protocol.
+
+        :param port: The local port the client can be reached on
+        :param socket_path: If set, the client is reached over this unix domain socket instead of the port
+        :param compression: If set, the name of the compression (zlib or lzma) the client should use for large binary
+        protocol responses. Compression is only used if the client supports it.
+        :param compression_level: The compression level, from 0 (fastest) to 9 (smallest)
+        :param compression_threshold: Responses smaller than this many bytes are not compressed
+        :return: An rpc proxy for the client
+        """
+        if socket_path:
+            client_rpc = xmlrpc.client.ServerProxy(
+                'http://localhost/rpc',
+                transport=UnixStreamTransport(socket_path, use_builtin_types=True),
+                allow_none=True,
+                use_builtin_types=True
+            )
+        else:
+            client_rpc = xmlrpc.client.ServerProxy(
+                f'http://localhost:{port}/rpc',
+                allow_none=True,
+                use_builtin_types=True
+            )
+
+        try:
+            protocols = client_rpc.get_protocols()
+        except xmlrpc.client.Fault:
+            # Older clients don't support protocol negotiation
+            protocols = []
+
+        if BINARY_PROTOCOL not in protocols:
+            return client_rpc
+
+        if compression:
+            try:
+                compressions = client_rpc.get_compressions()
+            except xmlrpc.client.Fault:
+                # Older clients don't support compression
+                compressions = []
+
+            if compression not in compressions:
+                logging.warning(f"Client does not support {compression} compression, responses will not be compressed")
+                compression = None
+
+        return BinaryServerProxy(
+            'localhost',
+            port,
+            (lambda: UnixStreamHTTPConnection(socket_path)) if socket_path else None,
+            compression=compression,
+            compression_level=compression_level,
+            compression_threshold=compression_threshold
+        )
+
     @abc.abstractmethod
     def connect(self):
         """
@@ -49,17 +126,32 @@ class AbstractTransport(abc.ABC):
             raise TransportConnectionException("Transport is not connected")
 
     @abc.abstractmethod
-    def start_job(self, katscript):
+    def start_job(self, katscript, tags=None):
         """
         Starts a job using this transport using the model defined by the provided katscript
 
         Should raise a TransportStartJobException in the event of a problem
 
         :param katscript: The katscript defining the model to run
+        :param tags: An optional dict of tag key -> value to attach to the job
         :return: UUID representing the remote identifier for the job
         """
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def start_jobs(self, katscripts, tags=None):
+        """
+        Starts many jobs in a single round trip to the client, which records them in a single transaction
+
+        Should raise a TransportStartJobException in the event of a problem
+
+        :param katscripts: A list of katscripts defining the models to run
+        :param tags: An optional dict of tag key -> value to attach to all of the jobs, or a list with a dict of tags
+        for each job
+        :return: A list of UUIDs representing the remote identifiers for the jobs, in the same order as the katscripts
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def get_job_status(self, job_identifier):
         """
@@ -72,6 +164,34 @@ class AbstractTransport(abc.ABC):
         """
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def get_job_statuses(self, job_identifiers=None, tags=None):
+        """
+        Gets the job status for many job identifiers in a single round trip to the client
+
+        Should raise a TransportGetJobStatusException in the event of a problem
+
+        :param job_identifiers: A list of the UUIDs of the jobs to get the status of
+        :param tags: Instead of job identifiers, a dict of tag key -> value. Gets the status of all jobs with all of the
+        tags.
+        :return: A dict of job identifier -> JobStatus. Jobs that could not be found are not included.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def wait_for_jobs(self, job_identifiers, mode, timeout):
+        """
+        Blocks in the client until any (or all) of the jobs have finished, or the timeout expires
+
+        Should raise a TransportGetJobStatusException in the event of a problem
+
+        :param job_identifiers: A list of the UUIDs of the jobs to wait for
+        :param mode: 'any' to return as soon as any of the jobs has finished, or 'all' to wait for all of the jobs
+        :param timeout: The maximum time to wait in seconds. The client may return sooner than this.
+        :return: A dict of job identifier -> JobStatus for the jobs that have finished
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def stop_job(self, job_identifier):
         """
@@ -85,13 +205,57 @@ class AbstractTransport(abc.ABC):
         raise NotImplementedError()
 
     @abc.abstractmethod
-    def get_jobs(self):
+    def get_jobs(self, status=None, since=None, until=None, limit=None, cursor=None, fields=None, archived=False,
+                 tags=None):
+        """
+        Fetches the remote jobs using this transport, ordered by id and optionally filtered
+
+        Should raise a TransportGetJobsException in the event of a problem
+
+        :param status: Only include jobs with this status, or with any of the statuses if a list is provided
+        :param since: Only include jobs started at or after this time
+        :param until: Only include jobs started before this time
+        :param limit: The maximum number of jobs to return
+        :param cursor: Only include jobs with an id greater than this (the id of the last job of the previous page)
+        :param fields: The job fields to include, such as 'identifier', 'start_time', 'status', 'started_at' and
+        'tags'. The id is always included. Defaults to 'id', 'identifier', 'start_time' and 'status', the lifecycle
+        timestamps and tags are only included when requested.
+        :param archived: If True, lists the jobs that have been archived instead
+        :param tags: Only include jobs with all of the tags in this dict of tag key -> value
+        :return: A list of dicts representing the details of the remote jobs
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def get_client_metrics(self):
         """
-        Fetches all remote jobs using this transport
+        Fetches the rpc metrics recorded by the client
 
-        Does not raise any exception, should not fail
+        :return: A dict containing the client's uptime in seconds, and a dict of rpc method name -> dict of the call
+        count, error count, latency statistics and histogram, and bytes in and out for that method
+        """
+        raise NotImplementedError()
 
-        :return: A list of dicts representing the details of the remote jobs
+    @abc.abstractmethod
+    def archive_jobs(self, before, compact=True):
+        """
+        Moves the client's finished jobs submitted before the cutoff to the archive, then optionally compacts the
+        client's database
+
+        :param before: Archive finished jobs submitted before this time
+        :param compact: If True, the database is compacted and its statistics refreshed afterwards
+        :return: The number of jobs archived
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def get_job_timing_stats(self, since=None, until=None):
+        """
+        Fetches the distribution of how long jobs waited in the scheduler's queue, and how long they ran for
+
+        :param since: Only include jobs started at or after this time
+        :param until: Only include jobs started before this time
+        :return: A dict of 'queue_wait' and 'runtime', each a dict of the count, mean, p50, p95 and max in seconds
         """
         raise NotImplementedError()
 
@@ -120,6 +284,53 @@ class AbstractTransport(abc.ABC):
         """
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def get_job_file_chunk(self, job_identifier, file_path, offset, size):
+        """
+        Retrieves part of the specified file for the specified job identifier
+
+        Should raise a TransportGetJobFileException in the event of a problem
+
+        :param job_identifier: The UUID of the job to fetch the specified file for
+        :param file_path: The path to the file to download
+        :param offset: The offset in the file to start reading from
+        :param size: The maximum number of bytes to read
+        :return: A bytes object containing up to size bytes of the file, which is empty at the end of the file
+        """
+        raise NotImplementedError()
+
+    def iter_job_file(self, job_identifier, file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Streams the specified file for the specified job identifier in fixed size chunks, so that neither the client
+        nor the caller needs to hold the whole file in memory
+
+        Should raise a TransportGetJobFileException in the event of a problem
+
+        :param job_identifier: The UUID of the job to fetch the specified file for
+        :param file_path: The path to the file to download
+        :param chunk_size: The maximum size of each chunk, capped at MAX_CHUNK_SIZE
+        :return: A generator of bytes objects
+        """
+        # The client never returns more than MAX_CHUNK_SIZE, so a larger chunk would look like the end of the file
+        chunk_size = min(chunk_size, MAX_CHUNK_SIZE)
+
+        offset = 0
+        while True:
+            # XML-RPC can't represent integers larger than 32 bits, the client accepts the offset as a string instead
+            chunk = self.get_job_file_chunk(
+                job_identifier,
+                file_path,
+                offset if offset <= xmlrpc.client.MAXINT else str(offset),
+                chunk_size
+            )
+
+            if chunk:
+                yield chunk
+                offset += len(chunk)
+
+            if len(chunk) < chunk_size:
+                return
+
     @abc.abstractmethod
     def terminate(self):
         """
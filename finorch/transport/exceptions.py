@@ -16,6 +16,12 @@ class TransportGetJobStatusException(Exception):
     """
 
 
+class TransportGetJobsException(Exception):
+    """
+    Raised when a problem arise while retrieving the list of jobs
+    """
+
+
 class TransportGetJobSolutionException(Exception):
     """
     Raised when a problem arise while retrieving the solution for a job
@@ -1,11 +1,11 @@
 import subprocess
-import xmlrpc.client
 
 from finorch.config.config import client_config_manager
 from finorch.transport.exceptions import TransportConnectionException, TransportTerminateException, \
-    TransportGetJobStatusException, TransportGetJobFileException, TransportGetJobFileListException
+    TransportGetJobStatusException, TransportGetJobFileException, TransportGetJobFileListException, \
+    TransportGetJobsException
 from finorch.transport.abstract_transport import AbstractTransport
-from finorch.utils.port import test_port_open
+from finorch.utils.port import test_port_open, test_socket_open
 
 
 class LocalTransport(AbstractTransport):
@@ -16,11 +16,14 @@ class LocalTransport(AbstractTransport):
         super().__init__(*args, **kwargs)
 
         self._client_rpc = None
+        self._socket_path = None
 
     def _check_client_connectivity(self, port=None):
         """
         Checks if the client is already running by reading the details from the config file and trying to connect to
-        the clients last used port
+        the clients last used port. If the client is also listening on a unix domain socket, the socket is used in
+        preference to the port.
+
         :param port: An option port to check for connectivity. If this is None the port from the client configuration
         is used.
         :return: True if the client is running and accepting connections, otherwise False
@@ -30,6 +33,9 @@ class LocalTransport(AbstractTransport):
 
             self._connected = test_port_open(self._port)
 
+        if self._connected and (socket_path := client_config_manager.get_socket_path()):
+            self._socket_path = socket_path if test_socket_open(socket_path) else None
+
         return self._connected
 
     def _spawn_client(self):
@@ -74,16 +80,15 @@ class LocalTransport(AbstractTransport):
         if not self._check_client_connectivity():
             self._spawn_client()
 
-        self._client_rpc = xmlrpc.client.ServerProxy(
-            f'http://localhost:{self._port}/rpc',
-            allow_none=True,
-            use_builtin_types=True
-        )
+        self._client_rpc = self._connect_client_rpc(self._port, self._socket_path)
 
         self._client_rpc.set_exec_path(self.exec_path)
 
-    def start_job(self, katscript):
-        return self._client_rpc.start_job(katscript)
+    def start_job(self, katscript, tags=None):
+        return self._client_rpc.start_job(katscript, tags)
+
+    def start_jobs(self, katscripts, tags=None):
+        return self._client_rpc.start_jobs(list(katscripts), tags)
 
     def terminate(self):
         if not self._connected:
@@ -101,6 +106,13 @@ class LocalTransport(AbstractTransport):
         else:
             raise TransportGetJobFileException(status[1])
 
+    def get_job_file_chunk(self, job_identifier, file_path, offset, size):
+        status = self._client_rpc.get_job_file_chunk(job_identifier, file_path, offset, size)
+        if type(status) is bytes:
+            return status
+        else:
+            raise TransportGetJobFileException(status[1])
+
     def get_job_file_list(self, job_identifier):
         status = self._client_rpc.get_job_file_list(job_identifier)
         if type(status) is list and status[0] is not None:
@@ -115,8 +127,36 @@ class LocalTransport(AbstractTransport):
         else:
             raise TransportGetJobStatusException(status[1])
 
-    def get_jobs(self):
-        return self._client_rpc.get_jobs()
+    def get_job_statuses(self, job_identifiers=None, tags=None):
+        status = self._client_rpc.get_job_statuses(list(job_identifiers or []), tags)
+        if type(status) is dict:
+            return status
+        else:
+            raise TransportGetJobStatusException(status[1])
+
+    def wait_for_jobs(self, job_identifiers, mode, timeout):
+        status = self._client_rpc.wait_for_jobs(list(job_identifiers), mode, timeout)
+        if type(status) is dict:
+            return status
+        else:
+            raise TransportGetJobStatusException(status[1])
+
+    def get_jobs(self, status=None, since=None, until=None, limit=None, cursor=None, fields=None, archived=False,
+                 tags=None):
+        jobs = self._client_rpc.get_jobs(status, since, until, limit, cursor, fields, archived, tags)
+        if jobs and jobs[0] is None:
+            raise TransportGetJobsException(jobs[1])
+
+        return jobs
+
+    def get_client_metrics(self):
+        return self._client_rpc.get_metrics()
+
+    def get_job_timing_stats(self, since=None, until=None):
+        return self._client_rpc.get_job_timing_stats(since, until)
+
+    def archive_jobs(self, before, compact=True):
+        return self._client_rpc.archive_jobs(before, compact)
 
     def stop_job(self, job_identifier):
         raise NotImplementedError()
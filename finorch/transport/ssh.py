@@ -2,7 +2,6 @@ import logging
 from io import StringIO
 
 import select
-import xmlrpc.client
 from socketserver import BaseRequestHandler, ThreadingTCPServer
 from threading import Thread
 from time import sleep
@@ -11,8 +10,10 @@ import paramiko
 
 from finorch.config.config import api_config_manager
 from finorch.transport.abstract_transport import AbstractTransport
+from finorch.utils.binrpc import DEFAULT_COMPRESSION_LEVEL, DEFAULT_COMPRESSION_THRESHOLD
 from finorch.transport.exceptions import TransportConnectionException, TransportTerminateException, \
-    TransportGetJobFileException, TransportGetJobFileListException, TransportGetJobStatusException
+    TransportGetJobFileException, TransportGetJobFileListException, TransportGetJobStatusException, \
+    TransportGetJobsException
 
 
 class SshTransport(AbstractTransport):
@@ -34,6 +35,11 @@ class SshTransport(AbstractTransport):
         self._callsign = kwargs['callsign']
         self._ssh_port = kwargs.get('ssh_port', 22)
 
+        # Large responses from the remote client can be compressed before they cross the tunnel
+        self._compression = kwargs.get('compression', None)
+        self._compression_level = kwargs.get('compression_level', DEFAULT_COMPRESSION_LEVEL)
+        self._compression_threshold = kwargs.get('compression_threshold', DEFAULT_COMPRESSION_THRESHOLD)
+
         self._remote_port = None
 
         from finorch.sessions import SshSession
@@ -42,6 +48,10 @@ class SshTransport(AbstractTransport):
         self._ssh_client = paramiko.SSHClient()
         self._ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
+    @property
+    def host(self):
+        return self._host
+
     def connect(self, *args, **kwargs):
         self._remote_port = kwargs['remote_port']
         self._remote_port = int(self._remote_port) if self._remote_port else None
@@ -87,11 +97,7 @@ class SshTransport(AbstractTransport):
                 self._forward_tunnel()
 
                 # Connect the client rpc
-                self._client_rpc = xmlrpc.client.ServerProxy(
-                    f'http://localhost:{self._port}/rpc',
-                    allow_none=True,
-                    use_builtin_types=True
-                )
+                self._client_rpc = self._connect_rpc()
 
                 self._client_rpc.system.listMethods()
 
@@ -160,11 +166,7 @@ class SshTransport(AbstractTransport):
         self._forward_tunnel()
 
         # Connect the client rpc
-        self._client_rpc = xmlrpc.client.ServerProxy(
-            f'http://localhost:{self._port}/rpc',
-            allow_none=True,
-            use_builtin_types=True
-        )
+        self._client_rpc = self._connect_rpc()
 
         self._client_rpc.set_exec_path(self.exec_path)
 
@@ -173,6 +175,28 @@ class SshTransport(AbstractTransport):
 
         return self._remote_port
 
+    def _connect_rpc(self):
+        """
+        Connects the rpc proxy to the remote client through the forwarded port
+
+        :return: The rpc proxy
+        """
+        return self._connect_client_rpc(
+            self._port,
+            compression=self._compression,
+            compression_level=self._compression_level,
+            compression_threshold=self._compression_threshold
+        )
+
+    def get_compression_stats(self):
+        """
+        Gets statistics for the most recent compressed responses from the remote client
+
+        :return: A list of dicts with the method called, the compression used, the uncompressed and compressed sizes,
+        the compression ratio, and the time in seconds spent compressing (on the remote) and decompressing (locally)
+        """
+        return list(getattr(self._client_rpc, 'compression_stats', []))
+
     def disconnect(self):
         super().disconnect()
 
@@ -187,6 +211,13 @@ class SshTransport(AbstractTransport):
         else:
             raise TransportGetJobFileException(status[1])
 
+    def get_job_file_chunk(self, job_identifier, file_path, offset, size):
+        status = self._client_rpc.get_job_file_chunk(job_identifier, file_path, offset, size)
+        if type(status) is bytes:
+            return status
+        else:
+            raise TransportGetJobFileException(status[1])
+
     def get_job_file_list(self, job_identifier):
         status = self._client_rpc.get_job_file_list(job_identifier)
         if type(status) is list and status[0] is not None:
@@ -201,11 +232,42 @@ class SshTransport(AbstractTransport):
         else:
             raise TransportGetJobStatusException(status[1])
 
-    def get_jobs(self):
-        return self._client_rpc.get_jobs()
+    def get_job_statuses(self, job_identifiers=None, tags=None):
+        status = self._client_rpc.get_job_statuses(list(job_identifiers or []), tags)
+        if type(status) is dict:
+            return status
+        else:
+            raise TransportGetJobStatusException(status[1])
+
+    def wait_for_jobs(self, job_identifiers, mode, timeout):
+        status = self._client_rpc.wait_for_jobs(list(job_identifiers), mode, timeout)
+        if type(status) is dict:
+            return status
+        else:
+            raise TransportGetJobStatusException(status[1])
+
+    def get_jobs(self, status=None, since=None, until=None, limit=None, cursor=None, fields=None, archived=False,
+                 tags=None):
+        jobs = self._client_rpc.get_jobs(status, since, until, limit, cursor, fields, archived, tags)
+        if jobs and jobs[0] is None:
+            raise TransportGetJobsException(jobs[1])
+
+        return jobs
+
+    def get_client_metrics(self):
+        return self._client_rpc.get_metrics()
+
+    def get_job_timing_stats(self, since=None, until=None):
+        return self._client_rpc.get_job_timing_stats(since, until)
+
+    def archive_jobs(self, before, compact=True):
+        return self._client_rpc.archive_jobs(before, compact)
+
+    def start_job(self, katscript, tags=None):
+        return self._client_rpc.start_job(katscript, tags)
 
-    def start_job(self, katscript):
-        return self._client_rpc.start_job(katscript)
+    def start_jobs(self, katscripts, tags=None):
+        return self._client_rpc.start_jobs(list(katscripts), tags)
 
     def stop_job(self, job_identifier):
         return self._client_rpc.stop_job(job_identifier)
@@ -231,6 +293,7 @@ class SshTransport(AbstractTransport):
         chain_host = None
         chain_port = None
         ssh_transport = None
+        buffer_size = 64 * 1024
 
         def handle(self):
             try:
@@ -260,18 +323,20 @@ class SshTransport(AbstractTransport):
                     (self.chain_host, self.chain_port),
                 )
             )
+            # The channel stays open for as long as the local connection does. The rpc proxies keep their
+            # connections alive between calls, so a single channel carries many requests.
             while True:
                 r, w, x = select.select([self.request, chan], [], [])
                 if self.request in r:
-                    data = self.request.recv(1024)
+                    data = self.request.recv(self.buffer_size)
                     if len(data) == 0:
                         break
-                    chan.send(data)
+                    chan.sendall(data)
                 if chan in r:
-                    data = chan.recv(1024)
+                    data = chan.recv(self.buffer_size)
                     if len(data) == 0:
                         break
-                    self.request.send(data)
+                    self.request.sendall(data)
 
             peername = self.request.getpeername()
             chan.close()
@@ -0,0 +1,403 @@
+"""
+An asyncio based alternative to finorch.utils.xmlrpc.XMLRPCServer.
+
+XMLRPCServer ties up a worker thread for every open connection, so the number of connections it can hold open is bounded
+by its worker pool. AsyncXMLRPCServer instead handles every connection on a single event loop, so idle persistent
+connections and coroutine methods cost no threads. Blocking methods (such as calls to sbatch or reading job files) are
+run on a bounded thread pool so that they don't stall the event loop. Where the registered instance also has a coroutine
+method named with ASYNC_METHOD_PREFIX (such as async_wait_for_jobs), that is called instead of the blocking method.
+
+The server speaks the same protocols on the same paths as XMLRPCServer (XML-RPC on /rpc and binary rpc on /bin), so the
+API can't tell the two apart.
+"""
+import asyncio
+import inspect
+import os
+import socket
+import sys
+import time
+import xmlrpc.client
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from xmlrpc.server import SimpleXMLRPCDispatcher, resolve_dotted_attribute
+
+from finorch.utils import binrpc
+from finorch.utils.metrics import RpcMetrics, is_error_result
+from finorch.utils.xmlrpc import ASYNC_METHOD_PREFIX, KEEP_ALIVE_TIMEOUT, remove_stale_socket
+
+# The maximum number of pending connections the listening socket will queue
+LISTEN_BACKLOG = 1024
+
+# Responses larger than this many bytes are gzip encoded if the caller accepts it, matching SimpleXMLRPCRequestHandler
+GZIP_THRESHOLD = 1400
+
+# The paths that rpc requests are accepted on
+RPC_PATHS = ('/rpc', binrpc.BINARY_RPC_PATH)
+
+
+class _BadRequest(Exception):
+    """
+    Raised when an HTTP request can't be parsed
+    """
+
+
+class AsyncXMLRPCServer(SimpleXMLRPCDispatcher):
+    def __init__(self, server_address, max_workers=None, metrics=None):
+        """
+        Creates a new asyncio XMLRPC server. The listening socket is bound immediately so that the server address is
+        available before serve_forever is called.
+
+        :param server_address: A (host, port) tuple to listen on TCP, or a path to listen on a unix domain socket
+        :param max_workers: The number of worker threads used to run blocking methods. Methods that are coroutine
+        functions are run on the event loop instead and are not limited by this.
+        :param metrics: Optional RpcMetrics to record calls in, so that several servers can share their metrics. If
+        None the server records calls in its own RpcMetrics.
+        """
+        super().__init__(allow_none=True)
+
+        self.metrics = metrics or RpcMetrics()
+
+        self._quit = False
+        self._loop = None
+        self._quit_event = None
+
+        # The tasks handling open connections, and the writers of connections that are waiting for their next request
+        self._connections = set()
+        self._idle = set()
+
+        self._unix_socket = isinstance(server_address, (str, os.PathLike))
+        if self._unix_socket:
+            server_address = str(server_address)
+            remove_stale_socket(server_address)
+
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self.socket.bind(server_address)
+                # Only the current user should be able to talk to the client
+                os.chmod(server_address, 0o600)
+                self.socket.listen(LISTEN_BACKLOG)
+            except OSError:
+                self.socket.close()
+                raise
+        else:
+            self.socket = socket.create_server(server_address, backlog=LISTEN_BACKLOG)
+
+        self.server_address = self.socket.getsockname()
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='aioxmlrpc')
+
+        self.register_function(self.get_protocols, 'get_protocols')
+        self.register_function(binrpc.get_compressions, 'get_compressions')
+        self.register_function(self.metrics.get_metrics, 'get_metrics')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.server_close()
+
+    @staticmethod
+    def get_protocols():
+        """
+        Called by the API when connecting to find out which rpc protocols this server supports, in order of preference
+
+        :return: A list of protocol names
+        """
+        return [binrpc.BINARY_PROTOCOL, binrpc.XMLRPC_PROTOCOL]
+
+    def serve_forever(self, **kwargs):
+        """
+        Runs the event loop until the server is terminated
+
+        :param kwargs: N/A
+        :return: None
+        """
+        asyncio.run(self._serve())
+
+    def terminate(self):
+        """
+        Marks the server as ready for termination. This may be called from any thread.
+
+        :return: None
+        """
+        self._quit = True
+
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._quit_event.set)
+
+    def server_close(self):
+        """
+        Closes the listening socket and stops accepting work on the worker pool
+
+        :return: None
+        """
+        self.socket.close()
+        self._executor.shutdown(wait=False)
+
+        if self._unix_socket:
+            try:
+                os.unlink(self.server_address)
+            except FileNotFoundError:
+                pass
+
+    async def _serve(self):
+        self._quit_event = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+
+        # terminate may have been called before the loop was running
+        if self._quit:
+            return
+
+        start = asyncio.start_unix_server if self._unix_socket else asyncio.start_server
+        server = await start(self._handle_connection, sock=self.socket, backlog=LISTEN_BACKLOG)
+
+        await self._quit_event.wait()
+
+        server.close()
+
+        # Connections waiting for their next request are closed, while requests that are in progress (such as the call
+        # to terminate) are allowed to finish writing their response
+        for writer in list(self._idle):
+            writer.close()
+
+        if self._connections:
+            await asyncio.wait(list(self._connections), timeout=KEEP_ALIVE_TIMEOUT)
+
+    async def _handle_connection(self, reader, writer):
+        """
+        Serves requests on a single connection until the connection is closed, is idle for KEEP_ALIVE_TIMEOUT seconds,
+        or the server is terminated
+
+        :param reader: The asyncio stream reader for the connection
+        :param writer: The asyncio stream writer for the connection
+        :return: None
+        """
+        task = asyncio.current_task()
+        self._connections.add(task)
+
+        try:
+            keep_alive = True
+            while keep_alive and not self._quit:
+                self._idle.add(writer)
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                finally:
+                    self._idle.discard(writer)
+
+                try:
+                    keep_alive = await self._handle_request(head, reader, writer)
+                except _BadRequest:
+                    await self._send_response(writer, 400, [], keep_alive=False)
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _handle_request(self, head, reader, writer):
+        """
+        Handles a single HTTP request
+
+        :param head: The bytes of the request line and headers
+        :param reader: The asyncio stream reader for the connection
+        :param writer: The asyncio stream writer for the connection
+        :return: True if the connection should be kept open for another request
+        """
+        request_line, *header_lines = head.decode('iso-8859-1').rstrip('\r\n').split('\r\n')
+
+        try:
+            command, path, version = request_line.split()
+            headers = {}
+            for line in header_lines:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            content_length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise _BadRequest()
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+
+        data = await reader.readexactly(content_length)
+
+        if command != 'POST':
+            await self._send_response(writer, 501, [], keep_alive=False)
+            return False
+
+        if path not in RPC_PATHS:
+            await self._send_response(writer, 404, [b'No such page'], keep_alive)
+            return keep_alive
+
+        extra_headers = {}
+        try:
+            if path == binrpc.BINARY_RPC_PATH:
+                content_type = binrpc.CONTENT_TYPE
+                response = await self._dispatch_binary(data)
+
+                if headers.get('accept-encoding'):
+                    response, extra_headers = await self._loop.run_in_executor(
+                        self._executor,
+                        binrpc.compress_response,
+                        response,
+                        headers.get('accept-encoding'),
+                        headers.get(binrpc.COMPRESSION_LEVEL_HEADER.lower()),
+                        headers.get(binrpc.COMPRESSION_THRESHOLD_HEADER.lower())
+                    )
+            else:
+                content_type = 'text/xml'
+                if headers.get('content-encoding', 'identity').lower() == 'gzip':
+                    data = xmlrpc.client.gzip_decode(data)
+
+                response = await self._dispatch_xml(data)
+        except Exception:
+            # Matches SimpleXMLRPCRequestHandler, which reports requests that can't be decoded as internal errors
+            await self._send_response(writer, 500, [], keep_alive)
+            return keep_alive
+
+        if path != binrpc.BINARY_RPC_PATH and 'gzip' in headers.get('accept-encoding', ''):
+            if sum(len(p) for p in response) > GZIP_THRESHOLD:
+                response = [await self._loop.run_in_executor(self._executor, xmlrpc.client.gzip_encode, response[0])]
+                extra_headers = {'Content-Encoding': 'gzip'}
+
+        await self._send_response(writer, 200, response, keep_alive, content_type, extra_headers)
+        return keep_alive
+
+    @staticmethod
+    async def _send_response(writer, status, parts, keep_alive, content_type=None, extra_headers=None):
+        """
+        Writes an HTTP response
+
+        :param writer: The asyncio stream writer for the connection
+        :param status: The HTTP status code
+        :param parts: A list of bytes objects making up the body of the response
+        :param keep_alive: If the connection will be kept open after the response
+        :param content_type: The content type of the body
+        :param extra_headers: Optional dict of any other headers to send
+        :return: None
+        """
+        headers = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}']
+        if content_type:
+            headers.append(f'Content-Type: {content_type}')
+        for name, value in (extra_headers or {}).items():
+            headers.append(f'{name}: {value}')
+        headers.append(f'Content-Length: {sum(len(p) for p in parts)}')
+        if not keep_alive:
+            headers.append('Connection: close')
+
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('iso-8859-1'))
+
+        # Write each part separately so that large byte payloads are not copied
+        for part in parts:
+            writer.write(part)
+
+        await writer.drain()
+
+    async def _dispatch_xml(self, data):
+        params, method = xmlrpc.client.loads(data, use_builtin_types=self.use_builtin_types)
+
+        def dumps_response(result):
+            return [
+                xmlrpc.client.dumps(
+                    (result,), methodresponse=1, allow_none=self.allow_none, encoding=self.encoding
+                ).encode(self.encoding, 'xmlcharrefreplace')
+            ]
+
+        def dumps_fault(fault_code, fault_string):
+            return [
+                xmlrpc.client.dumps(
+                    xmlrpc.client.Fault(fault_code, fault_string), allow_none=self.allow_none, encoding=self.encoding
+                ).encode(self.encoding, 'xmlcharrefreplace')
+            ]
+
+        return await self._call(method, params, len(data), dumps_response, dumps_fault)
+
+    async def _dispatch_binary(self, data):
+        method, params = binrpc.loads_request(data)
+        return await self._call(method, params, len(data), binrpc.dumps_response, binrpc.dumps_fault)
+
+    async def _call(self, method, params, bytes_in, dumps_response, dumps_fault):
+        """
+        Calls the specified method, encodes the result and records the call in the metrics. Coroutine functions are
+        awaited on the event loop, while any other method is called (and its result encoded) on the worker pool.
+
+        :param method: The name of the method to call
+        :param params: The list of parameters for the method
+        :param bytes_in: The size of the request
+        :param dumps_response: Callable that encodes a result
+        :param dumps_fault: Callable that encodes a fault code and fault string
+        :return: A list of bytes objects making up the encoded response
+        """
+        func = self._resolve(method)
+        if inspect.iscoroutinefunction(func):
+            start = time.perf_counter()
+            try:
+                result = await func(*params)
+                seconds, error = time.perf_counter() - start, is_error_result(result)
+                response = dumps_response(result)
+            except Exception:
+                seconds, error = time.perf_counter() - start, True
+                response = self._dumps_exception(dumps_fault)
+        else:
+            response, seconds, error = await self._loop.run_in_executor(
+                self._executor, self._call_blocking, method, params, dumps_response, dumps_fault
+            )
+
+        self.metrics.record(method, seconds, bytes_in, sum(len(p) for p in response), error)
+
+        return response
+
+    def _call_blocking(self, method, params, dumps_response, dumps_fault):
+        """
+        Calls a blocking method and encodes the result
+
+        :return: A tuple of (encoded response, seconds the method took, if the call failed)
+        """
+        start = time.perf_counter()
+        try:
+            result = self._dispatch(method, params)
+            seconds, error = time.perf_counter() - start, is_error_result(result)
+            return dumps_response(result), seconds, error
+        except Exception:
+            return self._dumps_exception(dumps_fault), time.perf_counter() - start, True
+
+    @staticmethod
+    def _dumps_exception(dumps_fault):
+        """
+        Encodes the exception currently being handled as a fault, in the same way as SimpleXMLRPCDispatcher
+        """
+        exc_type, exc_value = sys.exc_info()[:2]
+        if isinstance(exc_value, xmlrpc.client.Fault):
+            return dumps_fault(exc_value.faultCode, exc_value.faultString)
+
+        return dumps_fault(1, "%s:%s" % (exc_type, exc_value))
+
+    def _resolve(self, method):
+        """
+        Finds the function that will be called for the specified method, following the same rules as
+        SimpleXMLRPCDispatcher._dispatch. A coroutine method of the instance named with ASYNC_METHOD_PREFIX is
+        preferred over the method itself.
+
+        :param method: The name of the method
+        :return: The function, or None if the method can't be resolved here
+        """
+        if method in self.funcs:
+            return self.funcs[method]
+
+        if self.instance is not None and not hasattr(self.instance, '_dispatch'):
+            try:
+                func = resolve_dotted_attribute(self.instance, ASYNC_METHOD_PREFIX + method, self.allow_dotted_names)
+                if inspect.iscoroutinefunction(func):
+                    return func
+            except AttributeError:
+                pass
+
+            try:
+                return resolve_dotted_attribute(self.instance, method, self.allow_dotted_names)
+            except AttributeError:
+                pass
+
+        return None
@@ -0,0 +1,575 @@
+"""
+A length-prefixed binary RPC protocol used between the API and the client as an alternative to XML-RPC.
+
+XML-RPC base64 encodes bytes and wraps every value in XML, which is expensive for large job files. This protocol encodes
+values with a one byte type tag followed by a fixed size length (where required) and the raw value, so bytes travel
+without any re-encoding. Messages are carried as the body of an HTTP POST to BINARY_RPC_PATH on the same server as the
+XML-RPC endpoint, so they pass through the same ports and ssh tunnels.
+
+Each message is a header of (MAGIC, kind, payload length) followed by the payload. A request payload is the encoded
+method name followed by the encoded list of parameters. A response payload is either the encoded result, or for a fault
+the encoded fault code and fault string.
+
+Responses can be compressed with zlib or lzma. A caller asks for compression with the Accept-Encoding header (and
+optionally the level and size threshold with COMPRESSION_LEVEL_HEADER and COMPRESSION_THRESHOLD_HEADER), and the server
+compresses any response larger than the threshold, reporting the encoding in the Content-Encoding header.
+"""
+import collections
+import datetime
+import http.client
+import logging
+import lzma
+import select
+import struct
+import sys
+import threading
+import time
+import xmlrpc.client
+import zlib
+
+# The name of the protocol as reported to the API during negotiation
+BINARY_PROTOCOL = "binary"
+XMLRPC_PROTOCOL = "xmlrpc"
+
+# The url path on the client's server that accepts binary rpc requests
+BINARY_RPC_PATH = "/bin"
+
+CONTENT_TYPE = "application/x-finorch-rpc"
+
+MAGIC = b"FRPC"
+
+# Message kinds
+REQUEST = b"Q"
+RESPONSE = b"R"
+FAULT = b"F"
+
+# Supported response compressions
+COMPRESSION_ZLIB = "zlib"
+COMPRESSION_LZMA = "lzma"
+
+DEFAULT_COMPRESSION_LEVEL = 6
+
+# Responses smaller than this many bytes are not worth compressing
+DEFAULT_COMPRESSION_THRESHOLD = 64 * 1024
+
+COMPRESSION_LEVEL_HEADER = "X-Compression-Level"
+COMPRESSION_THRESHOLD_HEADER = "X-Compression-Threshold"
+COMPRESSION_TIME_HEADER = "X-Compression-Time"
+UNCOMPRESSED_LENGTH_HEADER = "X-Uncompressed-Length"
+
+# The number of recent compressed calls a BinaryServerProxy keeps statistics for
+COMPRESSION_STATS_SIZE = 100
+
+# The number of idle connections a BinaryServerProxy keeps open for reuse. Calls made at the same time (such as a long
+# wait_for_jobs and a status request) each use their own connection.
+MAX_IDLE_CONNECTIONS = 4
+
+# Methods that are never sent twice, since the server may have handled a request that failed without a response (and
+# so submitted the jobs)
+NON_IDEMPOTENT_METHODS = ('start_job', 'start_jobs')
+
+_COMPRESSORS = {
+    COMPRESSION_ZLIB: lambda level: zlib.compressobj(level),
+    COMPRESSION_LZMA: lambda level: lzma.LZMACompressor(preset=level),
+}
+
+_DECOMPRESSORS = {
+    COMPRESSION_ZLIB: zlib.decompress,
+    COMPRESSION_LZMA: lzma.decompress,
+}
+
+_HEADER = struct.Struct(">4scQ")
+_LENGTH = struct.Struct(">I")
+_BYTES_LENGTH = struct.Struct(">Q")
+_INT = struct.Struct(">q")
+_FLOAT = struct.Struct(">d")
+
+# Value type tags
+_NONE = b"N"
+_TRUE = b"T"
+_FALSE = b"F"
+_INT_TAG = b"i"
+_BIG_INT = b"I"
+_FLOAT_TAG = b"d"
+_STR = b"s"
+_BYTES = b"b"
+_LIST = b"l"
+_DICT = b"m"
+_DATETIME = b"t"
+
+_INT_MIN = -(1 << 63)
+_INT_MAX = (1 << 63) - 1
+
+
+class ProtocolError(Exception):
+    """
+    Raised when a binary rpc message is malformed
+    """
+
+
+def _encode_value(value, parts):
+    """
+    Appends the encoded form of value to the list of parts. Large bytes values are appended as-is to avoid copying them.
+
+    :param value: The value to encode
+    :param parts: The list of bytes objects to append to
+    :return: None
+    """
+    if value is None:
+        parts.append(_NONE)
+    elif value is True:
+        parts.append(_TRUE)
+    elif value is False:
+        parts.append(_FALSE)
+    elif isinstance(value, int):
+        if _INT_MIN <= value <= _INT_MAX:
+            parts.append(_INT_TAG + _INT.pack(value))
+        else:
+            data = str(value).encode('ascii')
+            parts.append(_BIG_INT + _LENGTH.pack(len(data)) + data)
+    elif isinstance(value, float):
+        parts.append(_FLOAT_TAG + _FLOAT.pack(value))
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        parts.append(_STR + _LENGTH.pack(len(data)) + data)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        parts.append(_BYTES + _BYTES_LENGTH.pack(len(value)))
+        parts.append(value)
+    elif isinstance(value, (list, tuple)):
+        parts.append(_LIST + _LENGTH.pack(len(value)))
+        for item in value:
+            _encode_value(item, parts)
+    elif isinstance(value, dict):
+        parts.append(_DICT + _LENGTH.pack(len(value)))
+        for k, v in value.items():
+            _encode_value(k, parts)
+            _encode_value(v, parts)
+    elif isinstance(value, datetime.datetime):
+        data = value.isoformat().encode('ascii')
+        parts.append(_DATETIME + _LENGTH.pack(len(data)) + data)
+    else:
+        raise TypeError(f"cannot marshal {type(value)} objects")
+
+
+class _Decoder:
+    """
+    Decodes values from a binary rpc payload
+    """
+
+    def __init__(self, data):
+        self._data = memoryview(data)
+        self._offset = 0
+
+    def _take(self, count):
+        if self._offset + count > len(self._data):
+            raise ProtocolError("Unexpected end of message")
+
+        result = self._data[self._offset:self._offset + count]
+        self._offset += count
+        return result
+
+    def _unpack(self, fmt):
+        return fmt.unpack(self._take(fmt.size))[0]
+
+    def decode(self):
+        tag = bytes(self._take(1))
+
+        if tag == _NONE:
+            return None
+        elif tag == _TRUE:
+            return True
+        elif tag == _FALSE:
+            return False
+        elif tag == _INT_TAG:
+            return self._unpack(_INT)
+        elif tag == _BIG_INT:
+            return int(bytes(self._take(self._unpack(_LENGTH))).decode('ascii'))
+        elif tag == _FLOAT_TAG:
+            return self._unpack(_FLOAT)
+        elif tag == _STR:
+            return bytes(self._take(self._unpack(_LENGTH))).decode('utf-8')
+        elif tag == _BYTES:
+            return bytes(self._take(self._unpack(_BYTES_LENGTH)))
+        elif tag == _LIST:
+            return [self.decode() for _ in range(self._unpack(_LENGTH))]
+        elif tag == _DICT:
+            result = {}
+            for _ in range(self._unpack(_LENGTH)):
+                k = self.decode()
+                result[k] = self.decode()
+            return result
+        elif tag == _DATETIME:
+            return datetime.datetime.fromisoformat(bytes(self._take(self._unpack(_LENGTH))).decode('ascii'))
+
+        raise ProtocolError(f"Unknown type tag {tag!r}")
+
+    def finish(self):
+        if self._offset != len(self._data):
+            raise ProtocolError("Unexpected data at end of message")
+
+
+def dumps(kind, *values):
+    """
+    Encodes a message of the specified kind containing the provided values
+
+    :param kind: One of REQUEST, RESPONSE or FAULT
+    :param values: The values making up the payload of the message
+    :return: A list of bytes objects which, when concatenated, make up the message
+    """
+    parts = []
+    for value in values:
+        _encode_value(value, parts)
+
+    length = sum(len(p) for p in parts)
+    return [_HEADER.pack(MAGIC, kind, length)] + parts
+
+
+def loads(data):
+    """
+    Decodes a complete message
+
+    :param data: The bytes of the message
+    :return: A tuple of (kind, decoder) where decoder can be used to read the values in the payload
+    """
+    if len(data) < _HEADER.size:
+        raise ProtocolError("Message is too short")
+
+    magic, kind, length = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ProtocolError("Message has an invalid header")
+
+    if length != len(data) - _HEADER.size:
+        raise ProtocolError("Message length does not match the header")
+
+    return kind, _Decoder(memoryview(data)[_HEADER.size:])
+
+
+def dumps_request(method, params):
+    return dumps(REQUEST, method, list(params))
+
+
+def loads_request(data):
+    """
+    Decodes a request message
+
+    :param data: The bytes of the message
+    :return: A tuple of (method name, parameter list)
+    """
+    kind, decoder = loads(data)
+    if kind != REQUEST:
+        raise ProtocolError("Expected a request message")
+
+    method, params = decoder.decode(), decoder.decode()
+    decoder.finish()
+    return method, params
+
+
+def dumps_response(result):
+    return dumps(RESPONSE, result)
+
+
+def dumps_fault(fault_code, fault_string):
+    return dumps(FAULT, fault_code, fault_string)
+
+
+def loads_response(data):
+    """
+    Decodes a response message, raising an xmlrpc.client.Fault if the response is a fault so that callers can handle
+    errors the same way regardless of protocol
+
+    :param data: The bytes of the message
+    :return: The result of the rpc call
+    """
+    kind, decoder = loads(data)
+
+    if kind == RESPONSE:
+        result = decoder.decode()
+        decoder.finish()
+        return result
+
+    if kind == FAULT:
+        fault_code, fault_string = decoder.decode(), decoder.decode()
+        decoder.finish()
+        raise xmlrpc.client.Fault(fault_code, fault_string)
+
+    raise ProtocolError("Expected a response message")
+
+
+def dispatch(dispatcher, data):
+    """
+    Decodes a binary request, dispatches it with the provided SimpleXMLRPCDispatcher and encodes the response.
+    Exceptions are returned as faults in the same way SimpleXMLRPCDispatcher does for XML-RPC.
+
+    :param dispatcher: The SimpleXMLRPCDispatcher to dispatch the request with
+    :param data: The bytes of the request message
+    :return: A list of bytes objects which make up the response message
+    """
+    try:
+        method, params = loads_request(data)
+        return dumps_response(dispatcher._dispatch(method, params))
+    except xmlrpc.client.Fault as fault:
+        return dumps_fault(fault.faultCode, fault.faultString)
+    except BaseException:
+        exc_type, exc_value = sys.exc_info()[:2]
+        return dumps_fault(1, "%s:%s" % (exc_type, exc_value))
+
+
+def get_compressions():
+    """
+    Called by the API when connecting to find out which response compressions the server supports
+
+    :return: A list of compression names
+    """
+    return list(_COMPRESSORS)
+
+
+def _header_int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def compress_response(parts, accept_encoding, level=None, threshold=None):
+    """
+    Compresses an encoded response if the caller accepts one of the supported compressions and the response is larger
+    than the threshold. Responses that don't get smaller are sent uncompressed.
+
+    :param parts: The list of bytes objects making up the response
+    :param accept_encoding: The value of the caller's Accept-Encoding header, or None
+    :param level: The value of the caller's COMPRESSION_LEVEL_HEADER header, or None
+    :param threshold: The value of the caller's COMPRESSION_THRESHOLD_HEADER header, or None
+    :return: A tuple of (parts, headers) where headers is a dict of any extra headers to send with the response
+    """
+    encodings = [e.split(';')[0].strip() for e in (accept_encoding or '').split(',')]
+    encoding = next((e for e in encodings if e in _COMPRESSORS), None)
+
+    size = sum(len(p) for p in parts)
+    if not encoding or size < _header_int(threshold, DEFAULT_COMPRESSION_THRESHOLD):
+        return parts, {}
+
+    level = min(max(_header_int(level, DEFAULT_COMPRESSION_LEVEL), 0), 9)
+
+    start = time.perf_counter()
+    compressor = _COMPRESSORS[encoding](level)
+    data = b''.join([compressor.compress(p) for p in parts] + [compressor.flush()])
+    elapsed = time.perf_counter() - start
+
+    if len(data) >= size:
+        return parts, {}
+
+    return [data], {
+        "Content-Encoding": encoding,
+        COMPRESSION_TIME_HEADER: f"{elapsed:.6f}",
+        UNCOMPRESSED_LENGTH_HEADER: str(size),
+    }
+
+
+class _Method:
+    """
+    Supports nested method names such as system.listMethods, in the same way as xmlrpc.client
+    """
+
+    def __init__(self, send, name):
+        self._send = send
+        self._name = name
+
+    def __getattr__(self, name):
+        return _Method(self._send, f"{self._name}.{name}")
+
+    def __call__(self, *args):
+        return self._send(self._name, args)
+
+
+class BinaryServerProxy:
+    """
+    A drop in replacement for xmlrpc.client.ServerProxy that talks the binary rpc protocol. Faults are raised as
+    xmlrpc.client.Fault.
+    """
+
+    def __init__(self, host, port, connection_factory=None, compression=None,
+                 compression_level=DEFAULT_COMPRESSION_LEVEL, compression_threshold=DEFAULT_COMPRESSION_THRESHOLD):
+        """
+        :param host: The host the client is listening on
+        :param port: The port the client is listening on
+        :param connection_factory: Optional callable returning a new http.client.HTTPConnection. Used for transports
+        that don't connect over TCP.
+        :param compression: Optional name of the compression (COMPRESSION_ZLIB or COMPRESSION_LZMA) to ask the server
+        to use for responses. The server must support the compression, see get_compressions.
+        :param compression_level: The compression level to ask for, from 0 (fastest) to 9 (smallest)
+        :param compression_threshold: Responses smaller than this many bytes are not compressed
+        """
+        if compression and compression not in _DECOMPRESSORS:
+            raise ValueError(f"Unsupported compression {compression}")
+
+        self._host = host
+        self._port = port
+        self._connection_factory = connection_factory or (lambda: http.client.HTTPConnection(self._host, self._port))
+        # Idle persistent connections, most recently used last
+        self._connections = []
+        self._lock = threading.Lock()
+
+        self._headers = {"Content-Type": CONTENT_TYPE}
+        if compression:
+            self._headers.update({
+                "Accept-Encoding": compression,
+                COMPRESSION_LEVEL_HEADER: str(compression_level),
+                COMPRESSION_THRESHOLD_HEADER: str(compression_threshold),
+            })
+
+        # Statistics for the most recent compressed responses, as dicts
+        self.compression_stats = collections.deque(maxlen=COMPRESSION_STATS_SIZE)
+
+    def _request(self, method, params):
+        body = b''.join(dumps_request(method, params))
+
+        # A connection can only have one request in flight at a time, so each call takes a connection for itself
+        connection, reused = self._take_connection()
+        try:
+            try:
+                response = self._send(connection, body)
+            except (http.client.RemoteDisconnected, ConnectionError):
+                connection.close()
+
+                # A new connection failing is a real error. An idle connection may have been closed by the server as
+                # the request was sent, in which case nothing of the response arrived and the request is sent again on
+                # a new connection. Failures once the response has started are never retried, and neither are calls
+                # such as start_job, since the server can't be known not to have handled them.
+                if not reused or method in NON_IDEMPOTENT_METHODS:
+                    raise
+
+                connection = self._connection_factory()
+                response = self._send(connection, body)
+
+            data = response.read()
+        except Exception:
+            connection.close()
+            raise
+
+        self._release_connection(connection)
+
+        if response.status != 200:
+            raise xmlrpc.client.ProtocolError(
+                f"{self._host}:{self._port}{BINARY_RPC_PATH}",
+                response.status,
+                response.reason,
+                response.msg
+            )
+
+        if encoding := response.getheader("Content-Encoding"):
+            data = self._decompress(method, encoding, data, response)
+
+        return loads_response(data)
+
+    def _decompress(self, method, encoding, data, response):
+        """
+        Decompresses a compressed response and records statistics for the call
+
+        :param method: The name of the method that was called
+        :param encoding: The compression used for the response
+        :param data: The compressed response
+        :param response: The http.client.HTTPResponse, used to read the statistics reported by the server
+        :return: The decompressed response
+        """
+        if encoding not in _DECOMPRESSORS:
+            raise ProtocolError(f"Unsupported response encoding {encoding}")
+
+        start = time.perf_counter()
+        result = _DECOMPRESSORS[encoding](data)
+        elapsed = time.perf_counter() - start
+
+        stats = {
+            "method": method,
+            "compression": encoding,
+            "size": len(result),
+            "compressed_size": len(data),
+            "ratio": len(result) / len(data) if data else 0.0,
+            "compress_time": float(response.getheader(COMPRESSION_TIME_HEADER) or 0),
+            "decompress_time": elapsed,
+        }
+        self.compression_stats.append(stats)
+
+        logging.debug(
+            f"{method}: {encoding} compressed {stats['size']} bytes to {stats['compressed_size']} bytes "
+            f"(ratio {stats['ratio']:.2f}, compress {stats['compress_time']:.3f}s, decompress {elapsed:.3f}s)"
+        )
+
+        return result
+
+    def _send(self, connection, body):
+        """
+        Sends a request and reads the status and headers of the response
+
+        :param connection: The http.client.HTTPConnection to send the request on
+        :param body: The encoded request
+        :return: The http.client.HTTPResponse
+        """
+        connection.request(
+            "POST",
+            BINARY_RPC_PATH,
+            body=body,
+            headers=self._headers
+        )
+        return connection.getresponse()
+
+    def _take_connection(self):
+        """
+        Takes an idle connection for a call, or creates a new one. Idle connections that the server has closed are
+        discarded.
+
+        :return: A tuple of (http.client.HTTPConnection, True if the connection has been used before)
+        """
+        while True:
+            with self._lock:
+                if not self._connections:
+                    break
+
+                connection = self._connections.pop()
+
+            # A connection waiting for a request has nothing to read unless the server has closed it
+            if connection.sock and not select.select([connection.sock], [], [], 0)[0]:
+                return connection, True
+
+            connection.close()
+
+        return self._connection_factory(), False
+
+    def _release_connection(self, connection):
+        """
+        Returns a connection to the idle connections once a call has finished with it
+
+        :param connection: The http.client.HTTPConnection
+        :return: None
+        """
+        # The server asked for the connection to be closed after the response
+        if not connection.sock:
+            return
+
+        with self._lock:
+            if len(self._connections) < MAX_IDLE_CONNECTIONS:
+                self._connections.append(connection)
+                return
+
+        connection.close()
+
+    def _close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+
+        for connection in connections:
+            connection.close()
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        return _Method(self._request, name)
+
+    def __call__(self, attr):
+        """
+        Matches xmlrpc.client.ServerProxy, proxy("close")() closes the underlying connection
+        """
+        if attr == "close":
+            return self._close
+
+        raise AttributeError(f"Attribute {attr!r} not found")
@@ -1,12 +1,17 @@
 import contextlib
 import os
+import threading
+
+# The working directory is shared by every thread in the process, so only one thread may be inside a cd block at a time
+_cd_lock = threading.RLock()
 
 
 @contextlib.contextmanager
 def cd(path):
-    cwd = os.getcwd()
-    os.chdir(path)
-    try:
-        yield
-    finally:
-        os.chdir(cwd)
+    with _cd_lock:
+        cwd = os.getcwd()
+        os.chdir(path)
+        try:
+            yield
+        finally:
+            os.chdir(cwd)
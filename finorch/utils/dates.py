@@ -0,0 +1,18 @@
+import datetime
+
+
+def to_datetime(value):
+    """
+    Converts a time received from a caller to a datetime. XML-RPC callers may send times as strings, or as
+    xmlrpc.client.DateTime objects.
+
+    :param value: A datetime, an ISO 8601 string, or an object with a timetuple() method
+    :return: The time as a datetime
+    """
+    if isinstance(value, datetime.datetime):
+        return value
+
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+
+    return datetime.datetime(*value.timetuple()[:6])
@@ -0,0 +1,137 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import sys
+
+# Events, see inotify(7)
+IN_ATTRIB = 0x00000004
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+# Flags for inotify_init1
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+# The fixed size header of each event read from an inotify file descriptor: wd, mask, cookie and the length of the name
+_EVENT_HEADER = struct.Struct('iIII')
+
+# Enough to read many events per read call, any events that don't fit are returned by the next read
+_READ_SIZE = 64 * 1024
+
+_libc = None
+
+
+def _get_libc():
+    """
+    Loads the C library the first time it is needed
+
+    :return: The C library, or None if it doesn't provide inotify
+    """
+    global _libc
+
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch
+        except (OSError, AttributeError):
+            libc = False
+
+        _libc = libc
+
+    return _libc or None
+
+
+def inotify_available():
+    """
+    Checks if inotify can be used on this system
+
+    :return: True if inotify is available, otherwise False
+    """
+    return sys.platform.startswith('linux') and _get_libc() is not None
+
+
+class Inotify:
+    """
+    A minimal wrapper around a Linux inotify instance, using the C library directly so that no extra dependencies are
+    needed. Events are read without blocking, callers wait for the file descriptor to become readable (ex. with
+    select) before calling read_events.
+    """
+
+    def __init__(self):
+        """
+        Creates the inotify instance
+
+        Raises OSError if the instance could not be created
+        """
+        self._libc = _get_libc()
+        if not self._libc:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "Unable to create an inotify instance")
+
+    def fileno(self):
+        return self._fd
+
+    def add_watch(self, path, mask):
+        """
+        Watches a path for events
+
+        Raises OSError if the path could not be watched, ex. with ENOSPC if the user's watch limit has been reached
+
+        :param path: The path to watch
+        :param mask: The events to watch for
+        :return: The watch descriptor, which identifies the path in events
+        """
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), str(path))
+
+        return wd
+
+    def rm_watch(self, wd):
+        """
+        Stops watching a path. Errors are ignored, since the path may have already been removed.
+
+        :param wd: The watch descriptor of the path
+        :return: None
+        """
+        self._libc.inotify_rm_watch(self._fd, wd)
+
+    def read_events(self):
+        """
+        Reads the events that are ready
+
+        :return: A list of (watch descriptor, event mask, name) tuples. The name is the name of the file in the watched
+        directory the event is for, or an empty string for events on the watched path itself.
+        """
+        try:
+            data = os.read(self._fd, _READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+
+            # The name is padded with null bytes
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            events.append((wd, mask, name))
+
+        return events
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
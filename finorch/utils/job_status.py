@@ -7,6 +7,8 @@ class JobStatus:
     RUNNING = 50
     # A job is cancelled if it was queued or running and was then cancelled
     CANCELLED = 70
+    # A job has errored if the cluster stopped it before it finished (ex. out of memory, timed out or node failure)
+    ERROR = 400
     # A job is completed if it is finished running on the cluster without error
     COMPLETED = 500
 
@@ -20,6 +22,8 @@ class JobStatus:
             return 'Running'
         elif status == JobStatus.CANCELLED:
             return 'Cancelled'
+        elif status == JobStatus.ERROR:
+            return 'Error'
         elif status == JobStatus.COMPLETED:
             return 'Completed'
         else:
@@ -0,0 +1,99 @@
+import bisect
+import threading
+import time
+
+# The upper bounds (in seconds) of the buckets of the per-method latency histograms
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60)
+
+
+def is_error_result(result):
+    """
+    Checks if the result of a client method is an error. Client methods report errors by returning (None, reason)
+    rather than raising.
+
+    :param result: The result of the method
+    :return: True if the result is an error, otherwise False
+    """
+    return isinstance(result, (list, tuple)) and len(result) == 2 and result[0] is None
+
+
+class _MethodMetrics:
+    """
+    The metrics recorded for a single rpc method
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.min_time = None
+        self.max_time = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def as_dict(self):
+        # Values are returned as floats where they could exceed the range of an XML-RPC integer
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_time': self.total_time,
+            'min_time': self.min_time or 0.0,
+            'max_time': self.max_time,
+            'mean_time': self.total_time / self.calls if self.calls else 0.0,
+            'bytes_in': float(self.bytes_in),
+            'bytes_out': float(self.bytes_out),
+            'latency_histogram': {
+                str(bound): count for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), self.histogram)
+            },
+        }
+
+
+class RpcMetrics:
+    """
+    Thread safe per-method call counts, latency histograms, request and response sizes and error counts for an rpc
+    server
+    """
+
+    def __init__(self):
+        self._start_time = time.time()
+        self._methods = {}
+        self._lock = threading.Lock()
+
+    def record(self, method, seconds, bytes_in=0, bytes_out=0, error=False):
+        """
+        Records a single call
+
+        :param method: The name of the method that was called
+        :param seconds: How long the method took to run
+        :param bytes_in: The size of the request
+        :param bytes_out: The size of the response
+        :param error: If the call failed
+        :return: None
+        """
+        with self._lock:
+            metrics = self._methods.get(method)
+            if not metrics:
+                metrics = self._methods[method] = _MethodMetrics()
+
+            metrics.calls += 1
+            metrics.errors += bool(error)
+            metrics.total_time += seconds
+            metrics.min_time = seconds if metrics.min_time is None else min(metrics.min_time, seconds)
+            metrics.max_time = max(metrics.max_time, seconds)
+            metrics.bytes_in += bytes_in
+            metrics.bytes_out += bytes_out
+            metrics.histogram[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def get_metrics(self):
+        """
+        Gets a snapshot of the recorded metrics
+
+        :return: A dict containing the server uptime in seconds, and a dict of method name -> metrics for that method.
+        Each histogram bucket counts the calls that took at most its bound (and more than the previous bound).
+        """
+        with self._lock:
+            return {
+                'uptime': time.time() - self._start_time,
+                'methods': {method: metrics.as_dict() for method, metrics in self._methods.items()},
+            }
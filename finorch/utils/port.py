@@ -7,3 +7,11 @@ def test_port_open(port):
     result = sock.connect_ex(("127.0.0.1", int(port))) == 0
     sock.close()
     return result
+
+
+def test_socket_open(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # connect_ex returns 0 if the connection was successful
+    result = sock.connect_ex(str(path)) == 0
+    sock.close()
+    return result
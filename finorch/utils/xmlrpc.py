@@ -1,15 +1,235 @@
+import errno
+import http.client
+import os
+import selectors
+import socket
+import threading
+import time
+import xmlrpc.client
+from concurrent.futures import ThreadPoolExecutor
 from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
 
+from finorch.utils import binrpc
+from finorch.utils.metrics import RpcMetrics, is_error_result
+from finorch.utils.port import test_socket_open
+
+# How long (in seconds) an idle persistent connection is kept open before the server closes it
+KEEP_ALIVE_TIMEOUT = 30
+
+# The prefix of the coroutine methods of a registered instance, which are only served by AsyncXMLRPCServer
+ASYNC_METHOD_PREFIX = 'async_'
+
+
+def remove_stale_socket(socket_path):
+    """
+    Removes a unix domain socket file left behind by a server that is no longer running. Raises an OSError if a server
+    is still listening on the socket.
+
+    :param socket_path: The path to the socket file
+    :return: None
+    """
+    if os.path.exists(socket_path):
+        if test_socket_open(socket_path):
+            raise OSError(errno.EADDRINUSE, f"A server is already listening on {socket_path}")
+
+        os.unlink(socket_path)
+
 
 class RequestHandler(SimpleXMLRPCRequestHandler):
-    rpc_paths = ('/rpc',)
+    rpc_paths = ('/rpc', binrpc.BINARY_RPC_PATH)
+
+    def setup(self):
+        # TCP_NODELAY can't be set on unix domain sockets
+        if self.server.address_family == socket.AF_UNIX:
+            self.disable_nagle_algorithm = False
+
+        super().setup()
+
+    def address_string(self):
+        # Connections over a unix domain socket have no client address
+        return super().address_string() if self.client_address else 'localhost'
+
+    def do_POST(self):
+        """
+        Handles binary rpc requests, any other request is handled as XML-RPC
+
+        :return: None
+        """
+        if self.path != binrpc.BINARY_RPC_PATH:
+            super().do_POST()
+            return
+
+        try:
+            size_remaining = int(self.headers["content-length"])
+            data = bytearray()
+            while size_remaining:
+                chunk = self.rfile.read(min(size_remaining, 10 * 1024 * 1024))
+                if not chunk:
+                    break
+                data += chunk
+                size_remaining -= len(chunk)
+
+            response = binrpc.dispatch(self.server, data)
+            self.server.record_call(len(data), sum(len(p) for p in response))
+
+            response, headers = binrpc.compress_response(
+                response,
+                self.headers.get("Accept-Encoding"),
+                self.headers.get(binrpc.COMPRESSION_LEVEL_HEADER),
+                self.headers.get(binrpc.COMPRESSION_THRESHOLD_HEADER)
+            )
+        except Exception:
+            self.send_response(500)
+            self.send_header("Content-length", "0")
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header("Content-type", binrpc.CONTENT_TYPE)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-length", str(sum(len(p) for p in response)))
+            self.end_headers()
+
+            # Write each part separately so that large byte payloads are not copied
+            for part in response:
+                self.wfile.write(part)
+
+
+class KeepAliveRequestHandler(RequestHandler):
+    """
+    Request handler that supports HTTP/1.1 persistent connections, so many calls can be made over one connection (and
+    so one ssh channel when tunnelled). Each call to handle serves a single request, between requests the server waits
+    for the connection to become readable without holding a worker thread. Idle connections are closed after
+    KEEP_ALIVE_TIMEOUT seconds.
+    """
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEP_ALIVE_TIMEOUT
+
+    def handle(self):
+        """
+        Handles a single request, leaving close_connection unset if the connection should be kept alive
+
+        :return: None
+        """
+        self.close_connection = True
+        self.handle_one_request()
+
+    def finish(self):
+        """
+        Closes the connection's files once the connection is no longer kept alive
+
+        :return: None
+        """
+        if self.close_connection:
+            super().finish()
+        else:
+            self.wfile.flush()
 
 
 class XMLRPCServer(SimpleXMLRPCServer):
-    def __init__(self, *args, **kwargs):
-        super().__init__(requestHandler=RequestHandler, allow_none=True, *args, **kwargs)
+    def __init__(self, *args, max_workers=None, metrics=None, **kwargs):
+        """
+        Creates a new XMLRPC server
+
+        :param max_workers: If set, requests are handled concurrently by a bounded pool of this many worker threads,
+        and connections are kept alive between requests. If None, requests are handled one at a time on the thread
+        running serve_forever, and each connection is closed after a single request.
+        :param metrics: Optional RpcMetrics to record calls in, so that several servers can share their metrics. If
+        None the server records calls in its own RpcMetrics.
+        """
         self._quit = False
 
+        self.metrics = metrics or RpcMetrics()
+
+        # Details of the call currently being handled by each thread, recorded once the response size is known
+        self._current_call = threading.local()
+
+        # The connections currently being handled by worker threads
+        self._active_requests = set()
+        self._active_requests_lock = threading.Lock()
+
+        # Persistent connections waiting for their next request, mapped to their (client address, handler, time they
+        # became idle). These are only watched by the thread running serve_forever, workers hand connections back to
+        # it through _parked_requests
+        self._idle_requests = {}
+        self._parked_requests = []
+
+        self._executor = None
+        self._selector = None
+        if max_workers:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='xmlrpc')
+
+            # Idle persistent connections are waited on alongside the server socket, and the wake socket interrupts
+            # the wait when a worker parks a connection
+            self._selector = selectors.DefaultSelector()
+            self._wake_read, self._wake_write = socket.socketpair()
+            self._wake_read.setblocking(False)
+            self._selector.register(self._wake_read, selectors.EVENT_READ)
+
+            # Since terminate is called from a worker thread, handle_request needs to wake up periodically to notice
+            # that the server is ready to quit
+            self.timeout = 0.5
+
+        # The server state is set up first, since server_close is called if binding the socket fails
+        super().__init__(
+            requestHandler=KeepAliveRequestHandler if max_workers else RequestHandler,
+            allow_none=True,
+            *args,
+            **kwargs
+        )
+
+        if self._selector:
+            self._selector.register(self, selectors.EVENT_READ)
+
+        self.register_function(self.get_protocols, 'get_protocols')
+        self.register_function(binrpc.get_compressions, 'get_compressions')
+        self.register_function(self.metrics.get_metrics, 'get_metrics')
+
+    def _dispatch(self, method, params):
+        """
+        Dispatches the call, timing it for the metrics
+
+        :param method: The name of the method to call
+        :param params: The parameters of the method
+        :return: The result of the method
+        """
+        # A coroutine method of the instance can't be called from a worker thread, and its result can't be marshalled
+        if method.startswith(ASYNC_METHOD_PREFIX) and method not in self.funcs:
+            raise Exception('method "%s" is not supported' % method)
+
+        start = time.perf_counter()
+        error = True
+        try:
+            result = super()._dispatch(method, params)
+            error = is_error_result(result)
+            return result
+        finally:
+            self._current_call.details = method, time.perf_counter() - start, error
+
+    def system_listMethods(self):
+        return [method for method in super().system_listMethods() if not method.startswith(ASYNC_METHOD_PREFIX)]
+
+    def _marshaled_dispatch(self, data, dispatch_method=None, path=None):
+        response = super()._marshaled_dispatch(data, dispatch_method, path)
+        self.record_call(len(data), len(response))
+        return response
+
+    def record_call(self, bytes_in, bytes_out):
+        """
+        Records the call that was just dispatched on this thread in the metrics
+
+        :param bytes_in: The size of the request
+        :param bytes_out: The size of the response
+        :return: None
+        """
+        details = getattr(self._current_call, 'details', None)
+        self._current_call.details = None
+
+        # Requests that couldn't be decoded never reach a method
+        if details:
+            method, seconds, error = details
+            self.metrics.record(method, seconds, bytes_in, bytes_out, error)
+
     def serve_forever(self, **kwargs):
         """
         Overrides the serve_forever function to wait for the server to be ready to quit
@@ -18,7 +238,198 @@ class XMLRPCServer(SimpleXMLRPCServer):
         :return: None
         """
         while not self._quit:
-            self.handle_request()
+            if self._selector:
+                self._handle_events()
+            else:
+                self.handle_request()
+
+    def _handle_events(self):
+        """
+        Waits for a new connection, or for an idle persistent connection to receive its next request, and hands it
+        off to the worker pool. Connections that have been idle for more than KEEP_ALIVE_TIMEOUT seconds are closed.
+
+        :return: None
+        """
+        try:
+            events = self._selector.select(self.timeout)
+        except (OSError, ValueError):
+            if self._quit:
+                # The server was closed by another thread
+                return
+            raise
+
+        for key, _ in events:
+            if key.fileobj is self:
+                self._handle_request_noblock()
+            elif key.fileobj is self._wake_read:
+                try:
+                    while self._wake_read.recv(1024):
+                        pass
+                except BlockingIOError:
+                    pass
+            else:
+                # The next request has arrived, or the client closed the connection
+                request = key.fileobj
+                self._selector.unregister(request)
+                client_address, handler, _ = self._idle_requests.pop(request)
+                self._submit_request(request, client_address, handler)
+
+        with self._active_requests_lock:
+            parked, self._parked_requests = self._parked_requests, []
+
+        now = time.monotonic()
+        for request, client_address, handler in parked:
+            self._idle_requests[request] = client_address, handler, now
+            self._selector.register(request, selectors.EVENT_READ)
+
+        for request, (client_address, handler, idle_since) in list(self._idle_requests.items()):
+            if now - idle_since > KEEP_ALIVE_TIMEOUT:
+                self._close_idle_request(request)
+
+    def _close_idle_request(self, request):
+        """
+        Closes an idle persistent connection
+
+        :param request: The request socket
+        :return: None
+        """
+        self._selector.unregister(request)
+        _, handler, _ = self._idle_requests.pop(request)
+        handler.close_connection = True
+        handler.finish()
+        self.shutdown_request(request)
+
+    def process_request(self, request, client_address):
+        """
+        Hands the request off to the worker pool if the server is running concurrently, otherwise handles the request
+        on the current thread
+
+        :param request: The request socket
+        :param client_address: The address of the client
+        :return: None
+        """
+        if not self._executor:
+            super().process_request(request, client_address)
+            return
+
+        self._submit_request(request, client_address)
+
+    def _submit_request(self, request, client_address, handler=None):
+        """
+        Hands a connection with a request waiting on it off to the worker pool
+
+        :param request: The request socket
+        :param client_address: The address of the client
+        :param handler: The handler of a persistent connection that has served earlier requests, or None for a new
+        connection
+        :return: None
+        """
+        try:
+            self._executor.submit(self._process_request_worker, request, client_address, handler)
+        except RuntimeError:
+            # The pool has been shut down, so the request can't be handled
+            self.shutdown_request(request)
+
+    def _process_request_worker(self, request, client_address, handler=None):
+        """
+        Handles a single request on a worker thread. This mirrors socketserver.ThreadingMixIn.process_request_thread,
+        except that a connection that is kept alive is handed back to the thread running serve_forever to wait for its
+        next request.
+
+        :param request: The request socket
+        :param client_address: The address of the client
+        :param handler: The handler of a persistent connection that has served earlier requests, or None for a new
+        connection
+        :return: None
+        """
+        with self._active_requests_lock:
+            if self._quit:
+                # The server was terminated while this request was waiting for a worker
+                self.shutdown_request(request)
+                return
+
+            self._active_requests.add(request)
+
+        keep_alive = False
+        try:
+            if handler:
+                handler.handle()
+                handler.finish()
+            else:
+                # Constructing the handler sets up the connection and handles the first request
+                handler = self.RequestHandlerClass(request, client_address, self)
+
+            keep_alive = not handler.close_connection
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            with self._active_requests_lock:
+                self._active_requests.discard(request)
+
+                if keep_alive and not self._quit:
+                    self._parked_requests.append((request, client_address, handler))
+                    self._wake()
+                    return
+
+            self.shutdown_request(request)
+
+    def _wake(self):
+        """
+        Wakes the thread running serve_forever if it is waiting for a connection
+
+        :return: None
+        """
+        try:
+            self._wake_write.send(b'\0')
+        except OSError:
+            # The wake socket is full, so serve_forever is already due to wake, or the server has been closed
+            pass
+
+    def server_close(self):
+        """
+        Closes the server socket and stops accepting work on the worker pool. Requests that are already in progress
+        are allowed to finish, but idle persistent connections are closed.
+
+        :return: None
+        """
+        if not self._selector:
+            super().server_close()
+            return
+
+        try:
+            self._selector.unregister(self)
+        except (KeyError, ValueError):
+            # Binding the socket failed, so it was never registered
+            pass
+
+        super().server_close()
+
+        self._executor.shutdown(wait=False)
+
+        with self._active_requests_lock:
+            # Stop workers that are still handling requests from parking their connections
+            self._quit = True
+
+            for request, client_address, handler in self._parked_requests:
+                self._idle_requests[request] = client_address, handler, None
+                self._selector.register(request, selectors.EVENT_READ)
+            self._parked_requests = []
+
+        for request in list(self._idle_requests):
+            self._close_idle_request(request)
+
+        self._selector.close()
+        self._wake_read.close()
+        self._wake_write.close()
+
+    @staticmethod
+    def get_protocols():
+        """
+        Called by the API when connecting to find out which rpc protocols this server supports, in order of preference
+
+        :return: A list of protocol names
+        """
+        return [binrpc.BINARY_PROTOCOL, binrpc.XMLRPC_PROTOCOL]
 
     def terminate(self):
         """
@@ -28,3 +439,79 @@ class XMLRPCServer(SimpleXMLRPCServer):
         """
 
         self._quit = True
+
+        if self._selector:
+            self._wake()
+
+
+class UnixXMLRPCServer(XMLRPCServer):
+    """
+    An XMLRPC server that listens on a unix domain socket rather than a TCP port
+    """
+    address_family = socket.AF_UNIX
+
+    # Set once the socket file belongs to this server, so that a failed bind doesn't remove another server's socket
+    _bound = False
+
+    def server_bind(self):
+        """
+        Binds the socket, removing any stale socket file left behind by a client that is no longer running. Raises an
+        OSError if another server is already listening on the socket.
+
+        :return: None
+        """
+        remove_stale_socket(self.server_address)
+
+        super().server_bind()
+        self._bound = True
+
+        # Only the current user should be able to talk to the client
+        os.chmod(self.server_address, 0o600)
+
+    def server_close(self):
+        """
+        Closes the server and removes the socket file
+
+        :return: None
+        """
+        super().server_close()
+
+        if not self._bound:
+            return
+
+        try:
+            os.unlink(self.server_address)
+        except FileNotFoundError:
+            pass
+
+
+class UnixStreamHTTPConnection(http.client.HTTPConnection):
+    """
+    An HTTP connection over a unix domain socket
+    """
+
+    def __init__(self, socket_path, *args, **kwargs):
+        super().__init__('localhost', *args, **kwargs)
+        self._socket_path = str(socket_path)
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self._socket_path)
+
+
+class UnixStreamTransport(xmlrpc.client.Transport):
+    """
+    An xmlrpc.client transport that connects over a unix domain socket
+    """
+
+    def __init__(self, socket_path, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._socket_path = socket_path
+
+    def make_connection(self, host):
+        # Return an existing connection if possible to allow HTTP/1.1 keep-alive
+        if self._connection and host == self._connection[0]:
+            return self._connection[1]
+
+        self._connection = host, UnixStreamHTTPConnection(self._socket_path)
+        return self._connection[1]
@@ -0,0 +1,101 @@
+"""
+Measures the latency of the per-job database lookups as the job table grows.
+
+Usage:
+
+    python -m scripts.benchmark_database [largest table size]
+
+Lookup latency should stay flat as the table grows, since every lookup is a single indexed query.
+"""
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from finorch.sessions.database import Database, Job
+from finorch.utils.job_status import JobStatus
+
+# The number of lookups timed for each method at each table size
+LOOKUPS = 1000
+
+# The number of rows inserted per statement while filling the table
+INSERT_CHUNK_SIZE = 50000
+
+
+def fill(db, identifiers, count):
+    """
+    Grows the job table to the specified number of rows
+
+    :param db: The Database to fill
+    :param identifiers: The identifiers already inserted, new identifiers are appended
+    :param count: The number of rows the table should contain
+    :return: None
+    """
+    while len(identifiers) < count:
+        chunk = [str(uuid.uuid4()) for _ in range(min(INSERT_CHUNK_SIZE, count - len(identifiers)))]
+
+        with db.engine.begin() as connection:
+            connection.execute(
+                Job.__table__.insert(),
+                [
+                    {'identifier': identifier, 'batch_id': len(identifiers) + i, 'status': JobStatus.PENDING}
+                    for i, identifier in enumerate(chunk)
+                ]
+            )
+
+        identifiers.extend(chunk)
+
+
+def time_lookups(fn, identifiers):
+    """
+    Times a lookup function against random identifiers
+
+    :param fn: The function to call with each identifier
+    :param identifiers: The identifiers to choose from
+    :return: The median and 99th percentile latency in microseconds
+    """
+    timings = []
+    for identifier in random.choices(identifiers, k=LOOKUPS):
+        start = time.perf_counter()
+        fn(identifier)
+        timings.append((time.perf_counter() - start) * 1e6)
+
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99)]
+
+
+def run():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    sizes = []
+    size = 1000
+    while size < largest:
+        sizes.append(size)
+        size *= 10
+    sizes.append(largest)
+
+    methods = {
+        'get_job_status': lambda db: db.get_job_status,
+        'update_job_status': lambda db: lambda identifier: db.update_job_status(identifier, JobStatus.RUNNING),
+        'get_job_batch_id': lambda db: db.get_job_batch_id,
+    }
+
+    print(f"{'rows':>10} {'method':<20} {'median (us)':>12} {'p99 (us)':>12}")
+
+    with TemporaryDirectory() as tmpdir:
+        db = Database(Path(tmpdir))
+        identifiers = []
+
+        for size in sizes:
+            fill(db, identifiers, size)
+
+            for name, method in methods.items():
+                median, p99 = time_lookups(method(db), identifiers)
+                print(f"{size:>10} {name:<20} {median:>12.1f} {p99:>12.1f}", flush=True)
+
+
+if __name__ == '__main__':
+    run()
@@ -7,8 +7,10 @@ from tempfile import TemporaryDirectory, NamedTemporaryFile
 from unittest import TestCase
 from unittest.mock import MagicMock, patch
 
+from finorch.config.config import WrapperConfigManager
 from finorch.sessions import CITSession
 from finorch.sessions.cit.client import CITClient
+from finorch.sessions.status_spool import STATUS_SPOOL
 from finorch.transport.exceptions import TransportStartJobException
 from finorch.utils.job_status import JobStatus
 from testfixtures import Replacer
@@ -79,6 +81,12 @@ class TestCITClient(TestCase):
             schedd_mock.return_value = ScheddMock()
 
             self.assertEqual(client._submit_condor_job(identifier, SCRIPT), 1234)
+
+            # The wrapper is told where to report the job's status
+            wrapper_config = WrapperConfigManager(working_dir)
+            self.assertEqual(wrapper_config.get_job_identifier(), identifier)
+            self.assertEqual(wrapper_config.get_status_spool(), str(client._exec_path / STATUS_SPOOL))
+            self.assertIsNone(wrapper_config.get_client_port())
             self.assertTrue(Path(working_dir / 'submit.sh').is_file())
             self.assertTrue(Path(working_dir / 'script.k').is_file())
 
@@ -129,6 +137,48 @@ class TestCITClient(TestCase):
         self.assertEqual(act_args[0], htcondor.JobAction.Hold)
         self.assertEqual(act_args[1], f"ClusterId == {job_id} && ProcID <= 1")
 
+    @patch("htcondor.Schedd")
+    def test_query_scheduler(self, schedd_mock):
+        client = CITClient(session_klass=CITSession)
+        self.assertEqual(client._query_scheduler([]), {})
+
+        schedd_mock.return_value.query.return_value = [
+            {'ClusterId': 1, 'JobStatus': 1},
+            {'ClusterId': 2, 'JobStatus': 2},
+            {'ClusterId': 3, 'JobStatus': 5, 'HoldReason': 'Memory limit exceeded'},
+        ]
+        schedd_mock.return_value.history.return_value = [
+            {'ClusterId': 4, 'JobStatus': 3},
+            {'ClusterId': 5, 'JobStatus': 4, 'ExitCode': 0},
+            {'ClusterId': 6, 'JobStatus': 4, 'ExitCode': 1},
+        ]
+
+        self.assertEqual(client._query_scheduler([1, 2, 3, 4, 5, 6, 7]), {
+            1: JobStatus.QUEUED,
+            2: JobStatus.RUNNING,
+            3: JobStatus.ERROR,
+            4: JobStatus.CANCELLED,
+            5: JobStatus.COMPLETED,
+            6: JobStatus.ERROR,
+        })
+
+        # The queue is queried once for all of the jobs, and the history only for the jobs that have left the queue
+        schedd_mock.return_value.query.assert_called_once_with(
+            'member(ClusterId, {1, 2, 3, 4, 5, 6, 7})', ['ClusterId', 'JobStatus', 'ExitCode', 'HoldReason']
+        )
+        schedd_mock.return_value.history.assert_called_once_with(
+            'member(ClusterId, {4, 5, 6, 7})', ['ClusterId', 'JobStatus', 'ExitCode', 'HoldReason'], match=4
+        )
+
+        # The scheduler connection is reused, and replaced after an error
+        client._cancel_condor_job(1)
+        self.assertEqual(schedd_mock.call_count, 1)
+
+        schedd_mock.return_value.query.side_effect = Exception('condor is down')
+        self.assertEqual(client._query_scheduler([1]), {})
+        client._cancel_condor_job(1)
+        self.assertEqual(schedd_mock.call_count, 2)
+
     def test_start_job(self):
         with TemporaryDirectory() as temp_dir:
             client = CITClient(session_klass=CITSession)
@@ -237,9 +287,11 @@ class TestCITClient(TestCase):
 
             os.makedirs(client._exec_path / identifier, exist_ok=True)
             open(client._exec_path / identifier / 'started', 'w').close()
+            client._refresh_job_statuses()
             self.assertEqual(client.get_job_status(identifier), JobStatus.RUNNING)
 
             open(client._exec_path / identifier / 'finished', 'w').close()
+            client._refresh_job_statuses()
             self.assertEqual(client.get_job_status(identifier), JobStatus.COMPLETED)
 
     def test_stop_job(self):
@@ -261,16 +313,30 @@ class TestCITClient(TestCase):
             os.makedirs(client._exec_path / identifier, exist_ok=True)
             open(client._exec_path / identifier / 'started', 'w').close()
 
-            client._cancel_condor_job = MagicMock()
+            # The job is cancelled before condor holds it, so the status reconciler never sees the held job as an error
+            client._cancel_condor_job = MagicMock(
+                side_effect=lambda _: self.assertEqual(client.db.get_job_status(identifier), JobStatus.CANCELLED)
+            )
             client.stop_job(identifier)
             self.assertEqual(client._cancel_condor_job.call_count, 1)
 
+            # If condor can't hold the job its status is put back
+            client._submit_condor_job.return_value = 4322
+            identifier = client.start_job(SCRIPT)
+
+            client._cancel_condor_job = MagicMock(side_effect=Exception('condor failed'))
+            with self.assertRaises(Exception):
+                client.stop_job(identifier)
+
+            self.assertEqual(client.get_job_status(identifier), JobStatus.QUEUED)
+
             client._submit_condor_job.return_value = 1342
             identifier = client.start_job(SCRIPT)
 
             os.makedirs(client._exec_path / identifier, exist_ok=True)
             open(client._exec_path / identifier / 'started', 'w').close()
             open(client._exec_path / identifier / 'finished', 'w').close()
+            client._refresh_job_statuses()
 
             client._cancel_condor_job = MagicMock()
             client.stop_job(identifier)
@@ -5,10 +5,13 @@ from pathlib import Path
 from tempfile import NamedTemporaryFile, TemporaryDirectory
 from threading import Thread
 from time import sleep
+from unittest import mock
 
+from finorch.config.config import client_config_manager, STATUS_WATCHER_OFF
 from finorch.utils.job_status import JobStatus
 
 from finorch.sessions import LocalSession
+from finorch.sessions.abstract_client import WAIT_ALL
 from finorch.sessions.local.client import _start_wrapper, LocalClient
 
 
@@ -109,6 +112,90 @@ def test_start_job():
         assert open(str((Path(tmpdir) / identifier / 'script.k')), 'r').read() == SCRIPT
 
 
+def test_start_jobs():
+    client = LocalClient(session_klass=LocalSession)
+    with TemporaryDirectory() as tmpdir:
+        client.set_exec_path(tmpdir)
+
+        identifiers = client.start_jobs([SCRIPT] * 3)
+        assert len(set(identifiers)) == 3
+        assert [job['identifier'] for job in client.get_jobs()] == identifiers
+
+        # The jobs are queued once the process pool has accepted them
+        assert all(job['queued_at'] is not None for job in client.get_jobs(fields=['queued_at']))
+
+        assert client.wait_for_jobs(identifiers, WAIT_ALL, 25) == {
+            identifier: JobStatus.COMPLETED for identifier in identifiers
+        }
+
+        for identifier in identifiers:
+            assert (Path(tmpdir) / identifier / 'data.pickle').exists()
+
+        assert client.start_jobs([]) == []
+
+
+def test_status_watcher():
+    client = LocalClient(session_klass=LocalSession)
+    with TemporaryDirectory() as tmpdir:
+        client.set_exec_path(tmpdir)
+        assert client._watcher is not None
+
+        # Status reads are served from the database, the watcher updates it as the markers are written
+        with mock.patch.object(client, '_scan_job_markers', side_effect=Exception('The job directory was scanned')):
+            identifiers = client.start_jobs([SCRIPT] * 2)
+            assert client.get_job_statuses(identifiers)[identifiers[0]] in (
+                JobStatus.QUEUED, JobStatus.RUNNING, JobStatus.COMPLETED
+            )
+
+            assert client.wait_for_jobs(identifiers, WAIT_ALL, 25) == {
+                identifier: JobStatus.COMPLETED for identifier in identifiers
+            }
+
+        job = client.db.get_jobs(fields=['started_at', 'finished_at'])[0]
+        assert job['started_at'] is not None and job['finished_at'] is not None
+
+        client.terminate()
+        assert client._watcher is None
+
+        # The watcher can be turned off, the markers are then checked by the status reconciler
+        with mock.patch.object(client_config_manager, 'get_status_watcher', return_value=STATUS_WATCHER_OFF):
+            client.set_exec_path(tmpdir)
+
+        assert client._watcher is None
+        assert client.get_job_statuses(identifiers) == {identifier: JobStatus.COMPLETED for identifier in identifiers}
+
+
+def test_status_watcher_failed_job():
+    client = LocalClient(session_klass=LocalSession)
+    with TemporaryDirectory() as tmpdir:
+        client.set_exec_path(tmpdir)
+
+        identifier = str(uuid.uuid4())
+        client.db.add_job(identifier)
+        client._watcher.add_jobs([identifier])
+
+        # The wrapper reports the job as failed before touching its markers
+        client.report_job_status(identifier, JobStatus.ERROR)
+
+        os.makedirs(Path(tmpdir) / identifier)
+        open(Path(tmpdir) / identifier / 'started', 'w').close()
+        open(Path(tmpdir) / identifier / 'finished', 'w').close()
+
+        # Wait for the watcher to see the markers, it stops watching the job once it has finished
+        for _ in range(50):
+            if identifier not in client._watcher._jobs:
+                break
+            sleep(0.1)
+
+        assert identifier not in client._watcher._jobs
+
+        # The markers don't complete the failed job
+        assert client.db.get_job_status(identifier) == JobStatus.ERROR
+        assert client.get_job_status(identifier) == JobStatus.ERROR
+
+        client.terminate()
+
+
 def test_terminate():
     terminate_called = False
 
@@ -172,6 +259,27 @@ def test_get_job_file():
         assert client.get_job_file(identifier, 'script.k').decode('utf-8') == SCRIPT
 
 
+def test_get_job_file_chunk():
+    client = LocalClient(session_klass=LocalSession)
+    with TemporaryDirectory() as tmpdir:
+        client.set_exec_path(tmpdir)
+
+        identifier = str(uuid.uuid4())
+        os.makedirs(Path(tmpdir) / identifier)
+        with open(Path(tmpdir) / identifier / 'script.k', 'w') as f:
+            f.write(SCRIPT)
+
+        assert client.get_job_file_chunk(identifier, 'notreal', 0, 10) == \
+               (None, f"Unable to retrieve file {Path(tmpdir) / identifier / 'notreal'} "
+                      "as the file does not exist.")
+
+        data = SCRIPT.encode('utf-8')
+        assert client.get_job_file_chunk(identifier, 'script.k', 0, 10) == data[:10]
+        assert client.get_job_file_chunk(identifier, 'script.k', '10', 10) == data[10:20]
+        assert client.get_job_file_chunk(identifier, 'script.k', len(data) - 5, 10) == data[-5:]
+        assert client.get_job_file_chunk(identifier, 'script.k', len(data), 10) == b''
+
+
 def test_get_job_file_list():
     client = LocalClient(session_klass=LocalSession)
     with TemporaryDirectory() as tmpdir:
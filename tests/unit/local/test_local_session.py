@@ -5,4 +5,11 @@ def test_transport():
     session = LocalSession()
     assert session.transport is session._transport
 
+    # The client records metrics for the calls made to it
+    session.get_jobs()
+
+    metrics = session.get_client_metrics()
+    assert metrics['uptime'] > 0
+    assert metrics['methods']['get_jobs']['calls'] >= 1
+
     session.terminate()
@@ -1,7 +1,7 @@
 import pytest
 
 from finorch.transport.exceptions import TransportTerminateException, TransportGetJobFileException, \
-    TransportGetJobFileListException, TransportGetJobStatusException
+    TransportGetJobFileListException, TransportGetJobStatusException, TransportGetJobsException
 from finorch.transport.local import LocalTransport
 
 
@@ -18,12 +18,24 @@ class FakeRpc:
     def get_job_file_list(self, job_identifier):
         return None, "get_job_file_list_error"
 
+    def get_job_file_chunk(self, job_identifier, file_path, offset, size):
+        return None, "get_job_file_chunk_error"
+
     def get_job_status(self, job_identifier):
         return None, "get_job_status_error"
 
+    def get_job_statuses(self, job_identifiers, tags):
+        return None, "get_job_statuses_error"
+
+    def wait_for_jobs(self, job_identifiers, mode, timeout):
+        return None, "wait_for_jobs_error"
+
     def stop_job(self, job_identifier):
         return None, "stop_job_error"
 
+    def get_jobs(self, status, since, until, limit, cursor, fields, archived, tags):
+        return None, "get_jobs_error"
+
 
 def test_terminate():
     transport = LocalTransport('a', 'b')
@@ -46,6 +58,14 @@ def test_disconnect():
         transport.disconnect()
 
 
+def test_get_jobs():
+    transport = LocalTransport('a', 'b')
+    transport._client_rpc = FakeRpc()
+
+    with pytest.raises(TransportGetJobsException):
+        transport.get_jobs(fields=['bad'])
+
+
 def test_get_job_file():
     transport = LocalTransport('a', 'b')
     transport._client_rpc = FakeRpc()
@@ -53,6 +73,12 @@ def test_get_job_file():
     with pytest.raises(TransportGetJobFileException):
         transport.get_job_file(None, None)
 
+    with pytest.raises(TransportGetJobFileException):
+        transport.get_job_file_chunk(None, None, 0, 10)
+
+    with pytest.raises(TransportGetJobFileException):
+        list(transport.iter_job_file(None, None))
+
 
 def test_get_job_file_list():
     transport = LocalTransport('a', 'b')
@@ -69,6 +95,12 @@ def test_get_job_status():
     with pytest.raises(TransportGetJobStatusException):
         transport.get_job_status(None)
 
+    with pytest.raises(TransportGetJobStatusException):
+        transport.get_job_statuses([])
+
+    with pytest.raises(TransportGetJobStatusException):
+        transport.wait_for_jobs([], 'any', 1)
+
 
 def test_stop_job():
     transport = LocalTransport('a', 'b')
@@ -0,0 +1,74 @@
+import os
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Lock
+
+import pytest
+
+from finorch.sessions.local.watcher import JobMarkerWatcher
+from finorch.utils.inotify import inotify_available
+
+
+class Reports:
+    def __init__(self):
+        self.reports = []
+        self._lock = Lock()
+
+    def __call__(self, markers):
+        with self._lock:
+            self.reports.append({job_identifier: sorted(m) for job_identifier, m in markers.items()})
+
+    def wait_for(self, count):
+        for _ in range(500):
+            if len(self.reports) >= count:
+                break
+
+            time.sleep(0.01)
+
+        return self.reports
+
+
+@pytest.mark.parametrize('use_inotify', [
+    pytest.param(True, marks=pytest.mark.skipif(not inotify_available(), reason="inotify is not available")),
+    False
+])
+def test_job_marker_watcher(use_inotify):
+    with TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        reports = Reports()
+
+        # A job that started before it was watched
+        os.makedirs(tmp / 'old')
+        open(tmp / 'old' / 'started', 'w').close()
+
+        watcher = JobMarkerWatcher(tmp, reports, use_inotify, poll_interval=0.05)
+        assert watcher.uses_inotify == use_inotify
+
+        watcher.add_jobs(['old', 'new'])
+        watcher.start()
+
+        try:
+            assert reports.wait_for(1) == [{'old': ['started']}]
+
+            # A new job directory is created and the job runs
+            os.makedirs(tmp / 'new')
+            open(tmp / 'new' / 'started', 'w').close()
+            assert reports.wait_for(2)[1] == {'new': ['started']}
+
+            open(tmp / 'new' / 'finished', 'w').close()
+            assert reports.wait_for(3)[2] == {'new': ['finished', 'started']}
+
+            # Finished jobs are no longer watched, and unknown jobs are ignored
+            assert 'new' not in watcher._jobs
+            assert 'new' not in watcher._watches.values()
+
+            os.makedirs(tmp / 'unknown')
+            open(tmp / 'unknown' / 'started', 'w').close()
+            open(tmp / 'old' / 'finished', 'w').close()
+            assert reports.wait_for(4)[3] == {'old': ['finished', 'started']}
+
+            time.sleep(0.2)
+            assert len(reports.reports) == 4
+        finally:
+            watcher.stop()
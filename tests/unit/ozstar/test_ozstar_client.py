@@ -6,8 +6,10 @@ from tempfile import TemporaryDirectory, NamedTemporaryFile
 from unittest import TestCase
 from unittest.mock import MagicMock
 
+from finorch.config.config import WrapperConfigManager
 from finorch.sessions import OzStarSession
 from finorch.sessions.ozstar.client import OzStarClient
+from finorch.sessions.status_spool import STATUS_SPOOL
 from finorch.transport.exceptions import TransportStartJobException
 from finorch.utils.job_status import JobStatus
 from testfixtures import Replacer
@@ -73,6 +75,12 @@ class TestOzstarClient(TestCase):
             )
 
             self.assertEqual(client._submit_slurm_job(identifier, SCRIPT), 1234)
+
+            # The wrapper is told where to report the job's status
+            wrapper_config = WrapperConfigManager(working_dir)
+            self.assertEqual(wrapper_config.get_job_identifier(), identifier)
+            self.assertEqual(wrapper_config.get_status_spool(), str(client._exec_path / STATUS_SPOOL))
+            self.assertIsNone(wrapper_config.get_client_port())
             self.assertTrue(Path(working_dir / 'submit.sh').is_file())
             self.assertTrue(Path(working_dir / 'script.k').is_file())
 
@@ -156,6 +164,79 @@ class TestOzstarClient(TestCase):
             self.assertEqual(client._submit_slurm_job.call_count, 1)
             self.assertEqual(client.get_job_status(identifier), JobStatus.QUEUED)
 
+    def test_start_jobs(self):
+        with TemporaryDirectory() as temp_dir:
+            client = OzStarClient(session_klass=OzStarSession)
+            client.set_exec_path(temp_dir)
+            client._submit_slurm_job = MagicMock(side_effect=[1234, 1235, TransportStartJobException()])
+
+            identifiers = client.start_jobs([SCRIPT, SCRIPT])
+            self.assertEqual(len(identifiers), 2)
+            self.assertEqual([client.db.get_job_batch_id(i) for i in identifiers], [1234, 1235])
+
+            # Jobs submitted before a failed submission are still recorded
+            client._submit_slurm_job = MagicMock(side_effect=[1236, TransportStartJobException()])
+            with self.assertRaises(TransportStartJobException):
+                client.start_jobs([SCRIPT, SCRIPT])
+
+            jobs = client.get_jobs()
+            self.assertEqual(len(jobs), 3)
+            self.assertEqual(client.db.get_job_batch_id(jobs[2]['identifier']), 1236)
+
+    def test_query_scheduler(self):
+        client = OzStarClient(session_klass=OzStarSession)
+        self.assertEqual(client._query_scheduler([]), {})
+
+        self.popen.set_command(
+            'sacct --allocations --noheader --parsable2 --format=JobID,State --jobs=1234,1235,1236,1237,1238,1239,1240',
+            stdout=b'1234|PENDING\n1235|RUNNING\n1236|CANCELLED by 1000\n1237|OUT_OF_MEMORY\n1238_1|TIMEOUT\n'
+                   b'1239|PREEMPTED\n1240|REQUEUED\n'
+        )
+        self.assertEqual(client._query_scheduler([1234, 1235, 1236, 1237, 1238, 1239, 1240]), {
+            1234: JobStatus.QUEUED,
+            1235: JobStatus.RUNNING,
+            1236: JobStatus.CANCELLED,
+            1237: JobStatus.ERROR,
+            # Preempted jobs are requeued by slurm, so they aren't finished
+            1239: JobStatus.QUEUED,
+            1240: JobStatus.QUEUED,
+        })
+
+        # Problems querying slurm leave the statuses unchanged
+        self.popen.set_command(
+            'sacct --allocations --noheader --parsable2 --format=JobID,State --jobs=1',
+            returncode=1
+        )
+        self.assertEqual(client._query_scheduler([1]), {})
+
+    def test_sync_scheduler(self):
+        with TemporaryDirectory() as temp_dir:
+            client = OzStarClient(session_klass=OzStarSession)
+            client.set_exec_path(temp_dir)
+
+            client._submit_slurm_job = MagicMock(side_effect=[1234, 1235, 1236])
+            killed, running, queued = client.start_jobs([SCRIPT, SCRIPT, SCRIPT])
+            client._set_job_status(running, JobStatus.RUNNING)
+
+            # One scheduler query covers all of the unfinished jobs
+            client._query_scheduler = MagicMock(return_value={
+                1234: JobStatus.ERROR, 1235: JobStatus.QUEUED, 1236: JobStatus.RUNNING
+            })
+            self.assertEqual(client._sync_scheduler(), 2)
+            client._query_scheduler.assert_called_once_with([1234, 1235, 1236])
+
+            # Jobs killed by slurm are finished, and jobs never move backwards
+            self.assertEqual(client.get_job_statuses([killed, running, queued]), {
+                killed: JobStatus.ERROR, running: JobStatus.RUNNING, queued: JobStatus.RUNNING
+            })
+
+            # Finished jobs aren't queried again
+            client._query_scheduler.reset_mock()
+            client._sync_scheduler()
+            client._query_scheduler.assert_called_once_with([1235, 1236])
+
+            client.terminate()
+
     def test_terminate(self):
         client = OzStarClient(session_klass=OzStarSession)
         client._xml_rpc_server = MagicMock()
@@ -252,9 +333,11 @@ class TestOzstarClient(TestCase):
 
             os.makedirs(client._exec_path / identifier, exist_ok=True)
             open(client._exec_path / identifier / 'started', 'w').close()
+            client._refresh_job_statuses()
             self.assertEqual(client.get_job_status(identifier), JobStatus.RUNNING)
 
             open(client._exec_path / identifier / 'finished', 'w').close()
+            client._refresh_job_statuses()
             self.assertEqual(client.get_job_status(identifier), JobStatus.COMPLETED)
 
     def test_stop_job(self):
@@ -286,6 +369,7 @@ class TestOzstarClient(TestCase):
             os.makedirs(client._exec_path / identifier, exist_ok=True)
             open(client._exec_path / identifier / 'started', 'w').close()
             open(client._exec_path / identifier / 'finished', 'w').close()
+            client._refresh_job_statuses()
 
             client._cancel_slurm_job = MagicMock()
             client.stop_job(identifier)
@@ -1,3 +1,4 @@
+import datetime
 import sys
 import uuid
 import xmlrpc.client
@@ -11,8 +12,10 @@ import pytest
 
 from finorch.client.client import start_client
 from finorch.sessions import OzStarSession, SshSession
+from finorch.sessions.abstract_client import WAIT_ALL
 from finorch.transport.exceptions import TransportConnectionException, TransportGetJobFileException, \
-    TransportGetJobFileListException, TransportGetJobStatusException, TransportTerminateException
+    TransportGetJobFileListException, TransportGetJobStatusException, TransportTerminateException, \
+    TransportGetJobsException
 from finorch.transport.ssh import SshTransport
 from finorch.utils.job_status import JobStatus
 from tests.unit.local.test_local_client import SCRIPT
@@ -1005,14 +1008,19 @@ def test_get_jobs():
     with TemporaryDirectory() as tmpdir:
         client._client_rpc.set_exec_path(tmpdir)
 
-        identifier1 = client.start_job(SCRIPT)
-        identifier2 = client.start_job(SCRIPT)
+        identifier1 = client.start_job(SCRIPT, {'sweep': 'a', 'point': 1})
+        identifier2 = client.start_job(SCRIPT, {'sweep': 'a', 'point': 2})
 
-        while client.get_job_status(identifier1) != JobStatus.COMPLETED:
-            sleep(0.1)
+        # Wait in the client for both jobs to finish
+        while len(finished := client.wait_for_jobs([identifier1, identifier2], WAIT_ALL, 10)) < 2:
+            pass
 
-        while client.get_job_status(identifier2) != JobStatus.COMPLETED:
-            sleep(0.1)
+        assert finished == {identifier1: JobStatus.COMPLETED, identifier2: JobStatus.COMPLETED}
+
+        assert client.get_job_statuses([identifier1, identifier2, str(uuid.uuid4())]) == {
+            identifier1: JobStatus.COMPLETED,
+            identifier2: JobStatus.COMPLETED
+        }
 
         jobs = client.get_jobs()
         assert jobs[0]['id'] == 1
@@ -1025,6 +1033,35 @@ def test_get_jobs():
         assert jobs[1]['status'] == JobStatus.COMPLETED
         assert 'start_time' in jobs[1]
 
+        # Filters and pagination are applied in the client
+        assert client.get_jobs(
+            status=[JobStatus.COMPLETED], since=jobs[0]['start_time'], limit=1, cursor=1, fields=['identifier']
+        ) == [{'id': 2, 'identifier': identifier2}]
+
+        with pytest.raises(TransportGetJobsException):
+            client.get_jobs(fields=['bad'])
+
+        # Jobs can be found by their tags
+        assert client.get_job_statuses(tags={'sweep': 'a'}) == {
+            identifier1: JobStatus.COMPLETED,
+            identifier2: JobStatus.COMPLETED
+        }
+        assert client.get_jobs(tags={'point': 2}, fields=['tags']) == [
+            {'id': 2, 'tags': {'sweep': 'a', 'point': '2'}}
+        ]
+
+        stats = client.get_job_timing_stats(since=jobs[0]['start_time'])
+        assert stats['queue_wait']['count'] == 2
+        assert stats['runtime']['count'] == 2
+        assert stats['runtime']['p95'] >= stats['runtime']['p50'] > 0
+
+        # Archived jobs are moved out of the job list, but can still be looked up
+        assert client.archive_jobs(datetime.datetime.now()) == 2
+        assert client.get_jobs() == []
+        assert [job['identifier'] for job in client.get_jobs(archived=True)] == [identifier1, identifier2]
+        assert client.get_job_status(identifier1) == JobStatus.COMPLETED
+        assert len(client.get_job_statuses(tags={'sweep': 'a'})) == 2
+
     client.terminate()
 
 
@@ -1043,6 +1080,11 @@ def test_get_job_file():
 
         assert client.get_job_file(identifier, 'script.k').decode('utf-8') == SCRIPT
 
+        with pytest.raises(TransportGetJobFileException):
+            list(client.iter_job_file(identifier, 'notreal'))
+
+        assert b''.join(client.iter_job_file(identifier, 'script.k', 16)).decode('utf-8') == SCRIPT
+
     client.terminate()
 
 
@@ -1,9 +1,20 @@
+import datetime
+import os
 import tempfile
+import time
+import uuid
 from pathlib import Path
+from threading import Thread
+from unittest import mock
 
 import pytest
 
-from finorch.sessions.abstract_client import AbstractClient, DatabaseNotConfiguredException
+from finorch.sessions.abstract_client import AbstractClient, DatabaseNotConfiguredException, WAIT_ALL, WAIT_ANY, \
+    _FinishedStatusCache
+from finorch.sessions.status_spool import STATUS_SPOOL, append_status_report
+from finorch.utils.aioxmlrpc import AsyncXMLRPCServer
+from finorch.utils.binrpc import BinaryServerProxy
+from finorch.utils.job_status import JobStatus
 
 
 class TestClient(AbstractClient):
@@ -12,6 +23,9 @@ class TestClient(AbstractClient):
     def start_job(self, a):
         super().start_job(a)
 
+    def start_jobs(self, a):
+        super().start_jobs(a)
+
     def stop_job(self, a):
         super().stop_job(a)
 
@@ -77,6 +91,439 @@ def test_db():
     assert client.db is True
 
 
+def test_get_job_statuses():
+    client = TestClient(None)
+    client.set_exec_path(None)
+
+    queued, running, completed, cancelled = [str(uuid.uuid4()) for _ in range(4)]
+    for identifier in [queued, running, completed, cancelled]:
+        client.db.add_job(identifier)
+
+    os.makedirs(client._exec_path / running)
+    open(client._exec_path / running / 'started', 'w').close()
+
+    os.makedirs(client._exec_path / completed)
+    open(client._exec_path / completed / 'started', 'w').close()
+    open(client._exec_path / completed / 'finished', 'w').close()
+
+    client.db.update_job_status(cancelled, JobStatus.CANCELLED)
+
+    # The status reconciler brings the jobs up to date in the background, status requests then read the database
+    client._refresh_job_statuses()
+
+    missing = str(uuid.uuid4())
+    assert client.get_job_statuses([queued, running, completed, cancelled, missing]) == {
+        queued: JobStatus.QUEUED,
+        running: JobStatus.RUNNING,
+        completed: JobStatus.COMPLETED,
+        cancelled: JobStatus.CANCELLED
+    }
+
+    # The derived statuses should have been saved
+    assert client.db.get_job_status(queued) == JobStatus.QUEUED
+    assert client.db.get_job_status(completed) == JobStatus.COMPLETED
+
+    # Without any job identifiers or tags there are no statuses to get
+    assert client.get_job_statuses() == {}
+    assert client.get_job_statuses(None, {}) == {}
+
+
+def test_finished_status_cache():
+    cache = _FinishedStatusCache(max_size=2)
+    cache.update([('a', JobStatus.COMPLETED), ('b', JobStatus.RUNNING), ('c', JobStatus.CANCELLED)])
+    assert cache.get_many(['a', 'b', 'c']) == {'a': JobStatus.COMPLETED, 'c': JobStatus.CANCELLED}
+
+    # 'a' was used more recently than 'c', so 'c' is evicted
+    cache.get_many(['a'])
+    cache.update([('d', JobStatus.COMPLETED)])
+    assert cache.get_many(['a', 'c', 'd']) == {'a': JobStatus.COMPLETED, 'd': JobStatus.COMPLETED}
+    assert len(cache) == 2
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        client = TestClient(None)
+        client.set_exec_path(tmpdir)
+
+        running, completed = [str(uuid.uuid4()) for _ in range(2)]
+        client.db.add_jobs([running, completed])
+        client.db.update_job_statuses({running: JobStatus.RUNNING, completed: JobStatus.COMPLETED})
+
+        # Finished jobs are cached when the client starts
+        client = TestClient(None)
+        client.set_exec_path(tmpdir)
+        assert client._finished_statuses.get_many([running, completed]) == {completed: JobStatus.COMPLETED}
+
+        # Once a job has finished its status is served from memory
+        os.makedirs(client._exec_path / running)
+        open(client._exec_path / running / 'finished', 'w').close()
+        client._refresh_job_statuses()
+        assert client._get_job_status(running) == JobStatus.COMPLETED
+
+        client._db = None
+        assert client._get_job_status(running) == JobStatus.COMPLETED
+        assert client.get_job_statuses([running, completed]) == {
+            running: JobStatus.COMPLETED, completed: JobStatus.COMPLETED
+        }
+
+
+def test_reconcile_job_statuses():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        client = TestClient(None)
+        client.set_exec_path(tmpdir)
+
+        pending, running, completed, stopped, finished = [str(uuid.uuid4()) for _ in range(5)]
+        client.db.add_jobs([pending, running, completed, (stopped, 1234), finished])
+        client.db.update_job_statuses({
+            running: JobStatus.RUNNING, completed: JobStatus.RUNNING, finished: JobStatus.CANCELLED
+        })
+
+        # The jobs progress while the client isn't running
+        os.makedirs(Path(tmpdir) / running)
+        open(Path(tmpdir) / running / 'started', 'w').close()
+
+        os.makedirs(Path(tmpdir) / completed)
+        open(Path(tmpdir) / completed / 'started', 'w').close()
+        open(Path(tmpdir) / completed / 'finished', 'w').close()
+        os.utime(Path(tmpdir) / completed / 'finished', (1000000000, 1000000000))
+
+        # The scheduler knows about jobs that stopped without the wrapper finishing them
+        class SchedulerClient(TestClient):
+            scheduler_queries = []
+
+            def _query_scheduler(self, batch_ids):
+                self.scheduler_queries.append(batch_ids)
+                return {1234: JobStatus.CANCELLED}
+
+        client = SchedulerClient(None)
+        client.set_exec_path(tmpdir)
+
+        assert client.scheduler_queries == [[1234]]
+        assert client.db.get_job_statuses([pending, running, completed, stopped, finished]) == {
+            pending: JobStatus.QUEUED,
+            running: JobStatus.RUNNING,
+            completed: JobStatus.COMPLETED,
+            stopped: JobStatus.CANCELLED,
+            finished: JobStatus.CANCELLED,
+        }
+
+        # The newly finished jobs are cached, and their timestamps come from their markers
+        assert client._finished_statuses.get_many([completed, stopped]) == {
+            completed: JobStatus.COMPLETED, stopped: JobStatus.CANCELLED
+        }
+        job = client.db.get_jobs(status=JobStatus.COMPLETED, fields=['identifier', 'finished_at'])[0]
+        assert job == {'id': 3, 'identifier': completed, 'finished_at': datetime.datetime.fromtimestamp(1000000000)}
+
+        # Nothing is left to reconcile
+        assert client._reconcile_job_statuses() == 0
+
+
+def test_report_job_status():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        client = TestClient(None)
+        client.set_exec_path(tmpdir)
+
+        running, completed, failed, cancelled = [str(uuid.uuid4()) for _ in range(4)]
+        client.db.add_jobs([running, completed, failed, cancelled])
+        client.db.update_job_statuses({cancelled: JobStatus.CANCELLED})
+
+        # Until a wrapper reports to the client, the marker files are checked
+        os.makedirs(Path(tmpdir) / running)
+        open(Path(tmpdir) / running / 'started', 'w').close()
+        client._refresh_job_statuses()
+        assert client.get_job_statuses([running]) == {running: JobStatus.RUNNING}
+
+        # Reports from wrappers that can reach the client
+        started = datetime.datetime(2020, 1, 1)
+        assert client.report_job_status(completed, JobStatus.RUNNING, started.timestamp())
+        assert client.report_job_status(completed, JobStatus.COMPLETED, started.timestamp() + 60)
+
+        # Reports never move a job backwards, and reports for unknown jobs are ignored
+        assert client.report_job_status(cancelled, JobStatus.COMPLETED)
+        assert client.report_job_status(completed, JobStatus.RUNNING)
+        assert client.report_job_status(str(uuid.uuid4()), JobStatus.RUNNING)
+
+        # Reports written to the spool by wrappers that can't reach the client
+        append_status_report(Path(tmpdir) / STATUS_SPOOL, failed, JobStatus.RUNNING, started)
+        append_status_report(Path(tmpdir) / STATUS_SPOOL, failed, JobStatus.ERROR, started)
+
+        # Marker files are only swept now and then once wrappers report to the client
+        open(Path(tmpdir) / running / 'finished', 'w').close()
+
+        client._refresh_job_statuses()
+        assert client.get_job_statuses([running, completed, failed, cancelled]) == {
+            running: JobStatus.RUNNING,
+            completed: JobStatus.COMPLETED,
+            failed: JobStatus.ERROR,
+            cancelled: JobStatus.CANCELLED
+        }
+
+        job = client.db.get_jobs(status=JobStatus.COMPLETED, fields=['identifier', 'started_at', 'finished_at'])[0]
+        assert job == {
+            'id': 2,
+            'identifier': completed,
+            'started_at': started,
+            'finished_at': started + datetime.timedelta(seconds=60)
+        }
+
+        # The sweep finds jobs whose report was lost
+        client._next_marker_sweep = 0
+        client._refresh_job_statuses()
+        assert client.get_job_statuses([running]) == {running: JobStatus.COMPLETED}
+
+        # A wrapper finishes its job while the client isn't running
+        restarted = str(uuid.uuid4())
+        client.db.add_job(restarted)
+        append_status_report(Path(tmpdir) / STATUS_SPOOL, restarted, JobStatus.COMPLETED, started)
+
+        client = TestClient(None)
+        client.set_exec_path(tmpdir)
+
+        assert client.db.get_job_statuses([restarted]) == {restarted: JobStatus.COMPLETED}
+
+        # The spool is started afresh
+        assert not (Path(tmpdir) / STATUS_SPOOL).exists()
+        assert not (Path(tmpdir) / f'{STATUS_SPOOL}.previous').exists()
+
+
+def test_status_reconciler():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        client = TestClient(None)
+        client.set_exec_path(tmpdir)
+        assert client._statuses_reconciled
+
+        identifier = str(uuid.uuid4())
+        client.db.add_job(identifier)
+
+        os.makedirs(Path(tmpdir) / identifier)
+        open(Path(tmpdir) / identifier / 'started', 'w').close()
+
+        # Status requests don't touch the job directories while the reconciler is running
+        with mock.patch.object(client, '_scan_job_markers', side_effect=Exception('The job directory was scanned')):
+            assert client.get_job_statuses([identifier]) == {identifier: JobStatus.QUEUED}
+            assert client._get_job_status(identifier) == JobStatus.QUEUED
+
+        # The reconciler brings the job up to date in the background
+        client._start_status_reconciler(0.05)
+
+        deadline = time.monotonic() + 5
+        while client.db.get_job_status(identifier) != JobStatus.RUNNING and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        assert client.get_job_statuses([identifier]) == {identifier: JobStatus.RUNNING}
+
+        # Without the reconciler, the job is brought up to date as its status is requested
+        client._start_status_reconciler(0)
+        assert not client._statuses_reconciled
+        assert client._status_reconciler_stop is None
+
+        open(Path(tmpdir) / identifier / 'finished', 'w').close()
+        assert client.get_job_statuses([identifier]) == {identifier: JobStatus.COMPLETED}
+
+        # Clients that use a scheduler sync their jobs from it in the background, even without the reconciler
+        class SchedulerClient(TestClient):
+            _uses_scheduler = True
+
+            def _query_scheduler(self, batch_ids):
+                return {batch_id: JobStatus.CANCELLED for batch_id in batch_ids}
+
+        client = SchedulerClient(None)
+        client.set_exec_path(tmpdir)
+
+        stopped = str(uuid.uuid4())
+        client.db.add_jobs([(stopped, 1234)])
+        client._start_status_reconciler(0, 0.05)
+
+        deadline = time.monotonic() + 5
+        while client.db.get_job_status(stopped) != JobStatus.CANCELLED and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        assert client.db.get_job_status(stopped) == JobStatus.CANCELLED
+
+        client.terminate()
+        assert client._status_reconciler_stop.is_set()
+
+
+def test_job_timing():
+    client = TestClient(None)
+    client.set_exec_path(None)
+
+    identifier = str(uuid.uuid4())
+    client.db.add_job(identifier)
+
+    # Give the markers known modification times, the timestamps should come from the markers rather than from when
+    # the client noticed the job had finished
+    os.makedirs(client._exec_path / identifier)
+    for marker, mtime in [('started', 1000000000), ('finished', 1000000060)]:
+        open(client._exec_path / identifier / marker, 'w').close()
+        os.utime(client._exec_path / identifier / marker, (mtime, mtime))
+
+    client._refresh_job_statuses()
+    assert client.get_job_statuses([identifier]) == {identifier: JobStatus.COMPLETED}
+
+    job = client.db.get_jobs(fields=['started_at', 'finished_at', 'downloaded_at'])[0]
+    assert job['started_at'] == datetime.datetime.fromtimestamp(1000000000)
+    assert job['finished_at'] == datetime.datetime.fromtimestamp(1000000060)
+    assert job['downloaded_at'] is None
+
+    assert client.get_job_timing_stats()['runtime'] == {'count': 1, 'mean': 60, 'p50': 60, 'p95': 60, 'max': 60}
+
+    # Reading a file to the end records that the job's results have been downloaded
+    with open(client._exec_path / identifier / 'data', 'w') as f:
+        f.write('data')
+
+    assert client.get_job_file_chunk(identifier, 'data', 0, 2) == b'da'
+    assert client.db.get_jobs(fields=['downloaded_at'])[0]['downloaded_at'] is None
+
+    assert client.get_job_file_chunk(identifier, 'data', 2, 4) == b'ta'
+    assert client.db.get_jobs(fields=['downloaded_at'])[0]['downloaded_at'] is not None
+
+
+def test_wait_for_jobs():
+    client = TestClient(None)
+    client.set_exec_path(None)
+
+    first, second = [str(uuid.uuid4()) for _ in range(2)]
+    for identifier in [first, second]:
+        client.db.add_job(identifier)
+
+    # Nothing has finished, so the wait should time out
+    start = time.monotonic()
+    assert client.wait_for_jobs([first, second], WAIT_ANY, 0.2) == {}
+    assert time.monotonic() - start >= 0.2
+
+    def finish(identifier):
+        time.sleep(0.2)
+        os.makedirs(client._exec_path / identifier)
+        open(client._exec_path / identifier / 'finished', 'w').close()
+
+    # The wait should return as soon as the first job finishes
+    t = Thread(target=finish, args=(first,))
+    t.start()
+    start = time.monotonic()
+    assert client.wait_for_jobs([first, second], WAIT_ANY, 10) == {first: JobStatus.COMPLETED}
+    assert time.monotonic() - start < 5
+    t.join()
+
+    # Waiting for all jobs should only return once the second job finishes too
+    assert client.wait_for_jobs([first, second], WAIT_ALL, 0.2) == {first: JobStatus.COMPLETED}
+
+    # A status change made by the client wakes waiters straight away
+    t = Thread(target=lambda: (time.sleep(0.2), client._set_job_status(second, JobStatus.CANCELLED)))
+    t.start()
+    assert client.wait_for_jobs([first, second], WAIT_ALL, 10) == {
+        first: JobStatus.COMPLETED,
+        second: JobStatus.CANCELLED
+    }
+    t.join()
+
+    assert client.wait_for_jobs([], WAIT_ALL, 10) == {}
+    assert client.wait_for_jobs([first], 'notreal', 10)[0] is None
+    assert client.wait_for_jobs([first, str(uuid.uuid4())], WAIT_ANY, 10)[0] is None
+
+
+def test_wait_for_jobs_limit():
+    # Only half of the worker threads can be held by waiting callers
+    with mock.patch('finorch.sessions.abstract_client.client_config_manager.get_max_workers', return_value=4):
+        client = TestClient(None)
+
+    client.set_exec_path(None)
+
+    first, second = [str(uuid.uuid4()) for _ in range(2)]
+    for identifier in [first, second]:
+        client.db.add_job(identifier)
+
+    results = []
+    threads = [Thread(target=lambda: results.append(client.wait_for_jobs([first], WAIT_ANY, 10))) for _ in range(2)]
+    for t in threads:
+        t.start()
+
+    for _ in range(100):
+        if client._waiting_workers._value == 0:
+            break
+        time.sleep(0.05)
+
+    assert client._waiting_workers._value == 0
+
+    # Further callers don't wait, they are told which jobs have already finished
+    start = time.monotonic()
+    assert client.wait_for_jobs([first, second], WAIT_ANY, 10) == {}
+    assert time.monotonic() - start < 1
+
+    client._set_job_status(second, JobStatus.COMPLETED)
+    assert client.wait_for_jobs([first, second], WAIT_ALL, 10) == {second: JobStatus.COMPLETED}
+
+    client._set_job_status(first, JobStatus.COMPLETED)
+    for t in threads:
+        t.join(10)
+
+    assert results == [{first: JobStatus.COMPLETED}] * 2
+
+    # Waiting callers release their place when they return
+    assert client._waiting_workers._value == 2
+
+
+def test_async_wait_for_jobs():
+    client = TestClient(None)
+    client.set_exec_path(None)
+
+    first, second = [str(uuid.uuid4()) for _ in range(2)]
+    for identifier in [first, second]:
+        client.db.add_job(identifier)
+
+    # The asyncio server waits on the event loop, so many more callers than workers can wait at once
+    server = AsyncXMLRPCServer(('localhost', 0), max_workers=1)
+    server.register_instance(client)
+    server.register_function(server.terminate, 'terminate')
+
+    t = Thread(target=server.serve_forever)
+    t.start()
+
+    waiter_count = 20
+
+    try:
+        results = []
+
+        def waiter():
+            proxy = BinaryServerProxy('localhost', server.server_address[1])
+            results.append(proxy.wait_for_jobs([first, second], WAIT_ANY, 20))
+
+        threads = [Thread(target=waiter, daemon=True) for _ in range(waiter_count)]
+        for w in threads:
+            w.start()
+
+        for _ in range(100):
+            if len(client._status_waiters) == waiter_count:
+                break
+            time.sleep(0.05)
+
+        assert len(client._status_waiters) == waiter_count
+
+        # Blocking calls are still served while all of the callers are waiting
+        proxy = BinaryServerProxy('localhost', server.server_address[1])
+        start = time.monotonic()
+        assert proxy.get_job_statuses([first]) == {first: JobStatus.QUEUED}
+        assert time.monotonic() - start < 2
+
+        # A status change made by the client wakes every waiter straight away
+        start = time.monotonic()
+        client._set_job_status(first, JobStatus.COMPLETED)
+        for w in threads:
+            w.join(10)
+
+        assert time.monotonic() - start < 5
+        assert results == [{first: JobStatus.COMPLETED}] * waiter_count
+        assert not client._status_waiters
+
+        assert proxy.wait_for_jobs([first, second], WAIT_ALL, 0.2) == {first: JobStatus.COMPLETED}
+        assert proxy.wait_for_jobs([first], 'notreal', 10)[0] is None
+        assert proxy.wait_for_jobs([first, str(uuid.uuid4())], WAIT_ANY, 10)[0] is None
+
+        proxy.terminate()
+        t.join(5)
+        assert not t.is_alive()
+    finally:
+        server.server_close()
+
+
 def test_terminate():
     terminate_called = False
 
@@ -103,6 +550,9 @@ def test_stubs():
     with pytest.raises(NotImplementedError):
         client.start_job(None)
 
+    with pytest.raises(NotImplementedError):
+        client.start_jobs(None)
+
     with pytest.raises(NotImplementedError):
         client.stop_job(None)
 
@@ -0,0 +1,82 @@
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from finorch.sessions.abstract_session import AbstractSession
+from finorch.sessions.database import Database
+from finorch.utils.job_status import JobStatus
+
+
+class FakeTransport:
+    def __init__(self, db):
+        self.db = db
+        self.calls = 0
+        self.wait_results = []
+
+    def get_jobs(self, status, since, until, limit, cursor, fields, archived, tags):
+        self.calls += 1
+        return self.db.get_jobs(status, since, until, limit, cursor, fields, archived, tags)
+
+    def wait_for_jobs(self, job_identifiers, mode, timeout):
+        self.calls += 1
+        return self.wait_results.pop(0)
+
+
+class TestSession(AbstractSession):
+    __test__ = False
+
+    def __init__(self, transport):
+        super().__init__()
+        self._transport = transport
+
+
+def test_iter_jobs():
+    with TemporaryDirectory() as tmpdir:
+        db = Database(Path(tmpdir))
+        identifiers = [f'job-{i}' for i in range(25)]
+        db.add_jobs(identifiers)
+        db.update_job_statuses({identifier: JobStatus.COMPLETED for identifier in identifiers[::2]})
+
+        transport = FakeTransport(db)
+        session = TestSession(transport)
+
+        jobs = session.iter_jobs(page_size=10)
+        assert transport.calls == 0
+
+        # Pages are only fetched as the jobs are consumed
+        assert next(jobs)['identifier'] == identifiers[0]
+        assert transport.calls == 1
+
+        assert [job['identifier'] for job in jobs] == identifiers[1:]
+        assert transport.calls == 3
+
+        completed = list(session.iter_jobs(status=JobStatus.COMPLETED, fields=['identifier'], page_size=5))
+        assert [job['identifier'] for job in completed] == identifiers[::2]
+        assert all(set(job) == {'id', 'identifier'} for job in completed)
+
+        assert session.get_jobs(limit=2) == db.get_jobs(limit=2)
+
+
+@mock.patch('finorch.sessions.abstract_session.WAIT_BUSY_BACKOFF', 0.2)
+def test_wait_for_jobs_busy():
+    transport = FakeTransport(None)
+    session = TestSession(transport)
+
+    # The client returns straight away while it's too busy to wait, so the session backs off before calling again
+    transport.wait_results = [{}, {}, {'job': JobStatus.COMPLETED}]
+
+    start = time.monotonic()
+    assert session.wait_for_jobs(['job'], timeout=10) == {'job': JobStatus.COMPLETED}
+    assert time.monotonic() - start >= 0.4
+    assert transport.calls == 3
+
+
+def test_wait_for_jobs_empty():
+    transport = FakeTransport(None)
+    session = TestSession(transport)
+
+    # There is nothing to wait for, so the client isn't asked
+    assert session.wait_for_jobs([], 'any') == {}
+    assert session.wait_for_jobs([], 'all', timeout=10) == {}
+    assert transport.calls == 0
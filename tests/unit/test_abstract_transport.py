@@ -1,7 +1,13 @@
+import xmlrpc.client
+from threading import Thread
+from unittest import mock
+
 import pytest
 
 from finorch.transport.abstract_transport import AbstractTransport
 from finorch.transport.exceptions import TransportConnectionException
+from finorch.utils.binrpc import BinaryServerProxy, COMPRESSION_LZMA
+from finorch.utils.xmlrpc import XMLRPCServer
 
 
 class TestTransport(AbstractTransport):
@@ -10,18 +16,39 @@ class TestTransport(AbstractTransport):
     def start_job(self, a):
         super().start_job(a)
 
+    def start_jobs(self, a):
+        super().start_jobs(a)
+
     def get_jobs(self):
         super().get_jobs()
 
     def get_job_status(self, a):
         super().get_job_status(a)
 
+    def get_job_statuses(self, a):
+        super().get_job_statuses(a)
+
     def get_job_file(self, a, b):
         super().get_job_file(a, b)
 
     def get_job_file_list(self, a):
         super().get_job_file_list(a)
 
+    def get_client_metrics(self):
+        super().get_client_metrics()
+
+    def get_job_timing_stats(self, since=None, until=None):
+        super().get_job_timing_stats(since, until)
+
+    def archive_jobs(self, before, compact=True):
+        super().archive_jobs(before, compact)
+
+    def wait_for_jobs(self, a, b, c):
+        super().wait_for_jobs(a, b, c)
+
+    def get_job_file_chunk(self, a, b, c, d):
+        super().get_job_file_chunk(a, b, c, d)
+
     def terminate(self):
         super().terminate()
 
@@ -78,20 +105,109 @@ def test_stubs():
     with pytest.raises(NotImplementedError):
         transport.start_job(None)
 
+    with pytest.raises(NotImplementedError):
+        transport.start_jobs(None)
+
     with pytest.raises(NotImplementedError):
         transport.get_jobs()
 
     with pytest.raises(NotImplementedError):
         transport.get_job_status(None)
 
+    with pytest.raises(NotImplementedError):
+        transport.get_job_statuses(None)
+
+    with pytest.raises(NotImplementedError):
+        transport.get_client_metrics()
+
+    with pytest.raises(NotImplementedError):
+        transport.get_job_timing_stats()
+
+    with pytest.raises(NotImplementedError):
+        transport.archive_jobs(None)
+
+    with pytest.raises(NotImplementedError):
+        transport.wait_for_jobs(None, None, None)
+
     with pytest.raises(NotImplementedError):
         transport.get_job_file(None, None)
 
     with pytest.raises(NotImplementedError):
         transport.get_job_file_list(None)
 
+    with pytest.raises(NotImplementedError):
+        transport.get_job_file_chunk(None, None, None, None)
+
     with pytest.raises(NotImplementedError):
         transport.stop_job(None)
 
     with pytest.raises(NotImplementedError):
         transport.terminate()
+
+
+def test_iter_job_file():
+    data = bytes(range(256)) * 10
+    calls = []
+
+    class ChunkTransport(TestTransport):
+        def get_job_file_chunk(self, job_identifier, file_path, offset, size):
+            calls.append((offset, size))
+            return data[int(offset):int(offset) + size]
+
+    transport = ChunkTransport('a', 'b')
+
+    assert b''.join(transport.iter_job_file('job', 'data.pickle', 1000)) == data
+    assert calls == [(0, 1000), (1000, 1000), (2000, 1000)]
+
+    # A file that is an exact multiple of the chunk size needs a final empty read
+    calls.clear()
+    assert b''.join(transport.iter_job_file('job', 'data.pickle', 1280)) == data
+    assert calls == [(0, 1280), (1280, 1280), (2560, 1280)]
+
+    # An empty file yields no chunks
+    calls.clear()
+    data = b''
+    assert list(transport.iter_job_file('job', 'data.pickle', 1000)) == []
+    assert calls == [(0, 1000)]
+
+    # Chunks larger than the client returns are capped, rather than ending the file after the first chunk
+    class CappedTransport(TestTransport):
+        def get_job_file_chunk(self, job_identifier, file_path, offset, size):
+            calls.append((offset, size))
+            return data[int(offset):int(offset) + min(size, 1024)]
+
+    calls.clear()
+    data = bytes(range(250)) * 20
+    transport = CappedTransport('a', 'b')
+    with mock.patch('finorch.transport.abstract_transport.MAX_CHUNK_SIZE', 1024):
+        assert b''.join(transport.iter_job_file('job', 'data.pickle', 4096)) == data
+
+    assert calls == [(0, 1024), (1024, 1024), (2048, 1024), (3072, 1024), (4096, 1024)]
+
+
+def test_connect_client_rpc():
+    with XMLRPCServer(('localhost', 0), max_workers=1) as server:
+        t = Thread(target=server.serve_forever)
+        t.start()
+
+        try:
+            # The server supports the binary protocol, so it should be chosen
+            assert isinstance(TestTransport._connect_client_rpc(server.server_address[1]), BinaryServerProxy)
+
+            # Compression is requested if the client supports it
+            proxy = TestTransport._connect_client_rpc(server.server_address[1], compression=COMPRESSION_LZMA)
+            assert proxy._headers['Accept-Encoding'] == COMPRESSION_LZMA
+
+            server.funcs.pop('get_compressions')
+            proxy = TestTransport._connect_client_rpc(server.server_address[1], compression=COMPRESSION_LZMA)
+            assert 'Accept-Encoding' not in proxy._headers
+
+            # Fall back to XML-RPC if the client doesn't support protocol negotiation
+            server.funcs.pop('get_protocols')
+            assert isinstance(
+                TestTransport._connect_client_rpc(server.server_address[1]),
+                xmlrpc.client.ServerProxy
+            )
+        finally:
+            server.terminate()
+            t.join()
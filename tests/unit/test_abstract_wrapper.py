@@ -1,5 +1,6 @@
 import logging
 import pathlib
+import socket
 import sys
 import xmlrpc.client
 from tempfile import TemporaryDirectory
@@ -10,7 +11,10 @@ from finorch.config.config import WrapperConfigManager
 from finorch.sessions.abstract_client import AbstractClient
 from finorch.sessions.abstract_session import AbstractSession
 from finorch.sessions.abstract_wrapper import AbstractWrapper
+from finorch.sessions.status_spool import STATUS_SPOOL, StatusSpoolReader
 from finorch.utils.cd import cd
+from finorch.utils.job_status import JobStatus
+from finorch.utils.xmlrpc import XMLRPCServer
 
 
 def test_constructor():
@@ -43,6 +47,10 @@ def test_start_wrapper():
         wrapper_klass = AbstractWrapper
 
     with TemporaryDirectory() as tmpdir:
+        # The client tells the wrapper which job it is running and where to report its status
+        spool_path = pathlib.Path(tmpdir) / STATUS_SPOOL
+        AbstractWrapper.write_config(tmpdir, 'job', spool_path)
+
         def exec_thread():
             with cd(tmpdir):
                 AbstractWrapper.prepare_log_file()
@@ -59,6 +67,10 @@ def test_start_wrapper():
         # Thread should finish almost instantly
         assert not t.is_alive()
 
+        # The job's status was reported to the spool, since the client can't be reached
+        reports = StatusSpoolReader(spool_path).read()
+        assert [report[:2] for report in reports] == [('job', JobStatus.RUNNING), ('job', JobStatus.COMPLETED)]
+
 
 def test_start_wrapper_exception():
     # Dummy Wrapper
@@ -73,6 +85,10 @@ def test_start_wrapper_exception():
         wrapper_klass = MyWrapper
 
     with TemporaryDirectory() as tmpdir:
+        # The client tells the wrapper which job it is running and where to report its status
+        spool_path = pathlib.Path(tmpdir) / STATUS_SPOOL
+        AbstractWrapper.write_config(tmpdir, 'job', spool_path)
+
         def exec_thread():
             with cd(tmpdir):
                 AbstractWrapper.prepare_log_file()
@@ -89,6 +105,53 @@ def test_start_wrapper_exception():
         # Thread should finish almost instantly
         assert not t.is_alive()
 
+        # The job was reported as failed
+        reports = StatusSpoolReader(spool_path).read()
+        assert [report[:2] for report in reports] == [('job', JobStatus.RUNNING), ('job', JobStatus.ERROR)]
+
+
+def test_report_status():
+    class FakeClient:
+        def __init__(self):
+            self.reports = []
+
+        def report_job_status(self, job_identifier, status, timestamp):
+            self.reports.append((job_identifier, status, timestamp))
+            return True
+
+    with TemporaryDirectory() as tmpdir:
+        job_identifier = 'job'
+        spool = StatusSpoolReader(pathlib.Path(tmpdir) / STATUS_SPOOL)
+
+        with cd(tmpdir), XMLRPCServer(('localhost', 0)) as server:
+            client = FakeClient()
+            server.register_instance(client)
+            Thread(target=server.serve_forever, daemon=True).start()
+
+            # Without a job identifier the wrapper wasn't started by a client, so there is nothing to report
+            AbstractWrapper._report_status(JobStatus.RUNNING)
+            assert client.reports == []
+
+            # The status is reported straight to a client that can be reached
+            AbstractWrapper.write_config(tmpdir, job_identifier, spool.spool_path, server.server_address[1])
+            AbstractWrapper._report_status(JobStatus.RUNNING)
+
+            assert [report[:2] for report in client.reports] == [(job_identifier, JobStatus.RUNNING)]
+            assert spool.read() == []
+
+            server.terminate()
+
+            # The spool is used if the client can't be reached
+            with socket.socket() as s:
+                s.bind(('localhost', 0))
+                closed_port = s.getsockname()[1]
+
+            WrapperConfigManager().set_client_port(closed_port)
+            AbstractWrapper._report_status(JobStatus.COMPLETED)
+
+            assert len(client.reports) == 1
+            assert [report[:2] for report in spool.read()] == [(job_identifier, JobStatus.COMPLETED)]
+
 
 def test_terminate():
     terminating = False
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import xmlrpc.client
+from tempfile import TemporaryDirectory
+from threading import Thread, Event
+
+import pytest
+
+from finorch.transport.abstract_transport import AbstractTransport
+from finorch.utils.aioxmlrpc import AsyncXMLRPCServer
+from finorch.utils.binrpc import BinaryServerProxy, COMPRESSION_ZLIB
+
+
+class Client:
+    def __init__(self):
+        self.release = None
+
+    def fast(self):
+        return 'fast'
+
+    def echo(self, value):
+        return value
+
+    def fail(self):
+        raise Exception('failed')
+
+    async def wait(self):
+        await self.release.wait()
+        return 'released'
+
+    async def start_waiting(self):
+        self.release = asyncio.Event()
+        return True
+
+    async def release_waiters(self):
+        self.release.set()
+        return True
+
+
+def start_server(address, max_workers=2):
+    server = AsyncXMLRPCServer(address, max_workers=max_workers)
+    server.register_introspection_functions()
+    server.register_instance(Client())
+    server.register_function(server.terminate, 'terminate')
+
+    t = Thread(target=server.serve_forever)
+    t.start()
+
+    return server, t
+
+
+def rpc(server):
+    return xmlrpc.client.ServerProxy(
+        f'http://localhost:{server.server_address[1]}/rpc', allow_none=True, use_builtin_types=True
+    )
+
+
+def test_xml_and_binary_requests():
+    server, t = start_server(('localhost', 0))
+
+    try:
+        proxy = rpc(server)
+        assert proxy.fast() == 'fast'
+        assert proxy.echo({'a': [1, None, 'b']}) == {'a': [1, None, 'b']}
+
+        # Large responses are gzip encoded for XML-RPC callers
+        assert proxy.echo('x' * 10000) == 'x' * 10000
+
+        with pytest.raises(xmlrpc.client.Fault) as fault:
+            proxy.fail()
+        assert 'failed' in fault.value.faultString
+
+        with pytest.raises(xmlrpc.client.Fault):
+            proxy.not_a_method()
+
+        binary = AbstractTransport._connect_client_rpc(server.server_address[1])
+        assert isinstance(binary, BinaryServerProxy)
+        assert binary.echo(b'\x00' * 1024) == b'\x00' * 1024
+
+        # The same connection should be reused for the next call
+        sock = binary._connections[-1].sock
+        assert binary.fast() == 'fast'
+        assert binary._connections[-1].sock is sock
+
+        assert proxy.system.listMethods()
+
+        metrics = binary.get_metrics()['methods']
+        assert metrics['echo']['calls'] == 3
+        assert metrics['fail']['errors'] == 1
+
+        # Large binary responses are compressed when asked for
+        compressed = BinaryServerProxy(
+            'localhost', server.server_address[1], compression=COMPRESSION_ZLIB, compression_threshold=1024
+        )
+        assert compressed.echo(b'\x00' * 100000) == b'\x00' * 100000
+        assert compressed.compression_stats[0]['compression'] == COMPRESSION_ZLIB
+
+        binary.terminate()
+        t.join(5)
+        assert not t.is_alive()
+    finally:
+        server.server_close()
+
+
+def test_many_waiters():
+    # Coroutine methods don't use worker threads, so many more callers than workers can wait at once
+    server, t = start_server(('localhost', 0), max_workers=1)
+    waiter_count = 100
+
+    try:
+        assert rpc(server).start_waiting()
+
+        results = []
+        started = Event()
+
+        def waiter():
+            proxy = BinaryServerProxy('localhost', server.server_address[1])
+            started.set()
+            results.append(proxy.wait())
+
+        threads = [Thread(target=waiter) for _ in range(waiter_count)]
+        for w in threads:
+            w.start()
+
+        assert started.wait(5)
+
+        # Blocking calls are still served while all of the waiters are waiting
+        assert rpc(server).fast() == 'fast'
+
+        assert rpc(server).release_waiters()
+        for w in threads:
+            w.join(10)
+
+        assert results == ['released'] * waiter_count
+
+        rpc(server).terminate()
+        t.join(5)
+        assert not t.is_alive()
+    finally:
+        server.server_close()
+
+
+def test_unix_socket():
+    with TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, 'client.sock')
+        server, t = start_server(socket_path)
+
+        try:
+            # A second server can't take over a socket that is in use
+            with pytest.raises(OSError):
+                AsyncXMLRPCServer(socket_path)
+
+            proxy = AbstractTransport._connect_client_rpc(None, socket_path)
+            assert proxy.fast() == 'fast'
+
+            proxy.terminate()
+            t.join(5)
+            assert not t.is_alive()
+        finally:
+            server.server_close()
+
+        assert not os.path.exists(socket_path)
@@ -0,0 +1,294 @@
+import datetime
+import http.client
+import socket
+import xmlrpc.client
+from threading import Event, Thread
+
+import pytest
+
+from finorch.utils import binrpc
+from finorch.utils.binrpc import BinaryServerProxy, ProtocolError
+from finorch.utils.xmlrpc import XMLRPCServer
+
+
+def test_round_trip():
+    values = [
+        None,
+        True,
+        False,
+        0,
+        -1,
+        2 ** 62,
+        2 ** 80,
+        -2 ** 80,
+        1.5,
+        '',
+        'test string ✓',
+        b'',
+        b'\x00\x01\xff' * 1000,
+        [],
+        [1, 'a', [b'b', None]],
+        (1, 2),
+        {'a': 1, 'b': [1, 2, {'c': None}]},
+        datetime.datetime(2022, 1, 2, 3, 4, 5, 6),
+    ]
+
+    for value in values:
+        result = binrpc.loads_response(b''.join(binrpc.dumps_response(value)))
+        assert result == (list(value) if isinstance(value, tuple) else value)
+        assert type(result) is (list if isinstance(value, tuple) else type(value))
+
+
+def test_bytes_are_not_copied():
+    payload = b'x' * 100000
+    parts = binrpc.dumps_response(payload)
+
+    assert any(p is payload for p in parts)
+
+
+def test_request():
+    method, params = binrpc.loads_request(b''.join(binrpc.dumps_request('get_job_file', ('abc', 'data.pickle'))))
+
+    assert method == 'get_job_file'
+    assert params == ['abc', 'data.pickle']
+
+
+def test_fault():
+    with pytest.raises(xmlrpc.client.Fault) as fault:
+        binrpc.loads_response(b''.join(binrpc.dumps_fault(1, 'test fault')))
+
+    assert fault.value.faultCode == 1
+    assert fault.value.faultString == 'test fault'
+
+
+def test_unsupported_type():
+    with pytest.raises(TypeError):
+        binrpc.dumps_response(object())
+
+
+def test_malformed_messages():
+    data = b''.join(binrpc.dumps_response('test'))
+
+    with pytest.raises(ProtocolError):
+        binrpc.loads_response(data[:4])
+
+    with pytest.raises(ProtocolError):
+        binrpc.loads_response(b'XXXX' + data[4:])
+
+    with pytest.raises(ProtocolError):
+        binrpc.loads_response(data[:-1])
+
+    with pytest.raises(ProtocolError):
+        binrpc.loads_request(data)
+
+
+def test_server_proxy():
+    def echo(*args):
+        return list(args)
+
+    def fail():
+        raise Exception("test failure")
+
+    with XMLRPCServer(('localhost', 0), max_workers=2) as server:
+        server.register_introspection_functions()
+        server.register_function(echo)
+        server.register_function(fail)
+        server.register_function(server.terminate, 'terminate')
+
+        t = Thread(target=server.serve_forever)
+        t.start()
+
+        try:
+            port = server.server_address[1]
+            proxy = BinaryServerProxy('localhost', port)
+
+            payload = b'\x00' * (1024 * 1024)
+            assert proxy.echo(payload, 1, 'a') == [payload, 1, 'a']
+            assert 'echo' in proxy.system.listMethods()
+            assert proxy.get_protocols() == [binrpc.BINARY_PROTOCOL, binrpc.XMLRPC_PROTOCOL]
+
+            with pytest.raises(xmlrpc.client.Fault) as fault:
+                proxy.fail()
+
+            assert 'test failure' in fault.value.faultString
+
+            # XML-RPC is still served by the same server
+            xml_proxy = xmlrpc.client.ServerProxy(f'http://localhost:{port}/rpc', use_builtin_types=True)
+            assert xml_proxy.echo(b'abc') == [b'abc']
+
+            proxy.terminate()
+            proxy('close')()
+        finally:
+            server.terminate()
+            t.join()
+
+
+def test_compress_response():
+    parts = binrpc.dumps_response(b'a' * 100000)
+    size = sum(len(p) for p in parts)
+
+    # No compression unless the caller asks for it
+    assert binrpc.compress_response(parts, None) == (parts, {})
+    assert binrpc.compress_response(parts, 'gzip') == (parts, {})
+
+    for compression in binrpc.get_compressions():
+        compressed, headers = binrpc.compress_response(parts, f'{compression}, gzip', 9, 1000)
+        assert headers['Content-Encoding'] == compression
+        assert int(headers[binrpc.UNCOMPRESSED_LENGTH_HEADER]) == size
+        assert len(compressed) == 1 and len(compressed[0]) < size
+
+    # Responses below the threshold are not compressed
+    assert binrpc.compress_response(parts, binrpc.COMPRESSION_ZLIB, 6, size + 1) == (parts, {})
+
+    # Responses that don't get smaller are not compressed
+    parts = binrpc.dumps_response(bytes(range(256)))
+    assert binrpc.compress_response(parts, binrpc.COMPRESSION_ZLIB, 6, 0) == (parts, {})
+
+
+def test_server_proxy_compression():
+    def echo(value):
+        return value
+
+    with pytest.raises(ValueError):
+        BinaryServerProxy('localhost', 0, compression='notreal')
+
+    with XMLRPCServer(('localhost', 0), max_workers=2) as server:
+        server.register_function(echo)
+        server.register_function(server.terminate, 'terminate')
+
+        t = Thread(target=server.serve_forever)
+        t.start()
+
+        try:
+            port = server.server_address[1]
+
+            for compression in binrpc.get_compressions():
+                proxy = BinaryServerProxy('localhost', port, compression=compression, compression_threshold=1024)
+
+                payload = b'finesse output\n' * 10000
+                assert proxy.echo(payload) == payload
+                assert len(proxy.compression_stats) == 1
+
+                stats = proxy.compression_stats[0]
+                assert stats['method'] == 'echo'
+                assert stats['compression'] == compression
+                assert stats['compressed_size'] < stats['size']
+                assert stats['ratio'] > 1
+
+                # Small responses are not compressed
+                assert proxy.echo(b'small') == b'small'
+                assert len(proxy.compression_stats) == 1
+
+                proxy('close')()
+
+            proxy.terminate()
+        finally:
+            server.terminate()
+            t.join()
+
+
+def start_dropping_server():
+    """
+    Starts a server that answers the first request on each connection, and then drops the connection after reading any
+    later request without answering it
+    """
+    listener = socket.create_server(('localhost', 0))
+    requests = []
+
+    def read_request(f):
+        headers = {}
+        while (line := f.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode().partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if not headers:
+            return None
+
+        method, _ = binrpc.loads_request(f.read(int(headers['content-length'])))
+        return method
+
+    def handle(conn):
+        with conn, conn.makefile('rb') as f:
+            if method := read_request(f):
+                requests.append(method)
+                body = b''.join(binrpc.dumps_response('ok'))
+                conn.sendall(f'HTTP/1.1 200 OK\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body)
+
+            if method := read_request(f):
+                requests.append(method)
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+
+            Thread(target=handle, args=(conn,), daemon=True).start()
+
+    Thread(target=serve, daemon=True).start()
+    return listener, requests
+
+
+def test_server_proxy_retry():
+    listener, requests = start_dropping_server()
+
+    try:
+        proxy = BinaryServerProxy('localhost', listener.getsockname()[1])
+
+        # A call that fails on a reused connection is sent once more, on a new connection
+        assert proxy.get_jobs() == 'ok'
+        assert proxy.get_jobs() == 'ok'
+        assert requests == ['get_jobs', 'get_jobs', 'get_jobs']
+
+        # Calls that submit jobs are never sent twice, since the server may have handled them
+        requests.clear()
+        with pytest.raises((http.client.RemoteDisconnected, ConnectionError)):
+            proxy.start_jobs([])
+
+        assert requests == ['start_jobs']
+    finally:
+        listener.close()
+
+
+def test_server_proxy_concurrent_calls():
+    with XMLRPCServer(('localhost', 0), max_workers=4) as server:
+        started = Event()
+        release = Event()
+
+        def wait():
+            started.set()
+            return release.wait(10)
+
+        server.register_function(wait)
+        server.register_function(lambda: 'fast', 'fast')
+        server.register_function(server.terminate, 'terminate')
+
+        t = Thread(target=server.serve_forever)
+        t.start()
+
+        try:
+            proxy = BinaryServerProxy('localhost', server.server_address[1])
+            assert proxy.fast() == 'fast'
+
+            waiter = Thread(target=proxy.wait)
+            waiter.start()
+            assert started.wait(5)
+
+            # A call in progress on the proxy doesn't hold up other calls
+            assert proxy.fast() == 'fast'
+            assert waiter.is_alive()
+
+            release.set()
+            waiter.join(5)
+
+            # Both connections are kept for reuse
+            assert len(proxy._connections) == 2
+
+            proxy.terminate()
+            proxy('close')()
+            assert not proxy._connections
+        finally:
+            release.set()
+            server.terminate()
+            t.join()
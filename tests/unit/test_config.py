@@ -1,7 +1,9 @@
 from tempfile import TemporaryDirectory
 from unittest import mock
 
-from finorch.config.config import _ClientConfigManager, WrapperConfigManager
+from finorch.config.config import _ClientConfigManager, WrapperConfigManager, DEFAULT_CLIENT_MAX_WORKERS, \
+    DEFAULT_CLIENT_SERVER, CLIENT_SERVER_ASYNCIO, DEFAULT_SCHEDULER_SYNC_INTERVAL, DEFAULT_STATUS_WATCHER, \
+    STATUS_WATCHER_POLL, DEFAULT_STATUS_RECONCILE_INTERVAL
 from finorch.utils.cd import cd
 
 
@@ -16,6 +18,72 @@ def test_client_get_port():
             assert int(mgr.get_port()) == 1234
 
 
+def test_client_get_max_workers():
+    with TemporaryDirectory() as tmp:
+        with mock.patch('appdirs.user_config_dir', lambda *args: tmp):
+            mgr = _ClientConfigManager()
+
+            assert mgr.get_max_workers() == DEFAULT_CLIENT_MAX_WORKERS
+
+            mgr.set("main", "max_workers", 2)
+            assert mgr.get_max_workers() == 2
+
+
+def test_client_get_server():
+    with TemporaryDirectory() as tmp:
+        with mock.patch('appdirs.user_config_dir', lambda *args: tmp):
+            mgr = _ClientConfigManager()
+
+            assert mgr.get_server() == DEFAULT_CLIENT_SERVER
+
+            mgr.set("main", "server", CLIENT_SERVER_ASYNCIO)
+            assert mgr.get_server() == CLIENT_SERVER_ASYNCIO
+
+
+def test_client_get_scheduler_sync_interval():
+    with TemporaryDirectory() as tmp:
+        with mock.patch('appdirs.user_config_dir', lambda *args: tmp):
+            mgr = _ClientConfigManager()
+
+            assert mgr.get_scheduler_sync_interval() == DEFAULT_SCHEDULER_SYNC_INTERVAL
+
+            mgr.set("main", "scheduler_sync_interval", 2.5)
+            assert mgr.get_scheduler_sync_interval() == 2.5
+
+
+def test_client_get_status_reconcile_interval():
+    with TemporaryDirectory() as tmp:
+        with mock.patch('appdirs.user_config_dir', lambda *args: tmp):
+            mgr = _ClientConfigManager()
+
+            assert mgr.get_status_reconcile_interval() == DEFAULT_STATUS_RECONCILE_INTERVAL
+
+            mgr.set("main", "status_reconcile_interval", 0)
+            assert mgr.get_status_reconcile_interval() == 0
+
+
+def test_client_get_status_watcher():
+    with TemporaryDirectory() as tmp:
+        with mock.patch('appdirs.user_config_dir', lambda *args: tmp):
+            mgr = _ClientConfigManager()
+
+            assert mgr.get_status_watcher() == DEFAULT_STATUS_WATCHER
+
+            mgr.set("main", "status_watcher", STATUS_WATCHER_POLL)
+            assert mgr.get_status_watcher() == STATUS_WATCHER_POLL
+
+
+def test_client_get_socket_path():
+    with TemporaryDirectory() as tmp:
+        with mock.patch('appdirs.user_config_dir', lambda *args: tmp):
+            mgr = _ClientConfigManager()
+
+            assert mgr.get_socket_path() is None
+
+            mgr.set_socket_path('/tmp/client.sock')
+            assert mgr.get_socket_path() == '/tmp/client.sock'
+
+
 def test_wrapper_get_port():
     with TemporaryDirectory() as tmp:
         with cd(tmp):
@@ -25,3 +93,29 @@ def test_wrapper_get_port():
 
             mgr.set_port(1234)
             assert int(mgr.get_port()) == 1234
+
+
+def test_wrapper_get_client_port():
+    with TemporaryDirectory() as tmp:
+        with cd(tmp):
+            mgr = WrapperConfigManager()
+
+            assert mgr.get_client_port() is None
+
+            mgr.set_client_port(4321)
+            mgr.set_port(1234)
+            assert int(mgr.get_client_port()) == 4321
+
+
+def test_wrapper_get_status_report_config():
+    with TemporaryDirectory() as tmp:
+        with cd(tmp):
+            mgr = WrapperConfigManager()
+
+            assert mgr.get_job_identifier() is None
+            assert mgr.get_status_spool() is None
+
+            mgr.set_job_identifier('job')
+            mgr.set_status_spool('/tmp/status.spool')
+            assert mgr.get_job_identifier() == 'job'
+            assert mgr.get_status_spool() == '/tmp/status.spool'
@@ -1,10 +1,17 @@
+import datetime
+import sqlite3
 import uuid
+import xmlrpc.client
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from threading import Thread
+
+import pytest
+from sqlalchemy import inspect, text
 
 from finorch.utils.job_status import JobStatus
 
-from finorch.sessions.database import Database
+from finorch.sessions.database import Database, Job
 
 
 def test_add_job():
@@ -33,6 +40,54 @@ def test_update_job_status():
         assert db.get_job_status(test_uuid) == (None, f"Job with with identifier {test_uuid} not found")
 
 
+def test_get_job_statuses():
+    with TemporaryDirectory() as tmpdir:
+        db = Database(Path(tmpdir))
+
+        identifiers = [str(uuid.uuid4()) for _ in range(2000)]
+        for identifier in identifiers:
+            db.add_job(identifier)
+
+        db.update_job_status(identifiers[0], JobStatus.RUNNING)
+
+        missing = str(uuid.uuid4())
+        statuses = db.get_job_statuses(identifiers + [missing])
+
+        assert len(statuses) == len(identifiers)
+        assert statuses[identifiers[0]] == JobStatus.RUNNING
+        assert all(statuses[identifier] == JobStatus.PENDING for identifier in identifiers[1:])
+        assert missing not in statuses
+
+        assert db.get_job_statuses([]) == {}
+
+
+def test_bulk_add_and_update():
+    with TemporaryDirectory() as tmpdir:
+        db = Database(Path(tmpdir))
+
+        identifiers = [str(uuid.uuid4()) for _ in range(1000)]
+        assert db.add_jobs(identifiers[:500]) is True
+        assert db.add_jobs([(identifier, i) for i, identifier in enumerate(identifiers[500:])]) is True
+        assert db.add_jobs([]) is True
+
+        jobs = db.get_jobs()
+        assert [job['identifier'] for job in jobs] == identifiers
+        assert all(job['status'] == JobStatus.PENDING and job['start_time'] for job in jobs)
+        assert db.get_job_batch_id(identifiers[0]) is None
+        assert db.get_job_batch_id(identifiers[501]) == 1
+
+        missing = str(uuid.uuid4())
+        assert db.update_job_statuses(
+            {**{identifier: JobStatus.RUNNING for identifier in identifiers[:10]}, missing: JobStatus.RUNNING}
+        ) is True
+        assert db.update_job_statuses({}) is True
+
+        statuses = db.get_job_statuses(identifiers)
+        assert all(statuses[identifier] == JobStatus.RUNNING for identifier in identifiers[:10])
+        assert all(statuses[identifier] == JobStatus.PENDING for identifier in identifiers[10:])
+        assert db.get_job_status(missing) == (None, f"Job with with identifier {missing} not found")
+
+
 def test_get_jobs():
     with TemporaryDirectory() as tmpdir:
         db = Database(Path(tmpdir))
@@ -48,6 +103,291 @@ def test_get_jobs():
         assert 'start_time' in jobs[0]
 
 
+def test_get_jobs_filters():
+    with TemporaryDirectory() as tmpdir:
+        db = Database(Path(tmpdir))
+
+        identifiers = [str(uuid.uuid4()) for _ in range(10)]
+        db.add_jobs(identifiers)
+        db.update_job_statuses({identifier: JobStatus.COMPLETED for identifier in identifiers[:4]})
+        db.update_job_statuses({identifiers[4]: JobStatus.CANCELLED})
+
+        # Give each job a known start time, a day apart
+        start = datetime.datetime(2022, 1, 1)
+        with db.engine.begin() as connection:
+            for i, identifier in enumerate(identifiers):
+                connection.execute(
+                    Job.__table__.update().where(Job.identifier == identifier).values(
+                        start_time=start + datetime.timedelta(days=i)
+                    )
+                )
+
+        def ids(jobs):
+            return [job['identifier'] for job in jobs]
+
+        assert ids(db.get_jobs(status=JobStatus.COMPLETED)) == identifiers[:4]
+        assert ids(db.get_jobs(status=[JobStatus.COMPLETED, JobStatus.CANCELLED])) == identifiers[:5]
+
+        assert ids(db.get_jobs(since=start + datetime.timedelta(days=8))) == identifiers[8:]
+        assert ids(db.get_jobs(until=start + datetime.timedelta(days=2))) == identifiers[:2]
+        assert ids(db.get_jobs(since='2022-01-03', until='2022-01-05')) == identifiers[2:4]
+        assert ids(db.get_jobs(since=xmlrpc.client.DateTime(start + datetime.timedelta(days=9)))) == identifiers[9:]
+
+        # Page through the jobs using the id of the last job as the cursor
+        pages = []
+        cursor = None
+        while page := db.get_jobs(limit=3, cursor=cursor):
+            pages.append(ids(page))
+            cursor = page[-1]['id']
+
+        assert pages == [identifiers[0:3], identifiers[3:6], identifiers[6:9], identifiers[9:]]
+
+        # Filters and pagination can be combined
+        page = db.get_jobs(status=JobStatus.PENDING, limit=2)
+        assert ids(page) == identifiers[5:7]
+        assert ids(db.get_jobs(status=JobStatus.PENDING, limit=2, cursor=page[-1]['id'])) == identifiers[7:9]
+
+        # Only the requested fields are returned, along with the id
+        assert db.get_jobs(fields=['status'], limit=1) == [{'id': 1, 'status': JobStatus.COMPLETED}]
+        assert db.get_jobs(fields=['bad', 'status']) == (None, "Invalid job fields bad")
+
+
+def test_job_tags():
+    with TemporaryDirectory() as tmpdir:
+        db = Database(Path(tmpdir))
+        identifiers = [f'job-{i}' for i in range(6)]
+
+        db.add_jobs(identifiers[:4], {
+            identifier: {'sweep': 'a', 'point': i} for i, identifier in enumerate(identifiers[:4])
+        })
+        db.add_jobs(identifiers[4:5], {identifiers[4]: {'sweep': 'b'}})
+        db.add_job(identifiers[5], tags={'sweep': 'b', 'point': 0})
+        db.update_job_statuses({identifiers[0]: JobStatus.COMPLETED, identifiers[5]: JobStatus.RUNNING})
+
+        assert db.get_job_statuses(tags={'sweep': 'a'}) == {
+            identifiers[0]: JobStatus.COMPLETED,
+            identifiers[1]: JobStatus.PENDING,
+            identifiers[2]: JobStatus.PENDING,
+            identifiers[3]: JobStatus.PENDING,
+        }
+
+        # Jobs must have all of the tags, values are compared as strings
+        assert db.get_job_statuses(tags={'point': '0'}) == {
+            identifiers[0]: JobStatus.COMPLETED, identifiers[5]: JobStatus.RUNNING
+        }
+        assert db.get_job_statuses(tags={'sweep': 'b', 'point': 0}) == {identifiers[5]: JobStatus.RUNNING}
+        assert db.get_job_statuses(tags={'sweep': 'c'}) == {}
+
+        def ids(jobs):
+            return [job['identifier'] for job in jobs]
+
+        assert ids(db.get_jobs(tags={'sweep': 'b'})) == identifiers[4:]
+        assert ids(db.get_jobs(tags={'sweep': 'a'}, status=JobStatus.PENDING, limit=2)) == identifiers[1:3]
+
+        jobs = db.get_jobs(tags={'sweep': 'b'}, fields=['tags'])
+        assert jobs == [
+            {'id': 5, 'tags': {'sweep': 'b'}},
+            {'id': 6, 'tags': {'sweep': 'b', 'point': '0'}},
+        ]
+        assert db.get_jobs(fields=['identifier', 'tags'], limit=1) == [
+            {'id': 1, 'identifier': identifiers[0], 'tags': {'sweep': 'a', 'point': '0'}}
+        ]
+
+        # Tags still apply to archived jobs
+        assert db.archive_jobs(datetime.datetime.now() + datetime.timedelta(days=1)) == 1
+        assert db.get_job_statuses(tags={'point': 0}) == {
+            identifiers[0]: JobStatus.COMPLETED, identifiers[5]: JobStatus.RUNNING
+        }
+        assert ids(db.get_jobs(tags={'sweep': 'a'}, archived=True)) == identifiers[:1]
+
+        # Tag lookups are resolved through the tag index
+        with db.engine.connect() as connection:
+            plan = connection.execute(
+                text("EXPLAIN QUERY PLAN SELECT job_identifier FROM job_tag WHERE key = 'sweep' AND value = 'a'")
+            ).all()
+        assert 'ix_job_tag_key_value' in ' '.join(row[-1] for row in plan)
+
+
+def test_lifecycle_timestamps():
+    with TemporaryDirectory() as tmpdir:
+        db = Database(Path(tmpdir))
+        identifier = str(uuid.uuid4())
+        db.add_job(identifier)
+
+        fields = ['queued_at', 'started_at', 'finished_at', 'downloaded_at']
+
+        def job():
+            return db.get_jobs(fields=fields)[0]
+
+        # The job isn't queued until the backend has accepted it
+        assert job()['queued_at'] is None
+        assert job()['started_at'] is None
+
+        db.mark_jobs_queued([identifier])
+        queued_at = job()['queued_at']
+        assert queued_at is not None
+        db.mark_jobs_queued([identifier])
+        assert job()['queued_at'] == queued_at
+
+        # Results can't be downloaded until the job has finished
+        db.mark_job_downloaded(identifier)
+        assert job()['downloaded_at'] is None
+
+        # The first time the job reaches a status is kept
+        db.update_job_status(identifier, JobStatus.RUNNING)
+        started_at = job()['started_at']
+        assert started_at is not None
+        db.update_job_status(identifier, JobStatus.RUNNING)
+        assert job()['started_at'] == started_at
+
+        finished_at = datetime.datetime(2030, 1, 1)
+        db.update_job_statuses({identifier: JobStatus.COMPLETED}, {identifier: {'finished_at': finished_at}})
+        assert job()['finished_at'] == finished_at
+        assert job()['started_at'] == started_at
+
+        db.mark_job_downloaded(identifier)
+        downloaded_at = job()['downloaded_at']
+        assert downloaded_at is not None
+        db.mark_job_downloaded(identifier)
+        assert job()['downloaded_at'] == downloaded_at
+
+
+def test_submitted_jobs_queued():
+    with TemporaryDirectory() as tmpdir:
+        db = Database(Path(tmpdir))
+        identifiers = [str(uuid.uuid4()) for _ in range(3)]
+
+        # Jobs recorded with a batch id were accepted by the scheduler before they were recorded
+        db.add_jobs([(identifiers[0], 1234), identifiers[1]])
+        db.add_job(identifiers[2], 1235)
+
+        queued = {job['identifier']: job['queued_at'] for job in db.get_jobs(fields=['identifier', 'queued_at'])}
+        assert queued[identifiers[0]] is not None
+        assert queued[identifiers[1]] is None
+        assert queued[identifiers[2]] is not None
+
+
+def test_job_timing_stats():
+    with TemporaryDirectory() as tmpdir:
+        db = Database(Path(tmpdir))
+
+        assert db.get_job_timing_stats()['runtime'] == {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'max': None}
+
+        # Jobs that each waited i seconds in the queue, and ran for 10 * i seconds
+        start = datetime.datetime(2022, 1, 1)
+        identifiers = [str(uuid.uuid4()) for _ in range(100)]
+        db.add_jobs(identifiers)
+        db.update_job_statuses(
+            {identifier: JobStatus.COMPLETED for identifier in identifiers},
+            {
+                identifier: {
+                    'started_at': start + datetime.timedelta(seconds=i + 1),
+                    'finished_at': start + datetime.timedelta(seconds=11 * (i + 1))
+                }
+                for i, identifier in enumerate(identifiers)
+            }
+        )
+        with db.engine.begin() as connection:
+            connection.execute(Job.__table__.update().values(queued_at=start))
+
+        # A job that hasn't started isn't included
+        db.add_job(str(uuid.uuid4()))
+
+        stats = db.get_job_timing_stats()
+        assert stats['queue_wait']['count'] == 100
+        assert stats['queue_wait']['p50'] == pytest.approx(50)
+        assert stats['queue_wait']['p95'] == pytest.approx(95)
+        assert stats['queue_wait']['max'] == pytest.approx(100)
+        assert stats['queue_wait']['mean'] == pytest.approx(50.5)
+        assert stats['runtime']['p50'] == pytest.approx(500)
+        assert stats['runtime']['p95'] == pytest.approx(950)
+
+        assert db.get_job_timing_stats(until=start)['runtime']['count'] == 0
+
+
+def test_upgrade_schema():
+    with TemporaryDirectory() as tmpdir:
+        # A database created before the lifecycle timestamps were added
+        connection = sqlite3.connect(Path(tmpdir) / 'db.sqlite3')
+        connection.execute(
+            'CREATE TABLE job (id INTEGER PRIMARY KEY, batch_id INTEGER UNIQUE, identifier VARCHAR(40) UNIQUE, '
+            'start_time DATETIME NOT NULL, status INTEGER)'
+        )
+        connection.execute(
+            "INSERT INTO job (identifier, start_time, status) VALUES ('old', '2022-01-01 00:00:00.000000', 500)"
+        )
+        connection.commit()
+        connection.close()
+
+        db = Database(Path(tmpdir))
+        columns = {column['name'] for column in inspect(db.engine).get_columns('job')}
+        assert {'queued_at', 'started_at', 'finished_at', 'downloaded_at'} <= columns
+
+        assert db.get_jobs(fields=['status', 'finished_at']) == [{'id': 1, 'status': 500, 'finished_at': None}]
+        assert db.update_job_status('old', JobStatus.CANCELLED) is True
+
+
+def test_archive_jobs():
+    with TemporaryDirectory() as tmpdir:
+        db = Database(Path(tmpdir))
+
+        old_finished, old_running, new_finished = [str(uuid.uuid4()) for _ in range(3)]
+        db.add_jobs([(old_finished, 1), (old_running, 2), (new_finished, 3)])
+        db.update_job_statuses({old_finished: JobStatus.COMPLETED, old_running: JobStatus.RUNNING})
+        db.update_job_statuses({new_finished: JobStatus.CANCELLED})
+
+        cutoff = datetime.datetime(2022, 1, 1)
+        with db.engine.begin() as connection:
+            connection.execute(
+                Job.__table__.update().where(Job.identifier != new_finished).values(
+                    start_time=cutoff - datetime.timedelta(days=1)
+                )
+            )
+
+        # Only finished jobs submitted before the cutoff are archived
+        assert db.archive_jobs(cutoff) == 1
+        assert db.archive_jobs(cutoff) == 0
+
+        assert [job['identifier'] for job in db.get_jobs()] == [old_running, new_finished]
+        archived = db.get_jobs(archived=True, fields=['identifier', 'status', 'finished_at'])
+        assert len(archived) == 1
+        assert archived[0]['identifier'] == old_finished
+        assert archived[0]['status'] == JobStatus.COMPLETED
+        assert archived[0]['finished_at'] is not None
+
+        # Archived jobs can still be looked up
+        assert db.get_job_status(old_finished) == JobStatus.COMPLETED
+        assert db.get_job_batch_id(old_finished) == 1
+        assert db.get_job_statuses([old_finished, new_finished]) == {
+            old_finished: JobStatus.COMPLETED,
+            new_finished: JobStatus.CANCELLED
+        }
+
+        # New databases use incremental auto vacuum, so compacting doesn't need to rebuild the database
+        with db.engine.connect() as connection:
+            assert connection.execute(text('PRAGMA auto_vacuum')).scalar() == 2
+
+        db.compact()
+        assert db.get_job_status(old_finished) == JobStatus.COMPLETED
+
+
+def test_compact_converts_old_database():
+    with TemporaryDirectory() as tmpdir:
+        connection = sqlite3.connect(Path(tmpdir) / 'db.sqlite3')
+        connection.execute('PRAGMA auto_vacuum=NONE')
+        connection.execute('CREATE TABLE other (id INTEGER PRIMARY KEY)')
+        connection.commit()
+        connection.close()
+
+        db = Database(Path(tmpdir))
+        with db.engine.connect() as connection:
+            assert connection.execute(text('PRAGMA auto_vacuum')).scalar() == 0
+
+        db.compact()
+        with db.engine.connect() as connection:
+            assert connection.execute(text('PRAGMA auto_vacuum')).scalar() == 2
+
+
 def test_get_job_batch_id():
     with TemporaryDirectory() as tmpdir:
         db = Database(Path(tmpdir))
@@ -62,3 +402,91 @@ def test_get_job_batch_id():
         test_uuid = str(uuid.uuid4())
         assert db.get_job_batch_id(test_uuid) == \
                (None, f"Job with with identifier {test_uuid} not found")
+
+
+def test_concurrent_access():
+    with TemporaryDirectory() as tmpdir:
+        db = Database(Path(tmpdir))
+
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(20):
+                    identifier = str(uuid.uuid4())
+                    db.add_job(identifier)
+                    db.update_job_status(identifier, JobStatus.RUNNING)
+                    assert db.get_job_status(identifier) == JobStatus.RUNNING
+            except Exception as e:
+                errors.append(e)
+
+        threads = [Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+
+        for t in threads:
+            t.join()
+
+        assert not errors
+        assert len(db.get_jobs()) == 80
+
+
+def test_indexes():
+    with TemporaryDirectory() as tmpdir:
+        db = Database(Path(tmpdir))
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes('job')}
+        assert {'ix_job_status', 'ix_job_start_time'} <= indexes
+
+        # Databases created before the indexes existed are upgraded when opened
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP INDEX ix_job_status'))
+            connection.execute(text('DROP INDEX ix_job_start_time'))
+
+        db = Database(Path(tmpdir))
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes('job')}
+        assert {'ix_job_status', 'ix_job_start_time'} <= indexes
+
+        # Status lookups by identifier should use an index rather than scanning the table
+        with db.engine.connect() as connection:
+            plan = connection.execute(
+                text('EXPLAIN QUERY PLAN SELECT status FROM job WHERE identifier = :identifier'),
+                {'identifier': 'test'}
+            ).all()
+        assert 'USING INDEX' in plan[0][-1] or 'USING COVERING INDEX' in plan[0][-1]
+
+
+def test_wal_and_thread_sessions():
+    with TemporaryDirectory() as tmpdir:
+        db = Database(Path(tmpdir))
+        identifier = str(uuid.uuid4())
+        db.add_job(identifier)
+
+        with db.engine.connect() as connection:
+            assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert connection.execute(text('PRAGMA synchronous')).scalar() == 1
+
+        # Each thread has its own session
+        sessions = []
+        thread = Thread(target=lambda: sessions.append(db.session()))
+        thread.start()
+        thread.join()
+        assert sessions[0] is not db.session()
+        db.session.remove()
+
+        # Reads are not blocked by an uncommitted write
+        connection = sqlite3.connect(Path(tmpdir) / 'db.sqlite3', isolation_level=None)
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('UPDATE job SET status = ? WHERE identifier = ?', (JobStatus.RUNNING, identifier))
+
+            results = []
+            thread = Thread(target=lambda: results.append(db.get_job_status(identifier)))
+            thread.start()
+            thread.join(5)
+            assert results == [JobStatus.PENDING]
+
+            connection.execute('COMMIT')
+        finally:
+            connection.close()
+
+        assert db.get_job_status(identifier) == JobStatus.RUNNING
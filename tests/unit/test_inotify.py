@@ -0,0 +1,33 @@
+import os
+import select
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from finorch.utils.inotify import Inotify, inotify_available, IN_CREATE, IN_IGNORED, IN_ISDIR
+
+pytestmark = pytest.mark.skipif(not inotify_available(), reason="inotify is not available")
+
+
+def test_inotify():
+    with TemporaryDirectory() as tmp:
+        inotify = Inotify()
+
+        try:
+            wd = inotify.add_watch(tmp, IN_CREATE)
+            assert inotify.read_events() == []
+
+            os.mkdir(os.path.join(tmp, 'job'))
+            open(os.path.join(tmp, 'started'), 'w').close()
+
+            assert select.select([inotify], [], [], 5)[0]
+            assert inotify.read_events() == [(wd, IN_CREATE | IN_ISDIR, 'job'), (wd, IN_CREATE, 'started')]
+
+            inotify.rm_watch(wd)
+            assert select.select([inotify], [], [], 5)[0]
+            assert inotify.read_events() == [(wd, IN_IGNORED, '')]
+
+            with pytest.raises(FileNotFoundError):
+                inotify.add_watch(os.path.join(tmp, 'missing'), IN_CREATE)
+        finally:
+            inotify.close()
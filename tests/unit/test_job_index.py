@@ -0,0 +1,124 @@
+import datetime
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from finorch.config.config import _ApiConfigManager
+from finorch.sessions.abstract_session import AbstractSession
+from finorch.sessions.job_index import JobIndex
+from finorch.utils.job_status import JobStatus
+
+
+class FakeTransport:
+    host = 'example.com'
+    exec_path = '/tmp/jobs'
+
+    def start_jobs(self, scripts, tags):
+        return [f'job-{i}' for i in range(len(scripts))]
+
+    def get_job_statuses(self, job_identifiers, tags):
+        return {job_identifier: JobStatus.COMPLETED for job_identifier in job_identifiers}
+
+    def get_job_status(self, job_identifier):
+        return JobStatus.COMPLETED
+
+
+class TestSession(AbstractSession):
+    __test__ = False
+    callsign = 'test'
+
+    def __init__(self, transport, job_index):
+        super().__init__()
+        self._transport = transport
+        self._job_index = job_index
+
+
+def test_api_get_job_index_enabled():
+    with TemporaryDirectory() as tmp:
+        with mock.patch('appdirs.user_config_dir', lambda *args: tmp):
+            mgr = _ApiConfigManager()
+
+            assert not mgr.get_job_index_enabled()
+
+            mgr.set("main", "job_index", "true")
+            assert mgr.get_job_index_enabled()
+
+
+def test_record_jobs():
+    with TemporaryDirectory() as tmpdir:
+        index = JobIndex(Path(tmpdir) / 'job_index.sqlite3')
+
+        submitted = datetime.datetime(2022, 1, 1)
+        index.record_jobs('local', 'localhost', Path('/tmp/a'), {
+            'job-1': {'status': JobStatus.PENDING, 'submitted_at': submitted},
+            'job-2': {'status': JobStatus.PENDING, 'submitted_at': submitted + datetime.timedelta(days=1)},
+        })
+        index.record_jobs('ozstar', 'ozstar.swin.edu.au', '/home/a', {
+            'job-3': {'status': JobStatus.RUNNING, 'submitted_at': submitted.isoformat()},
+        })
+
+        jobs = index.get_jobs()
+        assert [job['identifier'] for job in jobs] == ['job-1', 'job-2', 'job-3']
+        assert jobs[0]['exec_path'] == '/tmp/a'
+        assert jobs[2]['submitted_at'] == submitted
+        assert all(job['finished_at'] is None for job in jobs)
+
+        # Details that aren't provided keep their recorded value, and the first finish time is kept
+        index.record_jobs('local', 'localhost', '/tmp/a', {'job-1': {'status': JobStatus.COMPLETED}})
+        finished_at = index.get_jobs(status=JobStatus.COMPLETED)[0]['finished_at']
+        assert finished_at is not None
+
+        index.record_jobs('local', 'localhost', '/tmp/a', {
+            'job-1': {'status': None, 'submitted_at': submitted + datetime.timedelta(days=5)}
+        })
+        job = index.get_jobs(limit=1)[0]
+        assert job['status'] == JobStatus.COMPLETED
+        assert job['submitted_at'] == submitted
+        assert job['finished_at'] == finished_at
+
+        assert [job['identifier'] for job in index.get_jobs(callsign='local')] == ['job-1', 'job-2']
+        assert [job['identifier'] for job in index.get_jobs(host='ozstar.swin.edu.au')] == ['job-3']
+        assert [job['identifier'] for job in index.get_jobs(status=[JobStatus.PENDING, JobStatus.RUNNING])] == \
+            ['job-2', 'job-3']
+        assert [job['identifier'] for job in index.get_jobs(since=submitted + datetime.timedelta(hours=1))] == \
+            ['job-2']
+        assert [job['identifier'] for job in index.get_jobs(until=submitted + datetime.timedelta(hours=1))] == \
+            ['job-1', 'job-3']
+
+        page = index.get_jobs(limit=2)
+        assert [job['identifier'] for job in index.get_jobs(cursor=page[-1]['id'])] == ['job-3']
+
+
+def test_session_records_jobs():
+    with TemporaryDirectory() as tmpdir:
+        index = JobIndex(Path(tmpdir) / 'job_index.sqlite3')
+        session = TestSession(FakeTransport(), index)
+
+        job_identifiers = session.start_jobs(['script 1', 'script 2'])
+
+        jobs = index.get_jobs()
+        assert [job['identifier'] for job in jobs] == job_identifiers
+        assert all(job['status'] == JobStatus.PENDING for job in jobs)
+        assert all(job['callsign'] == 'test' and job['host'] == 'example.com' for job in jobs)
+        assert all(job['submitted_at'] is not None for job in jobs)
+
+        session.get_job_statuses(job_identifiers)
+        assert [job['identifier'] for job in index.get_jobs(status=JobStatus.COMPLETED)] == job_identifiers
+
+        # Polling jobs whose status hasn't changed doesn't write to the index
+        with mock.patch.object(index, 'record_jobs') as record_jobs:
+            session.get_job_statuses(job_identifiers)
+            session.get_job_status(job_identifiers[0])
+
+        record_jobs.assert_not_called()
+
+        # Problems with the index don't interfere with the session
+        session._indexed_statuses.clear()
+        with mock.patch.object(index, 'record_jobs', side_effect=Exception('broken')) as record_jobs:
+            assert session.get_job_statuses(job_identifiers) == {
+                job_identifier: JobStatus.COMPLETED for job_identifier in job_identifiers
+            }
+
+            # The failed write is tried again on the next poll
+            session.get_job_statuses(job_identifiers)
+            assert record_jobs.call_count == 2
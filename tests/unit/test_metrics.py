@@ -0,0 +1,92 @@
+import xmlrpc.client
+from threading import Thread
+
+from finorch.utils.binrpc import BinaryServerProxy
+from finorch.utils.metrics import RpcMetrics, LATENCY_BUCKETS, is_error_result
+from finorch.utils.xmlrpc import XMLRPCServer
+
+
+def test_record():
+    metrics = RpcMetrics()
+
+    metrics.record('start_job', 0.002, 100, 50)
+    metrics.record('start_job', 0.2, 200, 50, error=True)
+    metrics.record('get_job_file', 100, 10, 2 ** 40)
+
+    result = metrics.get_metrics()
+    assert result['uptime'] >= 0
+
+    start_job = result['methods']['start_job']
+    assert start_job['calls'] == 2
+    assert start_job['errors'] == 1
+    assert start_job['min_time'] == 0.002
+    assert start_job['max_time'] == 0.2
+    assert start_job['mean_time'] == (0.002 + 0.2) / 2
+    assert start_job['bytes_in'] == 300
+    assert start_job['bytes_out'] == 100
+    assert start_job['latency_histogram']['0.005'] == 1
+    assert start_job['latency_histogram']['0.5'] == 1
+    assert sum(start_job['latency_histogram'].values()) == 2
+    assert len(start_job['latency_histogram']) == len(LATENCY_BUCKETS) + 1
+
+    # Calls slower than the largest bucket are counted in the overflow bucket
+    get_job_file = result['methods']['get_job_file']
+    assert get_job_file['latency_histogram']['+Inf'] == 1
+
+    # Large byte counts must still be representable over XML-RPC
+    xmlrpc.client.dumps((result,), allow_none=True)
+
+
+def test_is_error_result():
+    assert is_error_result((None, 'Job does not exist'))
+    assert is_error_result([None, 'Job does not exist'])
+    assert not is_error_result([['file', 'path', 10], ['file2', 'path2', 20]])
+    assert not is_error_result(500)
+    assert not is_error_result(None)
+
+
+def test_server_metrics():
+    def echo(value):
+        return value
+
+    def error():
+        return None, 'something went wrong'
+
+    def fail():
+        raise Exception('failed')
+
+    with XMLRPCServer(('localhost', 0), max_workers=2) as server:
+        for f in [echo, error, fail]:
+            server.register_function(f)
+        server.register_function(server.terminate, 'terminate')
+
+        t = Thread(target=server.serve_forever)
+        t.start()
+
+        try:
+            port = server.server_address[1]
+            binary = BinaryServerProxy('localhost', port)
+            xml = xmlrpc.client.ServerProxy(f'http://localhost:{port}/rpc', allow_none=True, use_builtin_types=True)
+
+            assert binary.echo(b'x' * 1000) == b'x' * 1000
+            assert xml.echo('abc') == 'abc'
+            binary.error()
+            try:
+                xml.fail()
+            except xmlrpc.client.Fault:
+                pass
+
+            metrics = binary.get_metrics()['methods']
+
+            assert metrics['echo']['calls'] == 2
+            assert metrics['echo']['errors'] == 0
+            assert metrics['echo']['bytes_in'] > 1000
+            assert metrics['echo']['bytes_out'] > 1000
+
+            assert metrics['error']['errors'] == 1
+            assert metrics['fail']['errors'] == 1
+
+            binary.terminate()
+        finally:
+            server.terminate()
+            t.join()
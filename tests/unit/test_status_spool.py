@@ -0,0 +1,62 @@
+import datetime
+import os
+import tempfile
+from pathlib import Path
+
+from finorch.sessions.status_spool import STATUS_SPOOL, StatusSpoolReader, append_status_report, \
+    format_status_report, parse_status_report
+from finorch.utils.job_status import JobStatus
+
+
+def test_format_parse_status_report():
+    timestamp = datetime.datetime(2020, 1, 2, 3, 4, 5, 600000)
+
+    line = format_status_report('job', JobStatus.RUNNING, timestamp)
+    assert line.endswith('\n')
+    assert parse_status_report(line.rstrip('\n')) == ('job', JobStatus.RUNNING, timestamp)
+
+    assert parse_status_report('') is None
+    assert parse_status_report('job running') is None
+    assert parse_status_report('job 50 later') is None
+
+
+def test_status_spool_reader():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        spool_path = Path(tmpdir) / STATUS_SPOOL
+        reader = StatusSpoolReader(spool_path)
+
+        # Nothing has been reported yet
+        assert reader.read() == []
+
+        started = datetime.datetime(2020, 1, 1)
+        finished = datetime.datetime(2020, 1, 2)
+
+        append_status_report(spool_path, 'job1', JobStatus.RUNNING, started)
+        append_status_report(spool_path, 'job2', JobStatus.RUNNING, started)
+        assert reader.read() == [('job1', JobStatus.RUNNING, started), ('job2', JobStatus.RUNNING, started)]
+
+        # Only new reports are returned
+        assert reader.read() == []
+
+        append_status_report(spool_path, 'job1', JobStatus.COMPLETED, finished)
+        assert reader.read() == [('job1', JobStatus.COMPLETED, finished)]
+
+        # A report that is still being written is left for the next read, and malformed lines are skipped
+        line = format_status_report('job2', JobStatus.ERROR, finished)
+        with open(spool_path, 'a') as f:
+            f.write('garbage\n')
+            f.write(line[:10])
+
+        assert reader.read() == []
+
+        with open(spool_path, 'a') as f:
+            f.write(line[10:])
+
+        assert reader.read() == [('job2', JobStatus.ERROR, finished)]
+
+        # The spool is read from the start again if it is replaced
+        os.remove(spool_path)
+        assert reader.read() == []
+
+        append_status_report(spool_path, 'job3', JobStatus.RUNNING, started)
+        assert reader.read() == [('job3', JobStatus.RUNNING, started)]
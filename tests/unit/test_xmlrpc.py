@@ -0,0 +1,249 @@
+import os
+import socket
+import stat
+import xmlrpc.client
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from time import sleep, time
+from unittest import mock
+
+import pytest
+
+from finorch.transport.abstract_transport import AbstractTransport
+from finorch.utils.binrpc import BinaryServerProxy
+from finorch.utils import port
+from finorch.utils.xmlrpc import XMLRPCServer, UnixXMLRPCServer
+
+
+def start_server(max_workers):
+    slow_started = Event()
+    slow_release = Event()
+
+    def slow():
+        slow_started.set()
+        slow_release.wait(5)
+        return 'slow'
+
+    def fast():
+        return 'fast'
+
+    server = XMLRPCServer(('localhost', 0), max_workers=max_workers)
+    server.register_function(slow)
+    server.register_function(fast)
+    server.register_function(server.terminate, 'terminate')
+
+    t = Thread(target=server.serve_forever)
+    t.start()
+
+    return server, t, slow_started, slow_release
+
+
+def rpc(server):
+    return xmlrpc.client.ServerProxy(f'http://localhost:{server.server_address[1]}/rpc', allow_none=True)
+
+
+def test_concurrent_requests():
+    server, t, slow_started, slow_release = start_server(max_workers=4)
+
+    try:
+        slow_result = None
+
+        def slow_thread():
+            nonlocal slow_result
+            slow_result = rpc(server).slow()
+
+        s = Thread(target=slow_thread)
+        s.start()
+
+        assert slow_started.wait(5)
+
+        # The fast call should be handled while the slow call is still in progress
+        assert rpc(server).fast() == 'fast'
+        assert s.is_alive()
+
+        slow_release.set()
+        s.join()
+        assert slow_result == 'slow'
+
+        rpc(server).terminate()
+        t.join(5)
+        assert not t.is_alive()
+    finally:
+        slow_release.set()
+        server.server_close()
+
+
+def test_serial_requests():
+    server, t, slow_started, slow_release = start_server(max_workers=None)
+
+    try:
+        assert server._executor is None
+        assert rpc(server).fast() == 'fast'
+
+        rpc(server).terminate()
+        t.join(5)
+        assert not t.is_alive()
+    finally:
+        server.server_close()
+
+
+def test_keep_alive():
+    server, t, slow_started, slow_release = start_server(max_workers=2)
+
+    try:
+        proxy = BinaryServerProxy('localhost', server.server_address[1])
+
+        assert proxy.fast() == 'fast'
+        sock = proxy._connections[-1].sock
+
+        # The same connection should be reused for the next call
+        assert proxy.fast() == 'fast'
+        assert proxy._connections[-1].sock is sock
+
+        xml_proxy = rpc(server)
+        assert xml_proxy.fast() == 'fast'
+        assert xml_proxy.fast() == 'fast'
+
+        # Idle persistent connections wait for their next request without holding a worker
+        for _ in range(50):
+            if len(server._idle_requests) == 2:
+                break
+            sleep(0.1)
+
+        assert len(server._idle_requests) == 2
+        assert not server._active_requests
+
+        proxy.terminate()
+        t.join(5)
+        assert not t.is_alive()
+    finally:
+        server.server_close()
+
+    # Closing the server should close the idle persistent connections
+    assert not server._idle_requests
+    assert sock.recv(1) == b''
+
+
+def test_keep_alive_more_connections_than_workers():
+    server, t, slow_started, slow_release = start_server(max_workers=2)
+
+    try:
+        proxies = [BinaryServerProxy('localhost', server.server_address[1]) for _ in range(6)]
+        proxies += [rpc(server) for _ in range(2)]
+
+        for proxy in proxies:
+            assert proxy.fast() == 'fast'
+
+        # Every connection is still open, but none of them should stop a new caller from being served promptly
+        start = time()
+        assert rpc(server).fast() == 'fast'
+        assert time() - start < 1
+
+        # The idle connections can still be reused
+        for proxy in proxies:
+            assert proxy.fast() == 'fast'
+
+        assert proxies[0]._connections[-1].sock is not None
+
+        proxies[0].terminate()
+        t.join(5)
+        assert not t.is_alive()
+    finally:
+        server.server_close()
+
+
+def test_keep_alive_timeout():
+    server, t, slow_started, slow_release = start_server(max_workers=2)
+
+    try:
+        proxy = BinaryServerProxy('localhost', server.server_address[1])
+        assert proxy.fast() == 'fast'
+        sock = proxy._connections[-1].sock
+
+        with mock.patch('finorch.utils.xmlrpc.KEEP_ALIVE_TIMEOUT', 0):
+            # The server should close the connection once it has been idle for too long
+            sock.settimeout(5)
+            assert sock.recv(1) == b''
+
+        assert not server._idle_requests
+
+        rpc(server).terminate()
+        t.join(5)
+        assert not t.is_alive()
+    finally:
+        server.server_close()
+
+
+def test_async_methods_not_served():
+    class Instance:
+        def wait(self):
+            return 'wait'
+
+        async def async_wait(self):
+            return 'async_wait'
+
+    server = XMLRPCServer(('localhost', 0), max_workers=2)
+    server.register_introspection_functions()
+    server.register_instance(Instance())
+    server.register_function(server.terminate, 'terminate')
+
+    t = Thread(target=server.serve_forever)
+    t.start()
+
+    try:
+        assert rpc(server).wait() == 'wait'
+        assert 'async_wait' not in rpc(server).system.listMethods()
+
+        # The coroutine method is only served by the async server, calling it here must not create a coroutine
+        for proxy in [rpc(server), BinaryServerProxy('localhost', server.server_address[1])]:
+            with mock.patch.object(Instance, 'async_wait') as async_wait:
+                with pytest.raises(xmlrpc.client.Fault, match='not supported'):
+                    proxy.async_wait()
+
+                async_wait.assert_not_called()
+
+        rpc(server).terminate()
+        t.join(5)
+        assert not t.is_alive()
+    finally:
+        server.server_close()
+
+
+def test_unix_socket_server():
+    with TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, 'client.sock')
+
+        # A stale socket file left behind by a dead client should be replaced
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(socket_path)
+        stale.close()
+        assert not port.test_socket_open(socket_path)
+
+        server = UnixXMLRPCServer(socket_path, max_workers=2)
+        server.register_introspection_functions()
+        server.register_function(lambda: b'data', 'get_data')
+        server.register_function(server.terminate, 'terminate')
+
+        t = Thread(target=server.serve_forever)
+        t.start()
+
+        try:
+            assert port.test_socket_open(socket_path)
+            assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+
+            # A second server can't take over a socket that is in use
+            with pytest.raises(OSError):
+                UnixXMLRPCServer(socket_path)
+
+            # Both protocols should work over the socket
+            proxy = AbstractTransport._connect_client_rpc(None, socket_path)
+            assert isinstance(proxy, BinaryServerProxy)
+            assert proxy.get_data() == b'data'
+
+            proxy.terminate()
+            t.join(5)
+            assert not t.is_alive()
+        finally:
+            server.server_close()
+
+        assert not os.path.exists(socket_path)